@@ -5,7 +5,7 @@ from rest_framework.response import Response
 from rest_framework import status
 import logging
 
-from .analyze import find_similar_ideas_by_text
+from .analyze import find_similar_ideas_by_text, preferred_model
 
 logger = logging.getLogger(__name__)
 
@@ -32,7 +32,9 @@ def similar_ideas(request):
     logger.info(f"🔎 [similar_ideas] User={user}, len(text)={len(text)}, top_k={top_k}, thr={min_threshold}")
 
     try:
-        results = find_similar_ideas_by_text(text, top_k=top_k, min_threshold=min_threshold)
+        results = find_similar_ideas_by_text(
+            text, top_k=top_k, min_threshold=min_threshold, model=preferred_model(request.user)
+        )
 
         if not results:
             return Response(
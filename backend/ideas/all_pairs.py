@@ -0,0 +1,144 @@
+# all_pairs.py
+# ---------------------------------------
+# 🧮 MindLink All-Pairs Top-K
+# ---------------------------------------
+# Unico motore per il ricalcolo delle connessioni semantiche (all-vs-all):
+# la matrice di similarità N x N non viene mai materializzata.
+# Le righe sono processate a blocchi dimensionati su un budget di memoria
+# e per ogni blocco si estraggono i top-k con argpartition, quindi il picco
+# di memoria è O(blocco x N) invece di O(N^2).
+
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ALL_PAIRS_SETTINGS = getattr(settings, "MINDLINK_ALL_PAIRS", {})
+MEMORY_BUDGET_MB = ALL_PAIRS_SETTINGS.get("MEMORY_BUDGET_MB", 256)
+
+# Byte temporanei per cella del blocco: sims float32 (4) + indici argpartition int64 (8).
+# Le statistiche di iter_topk_pairs lavorano in-place su sims: nessun buffer N x blocco in più
+_BYTES_PER_CELL = 12
+
+
+def block_rows_for_budget(n: int, memory_budget_mb: float | None = None) -> int:
+    """Righe per blocco tali che blocco x N celle restino nel budget."""
+    budget = (memory_budget_mb or MEMORY_BUDGET_MB) * 1024 * 1024
+    return int(max(1, min(n, budget // max(1, n * _BYTES_PER_CELL))))
+
+
+def load_embedding_matrix(dim: int | None = None, allocate=None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (ids, matrice float32 normalizzata) di tutte le idee con embedding valido.
+    La matrice è preallocata e riempita in streaming (niente liste intermedie).
+    Con `dim` i vettori di dimensione diversa vengono scartati.
+    `allocate(shape)` permette di scrivere su un array esterno (es. memmap).
+    """
+    from .models import Idea, embedding_from_bytes
+    from .vector_index import _normalize
+
+    qs = Idea.objects.exclude(embedding=None)
+    capacity = qs.count()
+    ids = np.empty(capacity, dtype=np.int64)
+    matrix = None
+    n = 0
+    for idea_id, data in qs.order_by("id").values_list("id", "embedding").iterator(chunk_size=2000):
+        vec = _normalize(embedding_from_bytes(data))
+        if vec is None or n >= capacity or (dim and vec.shape[0] != dim):
+            continue
+        if matrix is None:
+            shape = (capacity, vec.shape[0])
+            matrix = allocate(shape) if allocate else np.empty(shape, dtype=np.float32)
+        if vec.shape[0] != matrix.shape[1]:
+            continue
+        matrix[n] = vec
+        ids[n] = idea_id
+        n += 1
+
+    if matrix is None:
+        return np.empty(0, dtype=np.int64), np.empty((0, 0), dtype=np.float32)
+    return ids[:n], matrix[:n]
+
+
+def iter_topk_blocks(
+        matrix: np.ndarray,
+        top_k: int,
+        memory_budget_mb: float | None = None,
+        row_range: tuple[int, int] | None = None,
+):
+    """
+    Per ogni blocco di righe genera (start, idx, sims, block_sims):
+    - idx / sims: (blocco x k) vicini ordinati per similarità decrescente, self escluso
+    - block_sims: la matrice di similarità del blocco (per statistiche; non conservarla)
+    `row_range` limita le righe sorgente (es. uno shard) senza cambiare il corpus.
+    """
+    n = matrix.shape[0]
+    k = min(top_k, n - 1)
+    if k <= 0:
+        return
+    start, stop = row_range or (0, n)
+    block = block_rows_for_budget(n, memory_budget_mb)
+
+    for s in range(start, stop, block):
+        e = min(s + block, stop)
+        sims = matrix[s:e] @ matrix.T
+        rows = np.arange(e - s)
+        sims[rows, rows + s] = -np.inf  # niente self-loop
+
+        part = np.argpartition(sims, n - k, axis=1)[:, n - k:]
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1)
+        idx, top_sims = np.take_along_axis(part, order, axis=1), np.take_along_axis(part_sims, order, axis=1)
+        # `part` è una vista sugli indici di argpartition (blocco x N int64): va rilasciata
+        # prima del blocco successivo, come sims, altrimenti il picco raddoppia il budget
+        del part, part_sims, order
+        yield s, idx, top_sims, sims
+        del sims
+
+
+def iter_topk_pairs(
+        ids: np.ndarray,
+        matrix: np.ndarray,
+        top_k: int,
+        min_threshold: float,
+        memory_budget_mb: float | None = None,
+        stats: dict | None = None,
+):
+    """
+    Genera (source_id, target_id, similarità) per i top-k vicini sopra soglia
+    di ogni riga. Se `stats` è un dict vi accumula count/sum/sumsq delle
+    similarità positive (per media e deviazione standard globali).
+    """
+    started = time.perf_counter()
+    for s, idx, sims, block_sims in iter_topk_blocks(matrix, top_k, memory_budget_mb):
+        if stats is not None:
+            # In-place (block_sims non serve più): le similarità <= 0 (e il -inf del self-loop)
+            # diventano 0 e non contano né nelle somme né nel conteggio
+            np.maximum(block_sims, 0, out=block_sims)
+            stats["count"] = stats.get("count", 0) + int(np.count_nonzero(block_sims))
+            stats["sum"] = stats.get("sum", 0.0) + float(block_sims.sum(dtype=np.float64))
+            np.square(block_sims, out=block_sims)
+            stats["sumsq"] = stats.get("sumsq", 0.0) + float(block_sims.sum(dtype=np.float64))
+        del block_sims
+
+        for r in range(idx.shape[0]):
+            source_id = int(ids[s + r])
+            for j, sim in zip(idx[r].tolist(), sims[r].tolist()):
+                if sim < min_threshold:
+                    break
+                yield source_id, int(ids[j]), sim
+
+    logger.info(f"🧮 All-pairs top-{top_k} su {matrix.shape[0]} idee in {time.perf_counter() - started:.1f}s")
+
+
+def summarize_stats(stats: dict) -> tuple[float, float]:
+    """(media, deviazione standard) dalle somme accumulate da iter_topk_pairs."""
+    count = stats.get("count", 0)
+    if not count:
+        return 0.0, 0.0
+    mean = stats["sum"] / count
+    var = max(0.0, stats["sumsq"] / count - mean * mean)
+    return mean, float(np.sqrt(var))
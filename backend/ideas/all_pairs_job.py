@@ -0,0 +1,188 @@
+# all_pairs_job.py
+# ---------------------------------------
+# 🗂️ MindLink Sharded All-Pairs Job
+# ---------------------------------------
+# Versione map-reduce di all_pairs per corpus molto grandi:
+# - prepare_job(): copia la matrice normalizzata in una directory di job
+#   (matrix.npy + ids.npy) e scrive manifest.json con gli shard di righe
+# - run_job(): calcola gli shard mancanti in un ProcessPoolExecutor; ogni
+#   worker mappa matrix.npy (np.load mmap_mode="r"), quindi i processi
+#   condividono la stessa copia in page cache
+# - ogni shard completato è salvato in shard-XXXXX.npz e segnato nel
+#   manifest (checkpoint): un job interrotto riprende dagli shard mancanti
+# - iter_job_pairs(): merge degli shard, da passare a sync_semantic_connections
+#
+# Gli shard sono indipendenti e referenziano file relativi alla directory di
+# job: su più nodi basta condividere la directory ed eseguire run_shard().
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+from django.conf import settings
+
+from .all_pairs import MEMORY_BUDGET_MB, iter_topk_blocks, load_embedding_matrix
+
+logger = logging.getLogger(__name__)
+
+ALL_PAIRS_SETTINGS = getattr(settings, "MINDLINK_ALL_PAIRS", {})
+JOB_DIR = ALL_PAIRS_SETTINGS.get("JOB_DIR", os.path.join("models", "all_pairs_job"))
+SHARD_ROWS = ALL_PAIRS_SETTINGS.get("SHARD_ROWS", 50_000)
+WORKERS = ALL_PAIRS_SETTINGS.get("WORKERS")  # None = os.cpu_count()
+
+MANIFEST_FILE = "manifest.json"
+
+
+def _write_json(path: str, data: dict):
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=1)
+    os.replace(path + ".tmp", path)
+
+
+def read_manifest(job_dir: str | None = None) -> dict | None:
+    try:
+        with open(os.path.join(job_dir or JOB_DIR, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# =====================================================
+# 🔹 PREPARAZIONE
+# =====================================================
+def prepare_job(top_k: int, min_threshold: float, job_dir: str | None = None,
+                shard_rows: int | None = None, dim: int | None = None) -> dict:
+    """Scrive matrice, ids e manifest di un nuovo job (sovrascrive un job precedente)."""
+    job_dir = job_dir or JOB_DIR
+    shard_rows = shard_rows or SHARD_ROWS
+    os.makedirs(job_dir, exist_ok=True)
+    for name in os.listdir(job_dir):
+        if name.startswith("shard-") or name == MANIFEST_FILE:
+            os.remove(os.path.join(job_dir, name))
+
+    matrix_path = os.path.join(job_dir, "matrix.npy")
+    ids, matrix = load_embedding_matrix(
+        dim, allocate=lambda shape: np.lib.format.open_memmap(matrix_path, mode="w+", dtype=np.float32, shape=shape)
+    )
+    count, width = int(ids.shape[0]), int(matrix.shape[1])
+    if isinstance(matrix, np.memmap):
+        matrix.flush()
+    del matrix
+    np.save(os.path.join(job_dir, "ids.npy"), ids)
+
+    manifest = {
+        "created_at": time.time(),
+        "count": count,
+        "dim": width,
+        "top_k": top_k,
+        "min_threshold": min_threshold,
+        "shards": [
+            {"index": i, "start": start, "stop": min(start + shard_rows, count),
+             "file": f"shard-{i:05d}.npz", "done": False, "pairs": 0}
+            for i, start in enumerate(range(0, count, shard_rows))
+        ],
+    }
+    _write_json(os.path.join(job_dir, MANIFEST_FILE), manifest)
+    logger.info(f"🗂️ Job all-pairs preparato: {count} idee, {len(manifest['shards'])} shard in {job_dir}")
+    return manifest
+
+
+# =====================================================
+# 🔹 MAP: UNO SHARD
+# =====================================================
+def run_shard(job_dir: str, shard: dict, top_k: int, min_threshold: float, count: int,
+              memory_budget_mb: float | None = None) -> tuple[int, int]:
+    """Top-k delle righe [start, stop) contro tutto il corpus; ritorna (index, coppie)."""
+    matrix = np.load(os.path.join(job_dir, "matrix.npy"), mmap_mode="r")[:count]
+    ids = np.load(os.path.join(job_dir, "ids.npy"))
+
+    sources, targets, sims = [], [], []
+    row_range = (shard["start"], shard["stop"])
+    for s, idx, block_sims_top, block_sims in iter_topk_blocks(matrix, top_k, memory_budget_mb, row_range):
+        del block_sims  # la matrice del blocco non serve: liberata prima del blocco successivo
+        keep = block_sims_top >= min_threshold
+        rows = np.repeat(np.arange(s, s + idx.shape[0]), keep.sum(axis=1))
+        sources.append(ids[rows])
+        targets.append(ids[idx[keep]])
+        sims.append(block_sims_top[keep].astype(np.float32))
+
+    empty = np.zeros(0, dtype=np.int64)
+    source = np.concatenate(sources) if sources else empty
+    path = os.path.join(job_dir, shard["file"])
+    with open(path + ".tmp", "wb") as f:
+        np.savez(
+            f,
+            source=source,
+            target=np.concatenate(targets) if targets else empty,
+            sim=np.concatenate(sims) if sims else np.zeros(0, dtype=np.float32),
+        )
+    os.replace(path + ".tmp", path)
+    return shard["index"], int(source.shape[0])
+
+
+# =====================================================
+# 🔹 ESECUZIONE CON CHECKPOINT
+# =====================================================
+def run_job(job_dir: str | None = None, workers: int | None = None,
+            memory_budget_mb: float | None = None) -> dict:
+    """Esegue in parallelo gli shard non ancora completati e aggiorna il manifest."""
+    job_dir = job_dir or JOB_DIR
+    manifest = read_manifest(job_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Nessun manifest in {job_dir}: eseguire prima prepare_job()")
+
+    # Un file di shard esiste solo se completo (os.replace): è il vero checkpoint,
+    # anche per shard calcolati altrove con run_shard()
+    manifest_path = os.path.join(job_dir, MANIFEST_FILE)
+    pending = []
+    for shard in manifest["shards"]:
+        path = os.path.join(job_dir, shard["file"])
+        if not os.path.exists(path):
+            pending.append(shard)
+        elif not shard["done"]:
+            with np.load(path) as data:
+                shard["done"], shard["pairs"] = True, int(data["source"].shape[0])
+    _write_json(manifest_path, manifest)
+
+    workers = max(1, min(workers or WORKERS or os.cpu_count() or 1, len(pending) or 1))
+    # Il budget è per processo: lo si divide tra i worker
+    budget = (memory_budget_mb or MEMORY_BUDGET_MB) / workers
+    started = time.perf_counter()
+    logger.info(f"🗂️ {len(pending)}/{len(manifest['shards'])} shard da calcolare con {workers} worker")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(run_shard, job_dir, shard, manifest["top_k"], manifest["min_threshold"],
+                        manifest["count"], budget)
+            for shard in pending
+        ]
+        for future in as_completed(futures):
+            index, n_pairs = future.result()
+            shard = manifest["shards"][index]
+            shard["done"], shard["pairs"] = True, n_pairs
+            _write_json(manifest_path, manifest)
+            logger.info(f"✅ Shard {index} completato ({n_pairs} coppie)")
+
+    logger.info(f"🗂️ Job all-pairs completato in {time.perf_counter() - started:.1f}s")
+    return manifest
+
+
+# =====================================================
+# 🔹 REDUCE
+# =====================================================
+def iter_job_pairs(job_dir: str | None = None):
+    """(source_id, target_id, similarità) di tutti gli shard completati, in ordine."""
+    job_dir = job_dir or JOB_DIR
+    manifest = read_manifest(job_dir)
+    if manifest is None:
+        return
+    missing = [s["index"] for s in manifest["shards"] if not s["done"]]
+    if missing:
+        raise RuntimeError(f"Shard non completati: {missing}")
+
+    for shard in manifest["shards"]:
+        with np.load(os.path.join(job_dir, shard["file"])) as data:
+            yield from zip(data["source"].tolist(), data["target"].tolist(), data["sim"].tolist())
@@ -10,96 +10,279 @@
 
 import glob
 import logging
-import re
 import numpy as np
 from functools import lru_cache
 
-import torch
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from .models import Idea, Connection  # Import necessario per il type hint
+from django.conf import settings
+from django.utils import timezone
+from . import embedding_cache, incremental_connections, passages, pgvector_backend, token_cache
+from .all_pairs import iter_topk_pairs, load_embedding_matrix
+from .connection_writer import sync_semantic_connections
+from .encode_batcher import BATCHING_ENABLED, MAX_BATCH, EncodeBatcher
+from .keywords import extract_keywords_batch
+from .model_manager import ModelManager, ModelSlot
+from .model_pool import POOL_ENABLED, ModelPool, resolve_model
+from .model_server import ModelClient, configure_torch_threads, use_model_server
+from .onnx_encoder import ENCODER_BACKEND, load_encoder
+from .models import Idea, embedding_to_bytes
+from .summarizer import candidate_sentences, for_encoding, pick_summary
+from .text_utils import clean_text
+from .vector_index import get_index, index_upsert, on_model_version
 
 logger = logging.getLogger(__name__)
 
-# =====================================================
-# 🔹 STOPWORDS
-# =====================================================
-ITALIAN_STOPWORDS = [
-    "a", "ad", "al", "allo", "ai", "agli", "alla", "alle", "con", "col", "coi", "da", "dal",
-    "dallo", "dai", "dagli", "dalla", "dalle", "di", "del", "dello", "dei", "degli",
-    "della", "delle", "in", "nel", "nello", "nei", "negli", "nella", "nelle", "su", "sul",
-    "sullo", "sui", "sugli", "sulla", "sulle", "per", "tra", "fra", "il", "lo", "la", "i",
-    "gli", "le", "un", "uno", "una", "ma", "o", "e", "anche", "come", "dove", "quando",
-    "che", "chi", "cui", "non", "più", "meno", "mi", "ti", "si", "ci", "vi", "ne", "ho",
-    "hai", "ha", "abbiamo", "avete", "hanno", "sono", "sei", "era", "erano", "fui", "fu",
-    "fummo", "foste", "furono", "questo", "quello", "quella", "queste", "questi",
-    "quelli", "quelle"
-]
+# Backend di ricerca: "auto" (pgvector se disponibile), "pgvector" o "numpy"
+SEARCH_BACKEND = getattr(settings, "MINDLINK_SEARCH", {}).get("BACKEND", "auto")
+
+# Analisi batch: testi per chiamata a model.encode e idee per bulk_update
+ANALYSIS_SETTINGS = getattr(settings, "MINDLINK_ANALYSIS", {})
+ENCODE_BATCH_SIZE = ANALYSIS_SETTINGS.get("ENCODE_BATCH_SIZE", 64)
+WRITE_BATCH_SIZE = ANALYSIS_SETTINGS.get("WRITE_BATCH_SIZE", 256)
+# Secondi di attesa delle chiamate in corso sul modello sostituito da un hot swap
+DRAIN_TIMEOUT = ANALYSIS_SETTINGS.get("DRAIN_TIMEOUT", 60)
 
 # =====================================================
-# 🔹 MODELLO SINGLETON (Logica da signals.py)
+# 🔹 MODELLO (caricamento thread-safe + hot swap, vedi model_manager.py)
 # =====================================================
-_model = None
+_model_version = None  # versione corrente: chiave delle cache legate al modello
 EMBEDDING_DIM = 384  # Default, verrà sovrascritto
 
+TOPICS = ["tecnologia", "educazione", "ambiente", "salute", "economia", "arte", "società"]
+# Prototipi (embedding) dei TOPICS per versione di modello: {versione: matrice}
+_topic_prototypes = {}
+
 
 def get_latest_model_path() -> str:
     paths = sorted(glob.glob("models/mindlink-v*"))
     return paths[-1] if paths else "all-MiniLM-L6-v2"
 
 
-def get_model() -> SentenceTransformer:
-    global _model, EMBEDDING_DIM
-    if _model is None:
-        path = get_latest_model_path()
-        device = "cuda" if torch.cuda.is_available() else "cpu"
+def _load_model(path: str | None = None) -> ModelSlot:
+    """
+    Carica una versione del modello: SentenceTransformer, OnnxEncoder
+    (MINDLINK_ENCODER["BACKEND"] = "onnx") o ModelClient verso il model server
+    (MINDLINK_MODEL_SERVER["MODE"] = "client"). Non tocca lo stato globale.
+    """
+    if use_model_server():
         try:
-            _model = SentenceTransformer(path, device=device)
-            EMBEDDING_DIM = _model.get_sentence_embedding_dimension()
-            logger.info(f"✅ Modello AI caricato: {path} (device={device}, {EMBEDDING_DIM} dim)")
+            client = ModelClient(on_version=_on_server_version)
+            if path is not None and path != client.version.split("#")[0]:
+                client.promote(path)  # la nuova versione va caricata dal demone
+            dim = client.get_sentence_embedding_dimension()
+            logger.info(f"✅ Model server collegato: {client.socket_path} ({client.version}, {dim} dim)")
+            return ModelSlot(client, client.version, dim)
         except Exception as e:
-            logger.error(f"⚠️ Errore caricamento modello {path}: {e}. Fallback su base.")
-            _model = SentenceTransformer("all-MiniLM-L6-v2", device=device)
-            EMBEDDING_DIM = _model.get_sentence_embedding_dimension()
-    return _model
+            logger.error(f"⚠️ Model server non raggiungibile: {e}. Carico il modello in locale.")
+    return _load_local_model(path)
+
+
+def _load_local_model(path: str | None = None, fallback: bool = True) -> ModelSlot:
+    """Carica il modello nel processo corrente (ONNX se abilitato ed esportato, altrimenti PyTorch)."""
+    path = path or get_latest_model_path()
+    if ENCODER_BACKEND == "onnx":
+        encoder = load_encoder(path)
+        if encoder is not None:
+            dim = encoder.get_sentence_embedding_dimension()
+            logger.info(f"✅ Encoder ONNX caricato: {path} (int8={encoder.quantized}, {dim} dim)")
+            return ModelSlot(encoder, f"{path}#onnx", dim)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    configure_torch_threads()
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    try:
+        model = SentenceTransformer(path, device=device)
+    except Exception as e:
+        if not fallback:
+            raise
+        logger.error(f"⚠️ Errore caricamento modello {path}: {e}. Fallback su base.")
+        path = "all-MiniLM-L6-v2"
+        model = SentenceTransformer(path, device=device)
+    dim = model.get_sentence_embedding_dimension()
+    logger.info(f"✅ Modello AI caricato: {path} (device={device}, {dim} dim)")
+    return ModelSlot(model, path, dim)
+
+
+def _on_model_swap(slot: ModelSlot):
+    """Chiamato sotto il lock del manager: stato derivato e cache seguono la nuova versione."""
+    global _model_version, EMBEDDING_DIM
+    _model_version, EMBEDDING_DIM = slot.version, slot.dim
+    _topic_prototypes.clear()
+    _cached_encode.cache_clear()
+    on_model_version(slot.version)
+    pgvector_backend.set_model_dim(slot.dim)
+
+
+_manager = ModelManager(_load_model, on_swap=_on_model_swap, drain_timeout=DRAIN_TIMEOUT)
+
+
+def _on_server_version(info: dict):
+    """
+    Il model server risponde con un'altra versione (promossa da un altro
+    worker): la si adotta senza ricaricare, così _on_model_swap aggiorna
+    versione, dimensione e cache legate al modello anche in questo processo.
+    """
+    slot = _manager.current()
+    if isinstance(slot.model, ModelClient) and slot.version != info["version"]:
+        _manager.adopt(ModelSlot(slot.model, info["version"], info["dim"]))
+
+
+def _current_slot() -> ModelSlot:
+    """Slot corrente; in modalità client la versione del demone è riconfermata periodicamente."""
+    slot = _manager.current()
+    if isinstance(slot.model, ModelClient):
+        try:
+            slot.model.check_version()
+        except Exception as e:
+            logger.warning(f"⚠️ Verifica della versione del model server fallita: {e}")
+        slot = _manager.current()
+    return slot
+
+
+def get_model():
+    """Modello corrente (caricato al primo uso, un solo load anche con richieste concorrenti)."""
+    return _manager.current().model
+
+
+def promote_model(path: str | None = None, wait: bool = False):
+    """
+    Carica `path` (default: ultima versione mindlink-v*) e la sostituisce a
+    quella corrente senza interrompere il servizio: le richieste continuano
+    sulla vecchia versione fino allo swap, che invalida anche le cache.
+    """
+    return _manager.promote(path or get_latest_model_path(), wait=wait)
+
+
+def model_status() -> dict:
+    return _manager.status()
+
 
+# Encoder alternativi per utente (preferenza ai.model), sempre caricati nel processo
+_pool = ModelPool(lambda path: _load_local_model(path, fallback=False))
 
-def clear_model_cache():
-    global _model
-    _model = None
-    logger.info("🧹 Cache del modello AI invalidata. Verrà ricaricato al prossimo uso.")
+
+def preferred_model(user) -> str | None:
+    """
+    Modello del pool scelto dall'utente (preferences["ai"]["model"]);
+    None = modello principale (pool disabilitato, nessuna preferenza,
+    nome non ammesso o coincidente con la versione principale).
+    """
+    if not POOL_ENABLED or user is None or not getattr(user, "is_authenticated", False):
+        return None
+    try:
+        name = (user.settings.preferences or {}).get("ai", {}).get("model")
+    except Exception:
+        return None
+    path = resolve_model(name)
+    if path is None or path == _manager.current().version.split("#")[0]:
+        return None
+    return path
+
+
+def model_pool_status() -> dict:
+    return _pool.status()
+
+
+def get_topic_prototypes() -> np.ndarray:
+    """Embedding dei TOPICS, calcolati una sola volta per versione di modello."""
+    with _manager.lease() as slot:
+        prototypes = _topic_prototypes.get(slot.version)
+        if prototypes is None:
+            prototypes = slot.model.encode(TOPICS)
+            if slot is _manager.current():
+                _topic_prototypes[slot.version] = prototypes
+    return prototypes
 
 
 # =====================================================
 # 🔹 FUNZIONI DI BASE (clean, embed, similarity)
 # =====================================================
-def clean_text(text: str) -> str:
-    if not text:
-        return ""
-    # Mantieni spazi e newline, rimuovi solo simboli strani
-    text = re.sub(r"[^a-zA-Zàèéìòùç0-9\s.,;:!?]", "", text)
-    # Non comprimere \s, ma normalizza solo spazi multipli
-    text = re.sub(r"[ ]{2,}", " ", text)
-    return text.strip()
+def _model_encode(texts: list[str], batch_size: int = ENCODE_BATCH_SIZE, bulk: bool = False) -> np.ndarray:
+    """bulk=True solo dagli encode di massa (_encode_sorted con batch_size), mai dal micro-batcher."""
+    with _manager.lease() as slot:
+        if bulk and token_cache.TOKEN_CACHE_ENABLED:
+            # Encode di massa (es. re-embedding dopo il fine-tuning): token id dalla cache persistente
+            return token_cache.encode_with_token_cache(slot.model, texts, batch_size)
+        return slot.model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+
+# Richieste piccole e concorrenti (es. una per thread HTTP) aggregate in un solo encode
+_batcher = EncodeBatcher(_model_encode)
+
+
+def encode_texts(texts: list[str]) -> np.ndarray:
+    """
+    Encode grezzo (non normalizzato) di una lista di testi.
+    Fino a MAX_BATCH testi passa dal micro-batcher; liste più grandi sono già un batch.
+    """
+    if BATCHING_ENABLED and len(texts) <= MAX_BATCH:
+        return _batcher.encode(texts)
+    return _model_encode(texts)
+
+
+def _encode_through_cache(texts: list[str], encode_fn=encode_texts) -> np.ndarray:
+    """encode_fn solo sui testi assenti dalla cache persistente (versione modello, SHA del testo)."""
+    version = _current_slot().version
+    return embedding_cache.encode_with_cache(
+        version, texts, encode_fn, is_current=lambda: _manager.current().version == version
+    )
 
 
 @lru_cache(maxsize=2048)
-def _cached_encode(cleaned_text: str) -> np.ndarray:
-    model = get_model()
-    if not cleaned_text:
-        return np.zeros(EMBEDDING_DIM)
-    return model.encode(cleaned_text)
+def _cached_encode(version: str, cleaned_text: str) -> np.ndarray:
+    # `version` fa parte della chiave: un encode in corso durante lo swap non sporca la cache nuova.
+    # Davanti alla cache persistente: i testi già visti non arrivano al DB.
+    return _encode_through_cache([cleaned_text])[0]
 
 
 def generate_embedding(text: str) -> np.ndarray:
     cleaned = clean_text(text)
+    version = _current_slot().version
     if not cleaned:
         return np.zeros(EMBEDDING_DIM)
-    emb = _cached_encode(cleaned)
+    emb = _cached_encode(version, cleaned)
     norm = np.linalg.norm(emb)
     return emb / norm if norm != 0 else emb
 
 
+def _encode_sorted(texts: list[str], batch_size: int | None = None) -> np.ndarray:
+    """
+    model.encode su molti testi ordinati per lunghezza (meno padding per batch);
+    le righe tornano nell'ordine originale. Con `batch_size` è un encode di
+    massa: i testi non in cache passano dalla cache dei token.
+    """
+    get_model()
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    if batch_size is None:
+        encoded = _encode_through_cache([texts[i] for i in order])
+    else:
+        encoded = _encode_through_cache(
+            [texts[i] for i in order], lambda chunk: _model_encode(chunk, batch_size=batch_size, bulk=True)
+        )
+    out = np.empty_like(encoded)
+    out[order] = encoded
+    return out
+
+
+def generate_embeddings(texts, batch_size: int | None = None) -> np.ndarray:
+    """Versione batch di generate_embedding: matrice (n, dim), righe normalizzate."""
+    cleaned = [clean_text(t) for t in texts]
+    valid = [i for i, c in enumerate(cleaned) if c]
+    return _normalized_rows(len(cleaned), valid, _encode_sorted([cleaned[i] for i in valid], batch_size))
+
+
+def _normalized_rows(n: int, valid: list[int], encoded: np.ndarray) -> np.ndarray:
+    """Matrice (n, dim) con le righe `valid` normalizzate e le altre a zero."""
+    out = np.zeros((n, EMBEDDING_DIM), dtype=np.float32)
+    if valid:
+        norms = np.linalg.norm(encoded, axis=1, keepdims=True)
+        out[valid] = np.divide(encoded, norms, out=np.zeros_like(encoded), where=norms != 0)
+    return out
+
+
 def cosine_similarity(vec_a, vec_b):
     if vec_a is None or vec_b is None:
         return 0.0
@@ -111,169 +294,311 @@ def cosine_similarity(vec_a, vec_b):
 # 🔹 ANALISI (summary, category, keywords)
 # =====================================================
 def extract_keywords(text, top_k=5):
-    cleaned = clean_text(text)
-    if not cleaned:
-        return []
+    """Keyword TF-IDF con IDF sul corpus delle idee (vedi keywords.py)."""
     try:
-        vectorizer = TfidfVectorizer(stop_words=ITALIAN_STOPWORDS, max_features=50)
-        tfidf = vectorizer.fit_transform([cleaned])
-        scores = zip(vectorizer.get_feature_names_out(), tfidf.toarray()[0])
-        return [kw for kw, _ in sorted(scores, key=lambda x: x[1], reverse=True)[:top_k]]
+        return extract_keywords_batch([text], top_k)[0]
     except Exception as e:
         logger.warning(f"⚠️ Errore in extract_keywords: {e}")
         return []
 
 
 def summarize_text(text: str) -> str:
-    model = get_model()
-    cleaned = clean_text(text)
-    sentences = [s.strip() for s in re.split(r"[.!?]", text) if len(s.split()) > 4]
-    if not sentences:
-        return cleaned[:150]
-
-    embeddings = model.encode(sentences)
-    centroid = np.mean(embeddings, axis=0)
-    norms = np.linalg.norm(embeddings, axis=1)
-    norm_centroid = np.linalg.norm(centroid)
-    if norm_centroid == 0 or np.any(norms == 0):
-        return sentences[0].strip()
-    similarities = np.dot(embeddings, centroid) / (norms * norm_centroid)
-    return sentences[np.argmax(similarities)].strip()
+    return summarize_texts([text])[0]
 
 
 def classify_text(text: str) -> str:
-    model = get_model()
-    cleaned = clean_text(text)
-    if not cleaned:
-        return "generale"
+    return classify_texts([text])[0]
+
+
+def _encode_unique(texts: list[str], batch_size: int | None = None) -> np.ndarray:
+    """Come _encode_sorted, ma ogni stringa ripetuta viene codificata una volta sola."""
+    unique = list(dict.fromkeys(texts))
+    encoded = _encode_sorted(unique, batch_size)
+    position = {t: i for i, t in enumerate(unique)}
+    return encoded[[position[t] for t in texts]] if texts else encoded
+
+
+def summarize_texts(texts, batch_size: int | None = None) -> list[str]:
+    """Versione batch di summarize_text: tutte le frasi codificate in un'unica passata."""
+    texts = [t or "" for t in texts]
+    per_text = [candidate_sentences(t) for t in texts]
+    encoded = _encode_unique([for_encoding(s) for sentences in per_text for s in sentences], batch_size)
+
+    summaries, offset = [], 0
+    for text, sentences in zip(texts, per_text):
+        summaries.append(pick_summary(text, sentences, encoded[offset:offset + len(sentences)]))
+        offset += len(sentences)
+    return summaries
+
+
+def classify_texts(texts, batch_size: int | None = None) -> list[str]:
+    """Versione batch di classify_text (prototipi dei topic in cache per modello)."""
+    cleaned = [clean_text(t) for t in texts]
+    valid = [i for i, c in enumerate(cleaned) if c]
+    return _categories(len(cleaned), valid, _encode_unique([cleaned[i] for i in valid], batch_size))
+
 
-    topics = ["tecnologia", "educazione", "ambiente", "salute", "economia", "arte", "società"]
-    topic_embeddings = model.encode(topics)
-    emb = model.encode([cleaned])
-    sims = np.dot(emb, topic_embeddings.T)[0]
-    return topics[int(np.argmax(sims))]
+def _categories(n: int, valid: list[int], encoded: np.ndarray) -> list[str]:
+    categories = ["generale"] * n
+    if valid:
+        sims = encoded @ get_topic_prototypes().T
+        for i, best in zip(valid, np.argmax(sims, axis=1).tolist()):
+            categories[i] = TOPICS[best]
+    return categories
+
+
+def analyze_texts(texts, batch_size: int | None = None) -> list[dict]:
+    """
+    Analisi completa in un'unica passata del modello: testo pulito, frasi e
+    passaggi (idee lunghe, vedi passages.py) sono codificati insieme una
+    volta sola, e da quei vettori derivano embedding (normalizzato; pooling
+    dei passaggi per le idee lunghe), categoria (prototipi dei topic),
+    summary e passaggi con i loro embedding.
+    """
+    texts = [t or "" for t in texts]
+    with _manager.lease() as slot:
+        if isinstance(slot.model, ModelClient):
+            return slot.model.analyze(texts)  # una sola chiamata al demone
+
+    cleaned = [clean_text(t) for t in texts]
+    valid = [i for i, c in enumerate(cleaned) if c]
+    per_text = [candidate_sentences(t) for t in texts]
+    per_passage = [passages.split_passages(t) for t in texts]
+    # Con il pooling le idee lunghe non codificano il testo intero (verrebbe comunque troncato)
+    whole = [i for i in valid if not (per_passage[i][0] and passages.uses_pooling())]
+
+    sentence_texts = [for_encoding(s) for sentences in per_text for s in sentences]
+    passage_texts = [p for _, chunk_texts in per_passage for p in chunk_texts]
+    encoded = _encode_unique([cleaned[i] for i in whole] + sentence_texts + passage_texts, batch_size)
+    whole_enc = encoded[:len(whole)]
+    sentence_enc = encoded[len(whole):len(whole) + len(sentence_texts)]
+    passage_enc = encoded[len(whole) + len(sentence_texts):]
+
+    passage_vectors, offset = [], 0
+    for spans, _ in per_passage:
+        passage_vectors.append(passage_enc[offset:offset + len(spans)])
+        offset += len(spans)
+
+    whole_rows = dict(zip(whole, whole_enc))
+    text_enc = np.array(
+        [whole_rows[i] if i in whole_rows else passages.pool(passage_vectors[i]) for i in valid],
+        dtype=np.float32,
+    ).reshape(len(valid), encoded.shape[1])
+
+    embeddings = _normalized_rows(len(texts), valid, text_enc)
+    categories = _categories(len(texts), valid, text_enc)
+
+    try:
+        keywords = extract_keywords_batch(texts)
+    except Exception as e:
+        logger.warning(f"⚠️ Errore in extract_keywords_batch: {e}")
+        keywords = [[] for _ in texts]
+
+    results, offset = [], 0
+    for i, (text, sentences) in enumerate(zip(texts, per_text)):
+        summary = pick_summary(text, sentences, sentence_enc[offset:offset + len(sentences)])
+        offset += len(sentences)
+        results.append({
+            "summary": summary,
+            "category": categories[i],
+            "keywords": keywords[i],
+            "embedding": embeddings[i],
+            "passages": per_passage[i][0],
+            "passage_embeddings": passages.normalize_rows(passage_vectors[i]),
+        })
+    return results
 
 
 # =====================================================
-# 🔹 FUNZIONE COMPLETA (per i signals)
+# 🔹 FUNZIONE COMPLETA (singola idea)
 # =====================================================
-def perform_full_analysis(instance: Idea):
+def perform_full_analysis(instance: Idea) -> dict | None:
+    """
+    Analisi completa di una singola idea in una sola passata del modello.
+    Aggiorna DB, indice residente, colonna vector, passaggi e (dopo il commit,
+    se l'embedding è cambiato) le connessioni semantiche incrementali.
+    Ritorna il risultato di analyze_texts, None in caso di errore.
+    """
     try:
-        # 🔹 1. Mantieni il testo originale (non pulirlo!)
+        # 🔹 1. Mantieni il testo originale (non pulirlo!): clean_text solo per l'embedding
         raw_text = instance.content or ""
 
-        # 🔹 2. Usa clean_text SOLO per embedding, non per summary/category
-        cleaned_for_embedding = clean_text(raw_text)
-
-        # 🔹 3. Usa il testo originale per analisi semantiche
-        summary = summarize_text(raw_text)
-        category = classify_text(raw_text)
-        keywords = extract_keywords(raw_text)
-
-        # 🔹 4. Genera embedding dal testo pulito
-        embedding = generate_embedding(cleaned_for_embedding)
-        if embedding is None or not np.any(embedding):
-            embedding = np.zeros(EMBEDDING_DIM)
+        # 🔹 2. Una sola passata del modello: summary, category ed embedding
+        result = analyze_texts([raw_text])[0]
+        embedding = result["embedding"]
+        data = embedding_to_bytes(embedding)
+        changed = data != (bytes(instance.embedding) if instance.embedding is not None else None)
 
-        # 🔹 5. Aggiorna solo i campi analitici
+        # 🔹 3. Aggiorna solo i campi analitici
         Idea.objects.filter(id=instance.id).update(
-            summary=summary,
-            category=category,
-            keywords=keywords,
-            embedding=embedding.tolist(),
+            summary=result["summary"],
+            category=result["category"],
+            keywords=result["keywords"],
+            embedding=data,
+            embedding_updated_at=timezone.now(),
         )
+        instance.summary, instance.category = result["summary"], result["category"]
+        instance.keywords, instance.embedding = result["keywords"], data
+
+        # .update() non genera signals: aggiorniamo indice, colonna vector e connessioni a mano
+        index_upsert(instance.id, embedding)
+        pgvector_backend.store_embedding(instance.id, embedding)
+        passages.store_passages([(instance.id, result["passages"], result["passage_embeddings"])])
+        if changed and incremental_connections.INCREMENTAL_ENABLED:
+            incremental_connections.schedule(incremental_connections.refresh_idea_connections, instance.id, embedding)
 
         logger.info(f"🧠 Analisi completata per Idea #{instance.id}")
+        return result
 
     except Exception as e:
         logger.exception(f"Errore durante analisi Idea #{instance.id}: {e}")
+        return None
 
 
-def _find_similar_vectors(
-        target_emb: np.ndarray,
-        all_embs: np.ndarray,
-        top_k: int = 5,
-        min_threshold: float = 0.5
-) -> tuple[list, list]:
+def perform_full_analysis_batch(ideas=None, batch_size: int | None = None,
+                                write_batch_size: int | None = None) -> int:
     """
-    Funzione helper per calcolare la similarità (dot product)
-    Assumendo che tutti i vettori siano normalizzati (come fa generate_embedding).
+    Versione batch di perform_full_analysis (default: tutte le idee).
+    Le idee sono analizzate a gruppi di `write_batch_size` e salvate con
+    bulk_update; indice residente e colonna vector sono aggiornati a mano.
+    Ritorna il numero di idee aggiornate.
     """
-    # Il prodotto scalare È la cosine similarity per vettori normalizzati
-    sims = np.dot(all_embs, target_emb)
-
-    # Ordina e filtra
-    top_indices = np.argpartition(sims, -top_k)[-top_k:]
-    sorted_indices = top_indices[np.argsort(sims[top_indices])[::-1]]
-
-    final_indices = []
-    final_sims = []
-    for i in sorted_indices:
-        if sims[i] >= min_threshold:
-            final_indices.append(i)
-            final_sims.append(sims[i])
-        else:
-            break  # Abbiamo superato la soglia
+    # Encode di massa: sempre con batch_size esplicito (cache dei token, niente micro-batcher)
+    batch_size = batch_size or ENCODE_BATCH_SIZE
+    if ideas is None:
+        ideas = Idea.objects.only("id", "content").order_by("id").iterator(chunk_size=1000)
+    write_batch_size = write_batch_size or WRITE_BATCH_SIZE
+
+    updated, chunk = 0, []
+    for idea in ideas:
+        chunk.append(idea)
+        if len(chunk) >= write_batch_size:
+            updated += _analyze_and_write(chunk, batch_size)
+            chunk = []
+    if chunk:
+        updated += _analyze_and_write(chunk, batch_size)
+    return updated
+
+
+def _analyze_and_write(ideas: list, batch_size: int) -> int:
+    try:
+        results = analyze_texts([idea.content for idea in ideas], batch_size)
+        now = timezone.now()
+        for idea, result in zip(ideas, results):
+            idea.summary = result["summary"]
+            idea.category = result["category"]
+            idea.keywords = result["keywords"]
+            idea.embedding = embedding_to_bytes(result["embedding"])
+            idea.embedding_updated_at = now
+        Idea.objects.bulk_update(ideas, ["summary", "category", "keywords", "embedding", "embedding_updated_at"])
+
+        # bulk_update non genera signals: aggiorniamo indice e colonna vector a mano
+        for idea, result in zip(ideas, results):
+            index_upsert(idea.id, result["embedding"])
+        pgvector_backend.store_embeddings((idea.id, result["embedding"]) for idea, result in zip(ideas, results))
+        passages.store_passages(
+            (idea.id, result["passages"], result["passage_embeddings"]) for idea, result in zip(ideas, results)
+        )
+
+        logger.info(f"🧠 Analisi batch completata per {len(ideas)} idee")
+        return len(ideas)
+
+    except Exception as e:
+        logger.exception(f"Errore durante analisi batch ({len(ideas)} idee): {e}")
+        return 0
 
-        if len(final_indices) >= top_k:
-            break  # Abbiamo raggiunto il top_k
 
-    return final_indices, final_sims
+def use_pgvector() -> bool:
+    if SEARCH_BACKEND == "numpy":
+        return False
+    return pgvector_backend.is_available()
+
+
+def search_similar(
+        target_emb,
+        top_k: int = 5,
+        min_threshold: float = 0.5,
+        exclude_ids=()
+) -> tuple[list[int], list[float]]:
+    """
+    Top-k idee più simili a un embedding: (ids, similarità) in ordine decrescente.
+    Usa pgvector se disponibile, altrimenti (o in caso di errore) l'indice residente.
+    """
+    if use_pgvector():
+        try:
+            return pgvector_backend.search(target_emb, top_k, min_threshold, exclude_ids)
+        except Exception as e:
+            logger.error(f"Errore pgvector, fallback sull'indice in memoria: {e}")
+    return get_index().search(target_emb, top_k, min_threshold, exclude_ids)
 
 
 def find_similar_ideas_by_text(
         text: str,
         top_k: int = 5,
-        min_threshold: float = 0.5
+        min_threshold: float = 0.5,
+        model: str | None = None,
+        use_passages: bool | None = None
 ) -> list[dict]:
     """
     Funzione di alto livello per trovare idee simili a un testo.
     Gestisce generazione embedding, fetch dal DB, calcolo e formattazione.
+    `model` (vedi preferred_model): cerca nello spazio di embedding di un modello del pool.
+    `use_passages` (default MINDLINK_PASSAGES["SEARCH"]): le idee lunghe sono valutate
+    anche sul loro passaggio migliore, riportato nel risultato come "passage".
     """
     logger.info(f"Avvio ricerca di similarità per: '{text[:30]}...'")
+    if use_passages is None:
+        use_passages = passages.PASSAGE_SEARCH
 
-    # 1. Embedding del testo target (usa la nostra funzione centralizzata)
-    target_emb = generate_embedding(text)
-
-    # 2. Recupera idee con embedding
-    # ⚠️ ATTENZIONE: Carica tutto in memoria. Non scala!
-    # Questo è il collo di bottiglia. Va bene per < 5-10k idee,
-    # dopodiché sarà necessario un database vettoriale (es. pgvector, Pinecone).
+    # 1-2. Embedding del testo target e top-k dal backend vettoriale
+    # (pgvector o indice residente; per i modelli del pool il loro indice dedicato)
+    hits = {}
     try:
-        ideas_with_embs = list(Idea.objects
-                               .exclude(embedding=None)
-                               .only("id", "title", "summary", "category", "embedding"))
+        pooled = _pool.search_text(model, text, top_k, min_threshold) if model is not None else None
+        if pooled is not None:
+            ids, sims = pooled
+        else:
+            # Modello principale (anche mentre l'indice del modello del pool è in costruzione)
+            query = generate_embedding(text)
+            ids, sims = search_similar(query, top_k, min_threshold)
+            if use_passages and passages.PASSAGES_ENABLED:
+                # Passaggi nello spazio del modello principale: max(idea, passaggio migliore)
+                hits = passages.search_passages(query, top_k, min_threshold)
+                ids, sims = passages.merge_hits(ids, sims, hits, top_k)
     except Exception as e:
-        logger.error(f"Errore DB nel fetch idee per similarità: {e}")
+        logger.error(f"Errore nella ricerca di similarità: {e}")
         return []
 
-    if not ideas_with_embs:
-        logger.warning("Nessuna idea con embedding trovata nel DB.")
-        return []
-
-    # 3. Prepara i vettori per il calcolo
-    all_embs = np.array(
-        [np.array(i.embedding, dtype=float) for i in ideas_with_embs],
-        dtype=float
-    )
-
-    # 4. Calcola similarità (usando la funzione helper)
-    idx, sims = _find_similar_vectors(target_emb, all_embs, top_k, min_threshold)
-
-    if not idx:
+    if not ids:
         return []  # Nessun risultato sopra la soglia
 
-    # 5. Prepara risultati formattati
-    results = [
-        {
-            "id": ideas_with_embs[i].id,
-            "title": ideas_with_embs[i].title,
-            "summary": ideas_with_embs[i].summary,
-            "category": ideas_with_embs[i].category,
-            "similarity": round(float(sims[k]), 3),
+    # 3. Recupera dal DB solo le idee trovate (e gli offset dei passaggi)
+    fields = ("id", "title", "summary", "category") + (("content",) if hits else ())
+    ideas_by_id = Idea.objects.only(*fields).in_bulk(ids)
+    spans = passages.passage_spans((i, hits[i][0]) for i in ids if i in hits)
+
+    # 4. Prepara risultati formattati (nell'ordine dell'indice)
+    results = []
+    for idea_id, sim in zip(ids, sims):
+        if idea_id not in ideas_by_id:
+            continue
+        idea = ideas_by_id[idea_id]
+        result = {
+            "id": idea_id,
+            "title": idea.title,
+            "summary": idea.summary,
+            "category": idea.category,
+            "similarity": round(float(sim), 3),
         }
-        for k, i in enumerate(idx)
-    ]
+        span = spans.get((idea_id, hits[idea_id][0])) if idea_id in hits else None
+        if span is not None and span[1] <= len(idea.content):
+            result["passage"] = {
+                "start": span[0],
+                "end": span[1],
+                "text": idea.content[span[0]:span[1]],
+                "similarity": round(float(hits[idea_id][1]), 3),
+            }
+        results.append(result)
     return results
 
 
@@ -287,28 +612,19 @@ def find_similar_ideas(
     Ritorna una lista di tuple (Idea, score).
     """
     try:
-        if not idea.embedding:
+        target_emb = idea.embedding_vector
+        if target_emb is None:
             logger.warning(f"L'idea {idea.id} non ha embedding, skipping similarità.")
             return []
 
-        # Carica idee con embedding validi
-        ideas_with_embs = list(
-            Idea.objects.exclude(embedding=None).exclude(id=idea.id).only("id", "title", "embedding", "owner")
-        )
-        if not ideas_with_embs:
+        # Calcolo similarità sul backend vettoriale
+        ids, sims = search_similar(target_emb, top_k, min_threshold, exclude_ids=(idea.id,))
+        if not ids:
             return []
 
-        all_embs = np.array(
-            [np.array(i.embedding, dtype=float) for i in ideas_with_embs],
-            dtype=float
-        )
-
-        # Calcolo similarità
-        target_emb = np.array(idea.embedding, dtype=float)
-        idx, sims = _find_similar_vectors(target_emb, all_embs, top_k, min_threshold)
-
         # Restituisce tuple (Idea, score)
-        results = [(ideas_with_embs[i], float(sims[k])) for k, i in enumerate(idx)]
+        ideas_by_id = Idea.objects.in_bulk(ids)
+        results = [(ideas_by_id[i], float(sim)) for i, sim in zip(ids, sims) if i in ideas_by_id]
         return results
 
     except Exception as e:
@@ -325,80 +641,53 @@ def recalculate_semantic_connections(
     Ricalcola *tutte* le connessioni semantiche (all-vs-all)
     usando gli embedding PRE-CALCOLATI nel DB.
 
-    Questo è efficiente sull'embedding, ma computazionalmente O(N^2).
+    Il calcolo resta O(N^2) ma a blocchi (all_pairs): la memoria è
+    O(blocco x N) entro MINDLINK_ALL_PAIRS["MEMORY_BUDGET_MB"].
     Va eseguito come un'operazione batch, non troppo di frequente.
     """
     logger.info("Inizio ricalcolo connessioni semantiche (all-vs-all)...")
 
-    # 1. Recupera tutte le idee che hanno un embedding
-    try:
-        ideas = list(Idea.objects
-                     .exclude(embedding=None)
-                     .only("id", "embedding"))
-    except Exception as e:
-        logger.error(f"Errore DB nel fetch idee per connessioni: {e}")
-        return {"error": "Errore Database"}
-
-    if len(ideas) < 2:
-        return {"message": "Servono almeno due idee per calcolare connessioni.", "new": 0, "updated": 0}
+    # 1-6. Top-k vicini per ogni idea (in SQL con pgvector o in memoria), in streaming
+    # verso il diff set-based con le connessioni semantiche esistenti (manuali escluse)
+    stats = None
+    if use_pgvector():
+        try:
+            total_ideas = Idea.objects.exclude(embedding=None).count()
+            if total_ideas < 2:
+                return {"message": "Servono almeno due idee per calcolare connessioni.", "new": 0, "updated": 0}
+            stats = sync_semantic_connections(pgvector_backend.all_neighbours(top_k, min_threshold), strong_threshold)
+        except Exception as e:
+            # Anche a stream iniziato: il diff in memoria riporta il DB all'insieme desiderato
+            logger.error(f"Errore pgvector nel ricalcolo, fallback in memoria: {e}")
 
-    # 2. Prepara i dati per numpy
-    all_embs = np.array(
-        [np.array(i.embedding, dtype=float) for i in ideas],
-        dtype=float
+    if stats is None:
+        try:
+            total_ideas, pairs = _semantic_pairs_in_memory(top_k, min_threshold)
+        except Exception as e:
+            logger.error(f"Errore DB nel fetch idee per connessioni: {e}")
+            return {"error": "Errore Database"}
+        if total_ideas < 2:
+            return {"message": "Servono almeno due idee per calcolare connessioni.", "new": 0, "updated": 0}
+        stats = sync_semantic_connections(pairs, strong_threshold)
+
+    logger.info(
+        f"Ricalcolo connessioni completato. Nuove: {stats['inserted']}, "
+        f"Aggiornate: {stats['updated']}, Eliminate: {stats['deleted']}"
     )
-    # Mappa per ritrovare l'oggetto Idea dall'indice numpy
-    idea_map = {i: idea for i, idea in enumerate(ideas)}
-
-    new_connections = 0
-    updated_connections = 0
-
-    # 3. Calcola similarità (N*N)
-    for i, source_idea in enumerate(ideas):
-        target_emb = all_embs[i]
-
-        # 4. Trova i K vicini più prossimi per questa idea
-        # Usiamo la nostra funzione helper interna
-        idx, sims = _find_similar_vectors(
-            target_emb,
-            all_embs,
-            top_k=top_k,
-            min_threshold=min_threshold
-        )
-
-        for k, target_idx in enumerate(idx):
-            # 5. Filtra self-loop
-            if i == target_idx:
-                continue
-
-            target_idea = idea_map[target_idx]
-            sim = float(sims[k])
-
-            # Definisci il tipo di connessione
-            ctype = "semantic_strong" if sim >= strong_threshold else "semantic_weak"
-
-            # 6. Aggiorna o crea la connessione nel DB
-            try:
-                conn, created = Connection.objects.update_or_create(
-                    source=source_idea,
-                    target=target_idea,
-                    defaults={"strength": sim, "type": ctype},
-                )
-                if not conn.type.startswith("semantic"):
-                    continue  # evita di toccare connessioni manuali
-
-                if created:
-                    new_connections += 1
-                else:
-                    updated_connections += 1
-
-            except Exception as e:
-                logger.warning(f"Errore update_or_create tra {source_idea.id} e {target_idea.id}: {e}")
-
-    logger.info(f"Ricalcolo connessioni completato. Nuove: {new_connections}, Aggiornate: {updated_connections}")
     return {
         "message": "✅ Connessioni semantiche aggiornate",
-        "new": new_connections,
-        "updated": updated_connections,
-        "total_ideas_processed": len(ideas)
+        "new": stats["inserted"],
+        "updated": stats["updated"],
+        "deleted": stats["deleted"],
+        "unchanged": stats["unchanged"],
+        "total_ideas_processed": total_ideas
     }
+
+
+def _semantic_pairs_in_memory(top_k: int, min_threshold: float):
+    """
+    Fallback senza pgvector: top-k per riga calcolato a blocchi in numpy
+    (all_pairs) sugli embedding del DB. Le coppie sono generate in streaming.
+    """
+    ids, matrix = load_embedding_matrix(EMBEDDING_DIM)
+    return len(ids), iter_topk_pairs(ids, matrix, top_k, min_threshold)
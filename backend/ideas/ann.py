@@ -0,0 +1,255 @@
+# ann.py
+# ---------------------------------------
+# 🛰️ MindLink ANN (Approximate Nearest Neighbours)
+# ---------------------------------------
+# Indice IVF in puro NumPy usato da EmbeddingIndex sopra una certa
+# dimensione del corpus:
+# - centroidi "grossolani" addestrati con k-means sferico
+# - ogni riga della matrice è assegnata alla lista del centroide più vicino
+# - in ricerca si scansionano solo le `nprobe` liste più vicine alla query
+# L'indice lavora su *posizioni* di riga della matrice di EmbeddingIndex:
+# i vettori non vengono duplicati.
+
+import logging
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ASSIGN_BLOCK = 8192  # righe per blocco nell'assegnazione (limita la memoria N x C)
+
+
+def select_top_k(sims: np.ndarray, top_k: int, min_threshold: float) -> np.ndarray:
+    """
+    Restituisce gli indici dei top_k valori di `sims` sopra soglia,
+    ordinati per similarità decrescente. La soglia è applicata per prima:
+    si ordinano solo i valori sopra soglia (argpartition se sono più di top_k),
+    quindi anche top_k = N costa una sola passata più il sort dei sopravvissuti.
+    """
+    if sims.shape[0] == 0 or top_k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.flatnonzero(sims >= min_threshold)
+    if top.shape[0] > top_k:
+        n = top.shape[0]
+        top = top[np.argpartition(sims[top], n - top_k)[n - top_k:]]
+    return top[np.argsort(sims[top])[::-1]]
+
+
+def default_n_lists(n: int) -> int:
+    """Regola empirica: ~sqrt(N) liste, almeno 1."""
+    return max(1, int(np.sqrt(max(n, 1))))
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Centroide più vicino (prodotto scalare) per ogni riga, calcolato a blocchi."""
+    out = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], ASSIGN_BLOCK):
+        block = matrix[start:start + ASSIGN_BLOCK]
+        out[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def train_centroids(matrix: np.ndarray, n_lists: int, iters: int = 20,
+                    max_train: int = 50_000, seed: int = 0) -> np.ndarray:
+    """K-means sferico (vettori e centroidi normalizzati) su un campione della matrice."""
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    n_lists = max(1, min(n_lists, n))
+    sample = matrix if n <= max_train else matrix[rng.choice(n, max_train, replace=False)]
+
+    centroids = sample[rng.choice(sample.shape[0], n_lists, replace=False)].copy()
+    for _ in range(iters):
+        labels = _assign(sample, centroids)
+        counts = np.bincount(labels, minlength=n_lists)
+
+        # Somma per cluster: ordinamento + reduceat (molto più veloce di np.add.at)
+        order = np.argsort(labels, kind="stable")
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+        sums = np.zeros_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], starts, axis=0)
+
+        # Liste vuote: ri-seminate con punti casuali
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            sums[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms != 0).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted file index sulle righe di una matrice esterna.
+
+    Le liste sono array numpy a crescita geometrica; `remove` sposta l'ultimo
+    elemento della lista nello slot liberato (O(1)).
+    """
+
+    def __init__(self, n_lists: int | None = None, nprobe: int = 12, seed: int = 0):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.seed = seed
+        self.centroids: np.ndarray | None = None
+        self._lists: list[np.ndarray] = []
+        self._counts: np.ndarray = np.zeros(0, dtype=np.int64)
+        self._where: dict[int, tuple[int, int]] = {}  # posizione -> (lista, slot)
+
+    # -------------------------------------------------
+    # Build
+    # -------------------------------------------------
+    def build(self, matrix: np.ndarray, positions: np.ndarray | None = None, retrain: bool = True):
+        """
+        Addestra i centroidi (se retrain o non ancora addestrati) e assegna
+        le righe `positions` della matrice (default: tutte).
+        """
+        if positions is None:
+            positions = np.arange(matrix.shape[0])
+        rows = matrix[positions]
+
+        if retrain or self.centroids is None:
+            n_lists = self.n_lists or default_n_lists(rows.shape[0])
+            self.centroids = train_centroids(rows, n_lists, seed=self.seed)
+
+        labels = _assign(rows, self.centroids)
+        n_lists = self.centroids.shape[0]
+        self._counts = np.bincount(labels, minlength=n_lists).astype(np.int64)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(self._counts)])
+
+        self._lists = []
+        self._where = {}
+        sorted_positions = positions[order]
+        for c in range(n_lists):
+            members = sorted_positions[bounds[c]:bounds[c + 1]]
+            capacity = max(16, int(members.size * 1.25))
+            arr = np.empty(capacity, dtype=np.int64)
+            arr[:members.size] = members
+            self._lists.append(arr)
+            for slot, pos in enumerate(members.tolist()):
+                self._where[pos] = (c, slot)
+
+    def reassigned(self, matrix: np.ndarray, positions: np.ndarray) -> "IVFIndex":
+        """Nuovo indice con gli stessi centroidi e le righe riassegnate (es. dopo una compattazione)."""
+        ivf = IVFIndex(n_lists=self.n_lists, nprobe=self.nprobe, seed=self.seed)
+        ivf.centroids = self.centroids
+        ivf.build(matrix, positions, retrain=False)
+        return ivf
+
+    def __len__(self):
+        return len(self._where)
+
+    # -------------------------------------------------
+    # Aggiornamenti incrementali
+    # -------------------------------------------------
+    def add(self, pos: int, vec: np.ndarray):
+        if self.centroids is None:
+            return
+        self.remove(pos)
+        c = int(np.argmax(self.centroids @ vec))
+        slot = int(self._counts[c])
+        arr = self._lists[c]
+        if slot >= arr.shape[0]:
+            grown = np.empty(arr.shape[0] * 2, dtype=np.int64)
+            grown[:slot] = arr[:slot]
+            arr = self._lists[c] = grown
+        arr[slot] = pos
+        self._where[pos] = (c, slot)
+        self._counts[c] = slot + 1
+
+    def remove(self, pos: int):
+        loc = self._where.pop(pos, None)
+        if loc is None:
+            return
+        c, slot = loc
+        last = int(self._counts[c]) - 1
+        arr = self._lists[c]
+        if slot != last:
+            moved = int(arr[last])
+            arr[slot] = moved
+            self._where[moved] = (c, slot)
+        self._counts[c] = last
+
+    # -------------------------------------------------
+    # Ricerca
+    # -------------------------------------------------
+    def candidates(self, query: np.ndarray, nprobe: int | None = None) -> np.ndarray:
+        """Posizioni di riga contenute nelle `nprobe` liste più vicine alla query."""
+        if self.centroids is None:
+            return np.empty(0, dtype=np.int64)
+        nprobe = min(nprobe or self.nprobe, self.centroids.shape[0])
+        scores = self.centroids @ query
+        probe = np.argpartition(scores, -nprobe)[-nprobe:]
+        parts = [self._lists[c][:self._counts[c]] for c in probe.tolist()]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def synthetic_corpus(n: int, dim: int = 384, n_clusters: int = 500, seed: int = 0) -> np.ndarray:
+    """Vettori normalizzati raggruppati attorno a centri casuali (simula topic diversi)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, n_clusters, n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    return data
+
+
+# =====================================================
+# 🔹 REPORT RECALL@K / LATENZA (exact vs IVF)
+# =====================================================
+def evaluate(matrix: np.ndarray, top_k: int = 10, n_queries: int = 200,
+             grid: list[tuple[int | None, int]] | None = None, seed: int = 0) -> list[dict]:
+    """
+    Confronta la ricerca esatta (brute force) con IVF per ogni coppia
+    (n_lists, nprobe) della griglia. Le query sono righe del corpus,
+    escluse dal proprio risultato. Ritorna una riga di report per configurazione.
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    q_idx = rng.choice(n, min(n_queries, n), replace=False)
+
+    def _exact(q, qi):
+        sims = matrix @ q
+        sims[qi] = -np.inf
+        return select_top_k(sims, top_k, -np.inf)
+
+    started = time.perf_counter()
+    truth = [set(_exact(matrix[qi], qi).tolist()) for qi in q_idx]
+    exact_ms = (time.perf_counter() - started) * 1000 / len(q_idx)
+
+    report = [{
+        "mode": "exact", "n_lists": "-", "nprobe": "-", "build_s": 0.0,
+        "recall": 1.0, "avg_ms": round(exact_ms, 3), "p95_ms": round(exact_ms, 3), "scanned": 1.0,
+    }]
+
+    n_lists_default = default_n_lists(n)
+    for n_lists, nprobe in grid or [(None, 4), (None, 8), (None, 16), (None, 32)]:
+        t0 = time.perf_counter()
+        ivf = IVFIndex(n_lists=n_lists or n_lists_default, nprobe=nprobe, seed=seed)
+        ivf.build(matrix)
+        build_s = time.perf_counter() - t0
+
+        hits, latencies, scanned = 0, [], 0
+        for qi, expected in zip(q_idx, truth):
+            q = matrix[qi]
+            t0 = time.perf_counter()
+            cand = ivf.candidates(q)
+            cand = cand[cand != qi]
+            sims = matrix[cand] @ q
+            found = cand[select_top_k(sims, top_k, -np.inf)]
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += len(expected.intersection(found.tolist()))
+            scanned += cand.size
+
+        report.append({
+            "mode": "ivf",
+            "n_lists": ivf.centroids.shape[0],
+            "nprobe": nprobe,
+            "build_s": round(build_s, 2),
+            "recall": round(hits / max(1, sum(len(t) for t in truth)), 4),
+            "avg_ms": round(float(np.mean(latencies)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+            "scanned": round(scanned / (len(q_idx) * n), 4),
+        })
+    return report
@@ -7,6 +7,5 @@ class IdeasConfig(AppConfig):
     name = "ideas"
 
     def ready(self):
-        # Nessun signal da registrare: lasciamo vuoto.
-        # (Se in futuro riattivi i signals, importa qui: import ideas.signals)
-        pass
+        # Signals che mantengono aggiornato l'indice vettoriale residente
+        import ideas.signals  # noqa: F401
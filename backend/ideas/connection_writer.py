@@ -0,0 +1,135 @@
+# connection_writer.py
+# ---------------------------------------
+# 🔗 MindLink Semantic Connection Writer
+# ---------------------------------------
+# Applica al DB l'insieme desiderato di connessioni semantiche con
+# operazioni set-based invece di un update_or_create per coppia:
+# - carica una volta le connessioni semantiche esistenti (id, tipo, peso)
+# - inserisce le nuove con bulk_create e aggiorna le modificate con bulk_update
+# - elimina per id esattamente le coppie semantiche non più desiderate
+# Le connessioni manuali (tipo non "semantic*") non vengono mai toccate:
+# le coppie che ne hanno già una vengono saltate.
+
+import logging
+import time
+
+from django.db import transaction
+
+from .models import Connection
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+# Variazioni di peso sotto questa soglia non generano un UPDATE
+STRENGTH_EPSILON = 1e-4
+
+
+def _load_existing(sources=None) -> tuple[dict, set, list]:
+    """
+    - semantic: {(source_id, target_id): [id, type, strength]}
+    - manual: coppie con almeno una connessione non semantica
+    - duplicates: id di righe semantiche ridondanti per la stessa coppia
+    Con `sources` si caricano solo le connessioni uscenti da quelle idee.
+    """
+    qs = Connection.objects.all()
+    if sources is not None:
+        qs = qs.filter(source_id__in=list(sources))
+
+    semantic, duplicates = {}, []
+    rows = (
+        qs.filter(type__startswith="semantic")
+        .order_by("id")
+        .values_list("id", "source_id", "target_id", "type", "strength")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    for conn_id, source_id, target_id, ctype, strength in rows:
+        key = (source_id, target_id)
+        if key in semantic:
+            duplicates.append(conn_id)
+        else:
+            semantic[key] = [conn_id, ctype, strength]
+
+    manual = set(qs.exclude(type__startswith="semantic").values_list("source_id", "target_id"))
+    return semantic, manual, duplicates
+
+
+def _flush(to_create: list, to_update: list):
+    with transaction.atomic():
+        if to_create:
+            Connection.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_update:
+            Connection.objects.bulk_update(to_update, ["type", "strength"], batch_size=BATCH_SIZE)
+    to_create.clear()
+    to_update.clear()
+
+
+def _delete_ids(ids: list, batch_size: int) -> int:
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        with transaction.atomic():
+            deleted += Connection.objects.filter(id__in=ids[start:start + batch_size]).delete()[0]
+    return deleted
+
+
+def sync_semantic_connections(pairs, strong_threshold: float, sources=None,
+                              batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Rende le connessioni semantiche del DB uguali a `pairs`
+    (iterabile di (source_id, target_id, similarità), anche in streaming).
+    Con `sources` il diff è limitato alle connessioni uscenti da quelle idee
+    (aggiornamento incrementale): le altre righe non vengono considerate.
+    Ogni batch di scritture e di eliminazioni gira nella propria transazione.
+    """
+    started = time.perf_counter()
+    if sources is not None:
+        sources = set(sources)
+    existing, manual, duplicates = _load_existing(sources)
+
+    stats = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0, "skipped_manual": 0,
+             "strong": 0, "weak": 0}
+    # Duplicati eliminati prima di ogni scrittura: un update del tipo della riga superstite
+    # violerebbe unique_together (source, target, type) contro un duplicato dell'altro tipo
+    stats["deleted"] += _delete_ids(duplicates, batch_size)
+
+    to_create, to_update = [], []
+    seen = set()
+
+    for source_id, target_id, sim in pairs:
+        key = (source_id, target_id)
+        if source_id == target_id or key in seen or (sources is not None and source_id not in sources):
+            continue
+        seen.add(key)
+        if key in manual:
+            stats["skipped_manual"] += 1
+            continue
+
+        sim = float(sim)
+        ctype = "semantic_strong" if sim >= strong_threshold else "semantic_weak"
+        stats["strong" if ctype == "semantic_strong" else "weak"] += 1
+
+        current = existing.pop(key, None)
+        if current is None:
+            to_create.append(Connection(source_id=source_id, target_id=target_id, type=ctype, strength=sim))
+            stats["inserted"] += 1
+        elif current[1] != ctype or abs(current[2] - sim) > STRENGTH_EPSILON:
+            to_update.append(Connection(id=current[0], source_id=source_id, target_id=target_id,
+                                        type=ctype, strength=sim))
+            stats["updated"] += 1
+        else:
+            stats["unchanged"] += 1
+
+        if len(to_create) + len(to_update) >= batch_size:
+            _flush(to_create, to_update)
+
+    _flush(to_create, to_update)
+
+    # Coppie semantiche non più desiderate: eliminate per id, senza prodotti cartesiani
+    stats["deleted"] += _delete_ids([conn_id for conn_id, _, _ in existing.values()], batch_size)
+
+    log = logger.debug if sources is not None else logger.info
+    log(
+        f"🔗 Connessioni semantiche sincronizzate in {time.perf_counter() - started:.1f}s: "
+        f"{stats['inserted']} nuove, {stats['updated']} aggiornate, {stats['deleted']} eliminate, "
+        f"{stats['unchanged']} invariate"
+    )
+    return stats
@@ -0,0 +1,139 @@
+# embedding_cache.py
+# ---------------------------------------
+# 🗄️ MindLink Embedding Cache
+# ---------------------------------------
+# Cache persistente degli encode, condivisa da worker e riavvii:
+# - chiave (versione del modello, SHA-256 del testo codificato): un nuovo
+#   mindlink-v* non riceve mai vettori calcolati con la versione precedente
+# - encode_with_cache(): lookup in blocco, inferenza solo sui testi mancanti,
+#   salvataggio dei nuovi vettori (bulk_create, conflitti ignorati)
+# - LRU limitata a MAX_ENTRIES tramite last_used, aggiornato al più una
+#   volta ogni TOUCH_INTERVAL per non trasformare ogni hit in una scrittura
+#
+# Gli errori della cache (DB non raggiungibile, tabella assente) non bloccano
+# mai l'inferenza: si ricade sull'encode diretto.
+
+import hashlib
+import logging
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import EmbeddingCacheEntry, embedding_from_bytes, embedding_to_bytes
+
+logger = logging.getLogger(__name__)
+
+CACHE_SETTINGS = getattr(settings, "MINDLINK_EMBEDDING_CACHE", {})
+CACHE_ENABLED = CACHE_SETTINGS.get("ENABLED", True)
+MAX_ENTRIES = CACHE_SETTINGS.get("MAX_ENTRIES", 200_000)
+TOUCH_INTERVAL = CACHE_SETTINGS.get("TOUCH_INTERVAL", 3600)
+PRUNE_EVERY = CACHE_SETTINGS.get("PRUNE_EVERY", 1000)
+BATCH_SIZE = 1000
+
+_inserted = 0
+_inserted_lock = threading.Lock()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def lookup(version: str, hashes: list[str]) -> dict[str, np.ndarray]:
+    """Vettori in cache per gli hash indicati; rinfresca last_used delle voci vecchie."""
+    found, to_touch = {}, []
+    touch_before = timezone.now() - timedelta(seconds=TOUCH_INTERVAL)
+    for start in range(0, len(hashes), BATCH_SIZE):
+        rows = EmbeddingCacheEntry.objects.filter(
+            model_version=version, content_hash__in=hashes[start:start + BATCH_SIZE]
+        ).values_list("id", "content_hash", "vector", "last_used")
+        for pk, digest, vector, last_used in rows:
+            found[digest] = embedding_from_bytes(vector)
+            if last_used < touch_before:
+                to_touch.append(pk)
+    if to_touch:
+        EmbeddingCacheEntry.objects.filter(id__in=to_touch).update(last_used=timezone.now())
+    return found
+
+
+def store(version: str, vectors: dict[str, np.ndarray]):
+    global _inserted
+    if not vectors:
+        return
+    EmbeddingCacheEntry.objects.bulk_create(
+        [EmbeddingCacheEntry(model_version=version, content_hash=h, vector=embedding_to_bytes(v))
+         for h, v in vectors.items()],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    with _inserted_lock:
+        _inserted += len(vectors)
+        due = _inserted >= PRUNE_EVERY
+        if due:
+            _inserted = 0
+    if due:
+        prune()
+
+
+def prune(max_entries: int | None = None) -> int:
+    """Elimina le voci usate meno di recente oltre max_entries (tutte le versioni)."""
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    excess = EmbeddingCacheEntry.objects.count() - max_entries
+    if excess <= 0:
+        return 0
+    ids = list(
+        EmbeddingCacheEntry.objects.order_by("last_used", "id").values_list("id", flat=True)[:excess]
+    )
+    deleted = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        with transaction.atomic():
+            deleted += EmbeddingCacheEntry.objects.filter(id__in=ids[start:start + BATCH_SIZE]).delete()[0]
+    logger.info(f"🗄️ Cache embedding: eliminate {deleted} voci (limite {max_entries})")
+    return deleted
+
+
+def encode_with_cache(version: str | None, texts: list[str], encode_fn, is_current=None) -> np.ndarray:
+    """
+    encode_fn(texts) → matrice, eseguito solo sui testi assenti dalla cache.
+    is_current(): se False a fine encode (hot swap nel frattempo) i nuovi
+    vettori non vengono salvati sotto la versione ormai superata.
+    """
+    if not CACHE_ENABLED or not version or not texts:
+        return encode_fn(texts)
+
+    hashes = [content_hash(t) for t in texts]
+    try:
+        found = lookup(version, list(set(hashes)))
+    except Exception as e:
+        logger.warning(f"⚠️ Cache embedding non disponibile: {e}")
+        return encode_fn(texts)
+
+    missing = list(dict.fromkeys(h for h in hashes if h not in found))
+    if missing:
+        first = {}
+        for i, h in enumerate(hashes):
+            first.setdefault(h, i)
+        encoded = np.asarray(encode_fn([texts[first[h]] for h in missing]), dtype=np.float32)
+        computed = dict(zip(missing, encoded))
+        found.update(computed)
+        if is_current is None or is_current():
+            try:
+                store(version, computed)
+            except Exception as e:
+                logger.warning(f"⚠️ Salvataggio nella cache embedding fallito: {e}")
+
+    return np.vstack([found[h] for h in hashes])
+
+
+def cache_stats() -> dict[str, int]:
+    """Numero di voci per versione del modello."""
+    rows = EmbeddingCacheEntry.objects.values("model_version").annotate(n=Count("id")).order_by("-n")
+    return {r["model_version"]: r["n"] for r in rows}
+
+
+def drop_version(version: str) -> int:
+    return EmbeddingCacheEntry.objects.filter(model_version=version).delete()[0]
@@ -0,0 +1,388 @@
+# embedding_snapshot.py
+# ---------------------------------------
+# 📸 MindLink Embedding Snapshot
+# ---------------------------------------
+# Snapshot su disco (ids + vettori float32 normalizzati, formato .npy)
+# letto con np.memmap: tutti i worker WSGI/ASGI condividono la stessa
+# copia in page cache e partono senza ricostruire la matrice dal DB.
+#
+# - write_snapshot(): scrive una nuova versione e aggiorna CURRENT.json
+#   in modo atomico (os.replace)
+# - SnapshotIndex: base memory-mapped (sola lettura) + piccolo delta
+#   in-process per le idee modificate dopo lo snapshot; una nuova
+#   versione viene rilevata controllando CURRENT.json, senza restart.
+# - ogni CHECK_INTERVAL s, in background (vector_index.get_index), il delta
+#   legge dal DB le idee create o ri-analizzate dopo lo snapshot (anche da
+#   altri worker, via embedding_updated_at); oltre MAX_AGE un worker (lock su
+#   file) scrive uno snapshot nuovo, che porta a tutti gli altri anche le
+#   eliminazioni delle idee più vecchie.
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .ann import select_top_k
+from .vector_index import EmbeddingIndex, _normalize
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SETTINGS = getattr(settings, "MINDLINK_SNAPSHOT", {})
+SNAPSHOT_ENABLED = SNAPSHOT_SETTINGS.get("ENABLED", False)
+SNAPSHOT_DIR = SNAPSHOT_SETTINGS.get("DIR", os.path.join("models", "snapshots"))
+# Ogni quanti secondi controllare se esiste una versione più recente
+CHECK_INTERVAL = SNAPSHOT_SETTINGS.get("CHECK_INTERVAL", 5)
+KEEP_VERSIONS = SNAPSHOT_SETTINGS.get("KEEP", 2)
+# Età massima (secondi) prima che un worker scriva da sé uno snapshot nuovo; 0 = mai
+MAX_AGE = SNAPSHOT_SETTINGS.get("MAX_AGE", 600)
+
+POINTER_FILE = "CURRENT.json"
+LOCK_FILE = "write.lock"
+
+
+def _paths(version: str, directory: str) -> tuple[str, str]:
+    return (
+        os.path.join(directory, f"embeddings-{version}.npy"),
+        os.path.join(directory, f"ids-{version}.npy"),
+    )
+
+
+def read_pointer(directory: str | None = None) -> dict | None:
+    """Metadati della versione corrente (version, count, dim, created_at) o None."""
+    path = os.path.join(directory or SNAPSHOT_DIR, POINTER_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+# =====================================================
+# 🔹 WRITER
+# =====================================================
+def write_snapshot(directory: str | None = None) -> dict:
+    """
+    Scrive ids (ordinati) e vettori normalizzati float32 in una nuova versione,
+    poi pubblica la versione riscrivendo CURRENT.json in modo atomico.
+    I vettori sono scritti in streaming su un .npy memory-mapped.
+    """
+    from .models import Idea, embedding_from_bytes
+
+    directory = directory or SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    started = time.perf_counter()
+    created_at = time.time()
+    version = str(int(created_at * 1000))
+    emb_path, ids_path = _paths(version, directory)
+
+    qs = Idea.objects.exclude(embedding=None)
+    capacity = qs.count()
+    rows = qs.order_by("id").values_list("id", "embedding").iterator(chunk_size=2000)
+
+    matrix = None
+    ids = []
+    for idea_id, data in rows:
+        vec = _normalize(embedding_from_bytes(data))
+        if vec is None:
+            continue
+        if matrix is None:
+            matrix = np.lib.format.open_memmap(
+                emb_path + ".tmp", mode="w+", dtype=np.float32, shape=(max(capacity, 1), vec.shape[0])
+            )
+        if vec.shape[0] != matrix.shape[1] or len(ids) >= capacity:
+            continue
+        matrix[len(ids)] = vec
+        ids.append(idea_id)
+
+    dim = 0
+    if matrix is not None:
+        dim = int(matrix.shape[1])
+        matrix.flush()
+        del matrix
+        os.replace(emb_path + ".tmp", emb_path)
+    else:
+        np.save(emb_path, np.zeros((0, 0), dtype=np.float32))
+
+    with open(ids_path + ".tmp", "wb") as f:
+        np.save(f, np.asarray(ids, dtype=np.int64))
+    os.replace(ids_path + ".tmp", ids_path)
+
+    meta = {"version": version, "count": len(ids), "dim": dim, "created_at": created_at}
+    pointer = os.path.join(directory, POINTER_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(pointer + ".tmp", pointer)
+
+    _cleanup_old_versions(directory, version)
+    logger.info(
+        f"📸 Snapshot embedding v{version} scritto: {len(ids)} vettori ({dim} dim) "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return meta
+
+
+def _cleanup_old_versions(directory: str, current: str):
+    """Tiene solo le ultime KEEP_VERSIONS versioni (i worker che le mappano ancora non ne risentono)."""
+    versions = sorted(
+        {f.split("-", 1)[1].rsplit(".", 1)[0] for f in os.listdir(directory) if f.startswith("ids-") and f.endswith(".npy")},
+        key=int,
+    )
+    for version in versions[:-KEEP_VERSIONS]:
+        if version == current:
+            continue
+        for path in _paths(version, directory):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_writer: threading.Thread | None = None
+_writer_lock = threading.Lock()
+
+
+def schedule_snapshot(directory: str | None = None) -> bool:
+    """
+    Scrive uno snapshot nuovo in un thread in background, se nessun altro
+    processo lo sta già facendo (flock su LOCK_FILE). Ritorna True se avviato.
+    """
+    global _writer
+    directory = directory or SNAPSHOT_DIR
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            return False
+        os.makedirs(directory, exist_ok=True)
+        lock = open(os.path.join(directory, LOCK_FILE), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+
+        def run():
+            from django.db import connection
+
+            try:
+                # Un altro worker può averlo scritto appena prima di rilasciare il lock
+                meta = read_pointer(directory)
+                if meta is None or time.time() - meta["created_at"] > MAX_AGE:
+                    write_snapshot(directory)
+            except Exception:
+                logger.exception("Errore nella scrittura automatica dello snapshot embedding")
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+                lock.close()
+                connection.close()
+
+        _writer = threading.Thread(target=run, name="embedding-snapshot-writer", daemon=True)
+        _writer.start()
+        return True
+
+
+# =====================================================
+# 🔹 READER
+# =====================================================
+class SnapshotIndex:
+    """
+    Stessa interfaccia di EmbeddingIndex (search / upsert / remove / rebuild).
+
+    - base: matrice memory-mapped in sola lettura, condivisa tra i processi
+    - _dead: righe della base eliminate o sostituite in questo processo
+    - _delta: EmbeddingIndex privato con i vettori aggiornati dopo lo snapshot
+    """
+
+    def __init__(self, directory: str | None = None):
+        self.directory = directory or SNAPSHOT_DIR
+        self._lock = threading.RLock()
+        self.version = None
+        self.created_at = 0.0
+        self.dim = None
+        self._base = np.zeros((0, 0), dtype=np.float32)
+        self._base_ids = np.zeros(0, dtype=np.int64)
+        self._dead = np.zeros(0, dtype=bool)
+        self._delta = EmbeddingIndex()
+        self._delta_times: dict[int, float] = {}
+        # Idee portate nel delta dal DB (refresh_delta): id → hash dei byte dell'embedding
+        self._delta_sources: dict[int, int] = {}
+        self.built_at = 0.0
+        self._checked_at = 0.0
+
+    @classmethod
+    def open(cls, directory: str | None = None) -> "SnapshotIndex | None":
+        """Mappa la versione corrente; None se non esiste ancora nessuno snapshot."""
+        meta = read_pointer(directory or SNAPSHOT_DIR)
+        if meta is None:
+            return None
+        index = cls(directory)
+        index._map(meta)
+        return index
+
+    def rebuild(self) -> bool:
+        """
+        Aggiornamento periodico (chiamato in background da vector_index.get_index):
+        rimappa se CURRENT.json punta a una nuova versione, altrimenti aggiorna
+        il delta dal DB e, oltre MAX_AGE, avvia la scrittura di uno snapshot nuovo.
+        """
+        self._checked_at = time.monotonic()
+        meta = read_pointer(self.directory)
+        if meta is None:
+            return False
+        if meta["version"] != self.version:
+            self._map(meta)
+            return True
+
+        try:
+            self.refresh_delta()
+        except Exception as e:
+            logger.warning(f"⚠️ Aggiornamento del delta dello snapshot dal DB fallito: {e}")
+        if MAX_AGE and time.time() - self.created_at > MAX_AGE:
+            schedule_snapshot(self.directory)
+        return True
+
+    def _map(self, meta: dict):
+        """Mappa la versione `meta` mantenendo il delta più recente."""
+        emb_path, ids_path = _paths(meta["version"], self.directory)
+        count = meta["count"]
+        base = np.load(emb_path, mmap_mode="r")[:count] if count else np.zeros((0, meta["dim"]), dtype=np.float32)
+        base_ids = np.load(ids_path, mmap_mode="r")[:count]
+
+        with self._lock:
+            # Il delta sopravvive solo per le modifiche successive al nuovo snapshot
+            delta_matrix, delta_ids = self._delta.dense_snapshot()
+            newer = {i: t for i, t in self._delta_times.items() if t >= meta["created_at"]}
+            delta = EmbeddingIndex(meta["dim"] or None)
+            dead = np.zeros(count, dtype=bool)
+
+            self.version = meta["version"]
+            self.created_at = meta["created_at"]
+            self.dim = meta["dim"] or None
+            self._base, self._base_ids, self._dead = base, base_ids, dead
+            self._delta, self._delta_times, self._delta_sources = delta, {}, {}
+
+            for vec, idea_id in zip(delta_matrix, delta_ids.tolist()):
+                if idea_id in newer:
+                    self.upsert(idea_id, vec)
+                    self._delta_times[idea_id] = newer[idea_id]
+
+            self.built_at = self._checked_at = time.monotonic()
+
+        logger.info(f"📸 Snapshot embedding v{self.version} mappato ({count} vettori)")
+
+    def is_stale(self) -> bool:
+        """Solo l'età dell'ultimo controllo: nessun I/O nel percorso della richiesta."""
+        return time.monotonic() - self._checked_at >= CHECK_INTERVAL
+
+    def refresh_delta(self) -> int:
+        """
+        Porta nel delta le idee create o ri-analizzate dopo lo snapshot, anche da
+        altri worker (e toglie quelle eliminate o rimaste senza embedding nel
+        frattempo). Ritorna le modifiche applicate.
+        """
+        from django.db.models import Q
+
+        from .models import Idea, embedding_from_bytes
+
+        since = datetime.fromtimestamp(self.created_at, tz=dt_timezone.utc)
+        if not settings.USE_TZ:
+            since = timezone.make_naive(since)
+        rows = Idea.objects.filter(
+            Q(created_at__gte=since) | Q(embedding_updated_at__gte=since)
+        ).values_list("id", "embedding")
+
+        applied, seen = 0, set()
+        for idea_id, data in rows:
+            data = bytes(data) if data is not None else None
+            seen.add(idea_id)
+            digest = hash(data)
+            if self._delta_sources.get(idea_id) == digest:
+                continue
+            vec = embedding_from_bytes(data)
+            if vec is None:
+                self.remove(idea_id)
+            else:
+                self.upsert(idea_id, vec)
+            self._delta_sources[idea_id] = digest
+            applied += 1
+        for idea_id in set(self._delta_sources) - seen:
+            self.remove(idea_id)
+            self._delta_sources.pop(idea_id, None)
+            applied += 1
+        return applied
+
+    def __len__(self):
+        return int(self._base_ids.shape[0] - self._dead.sum()) + len(self._delta)
+
+    # -------------------------------------------------
+    # Aggiornamenti incrementali (solo delta privato)
+    # -------------------------------------------------
+    def _base_position(self, idea_id: int) -> int | None:
+        pos = int(np.searchsorted(self._base_ids, idea_id))
+        if pos < self._base_ids.shape[0] and self._base_ids[pos] == idea_id:
+            return pos
+        return None
+
+    def upsert(self, idea_id: int, embedding):
+        with self._lock:
+            pos = self._base_position(idea_id)
+            if pos is not None:
+                self._dead[pos] = True
+            self._delta.upsert(idea_id, embedding)
+            self._delta_times[idea_id] = time.time()
+
+    def remove(self, idea_id: int):
+        with self._lock:
+            pos = self._base_position(idea_id)
+            if pos is not None:
+                self._dead[pos] = True
+            self._delta.remove(idea_id)
+            self._delta_times.pop(idea_id, None)
+
+    # -------------------------------------------------
+    # Ricerca
+    # -------------------------------------------------
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.dense_snapshot()
+
+    def dense_snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """Base + delta in un'unica matrice (copia: solo per report/strumenti offline)."""
+        with self._lock:
+            delta_matrix, delta_ids = self._delta.dense_snapshot()
+            base_ids = np.where(self._dead, -1, self._base_ids)
+            if delta_ids.size == 0:
+                return self._base, base_ids
+            return np.vstack([self._base, delta_matrix]), np.concatenate([base_ids, delta_ids])
+
+    def search(
+            self,
+            target_emb,
+            top_k: int = 5,
+            min_threshold: float = 0.5,
+            exclude_ids=(),
+            **kwargs,
+    ) -> tuple[list[int], list[float]]:
+        """Top-k sulla base condivisa (scan esatto) unito al top-k del delta."""
+        query = _normalize(target_emb)
+        with self._lock:
+            base, base_ids, dead, delta = self._base, self._base_ids, self._dead, self._delta
+        if query is None or (self.dim and query.shape[0] != self.dim):
+            return [], []
+
+        ids, sims = [], []
+        if base_ids.size:
+            base_sims = base @ query
+            base_sims[dead] = -np.inf
+            if exclude_ids:
+                base_sims[np.isin(base_ids, list(exclude_ids))] = -np.inf
+            top = select_top_k(base_sims, top_k, min_threshold)
+            ids, sims = base_ids[top].tolist(), base_sims[top].tolist()
+
+        delta_ids, delta_sims = delta.search(query, top_k, min_threshold, exclude_ids, exact=True)
+        merged = sorted(zip(ids + delta_ids, sims + delta_sims), key=lambda x: x[1], reverse=True)[:top_k]
+        return [i for i, _ in merged], [s for _, s in merged]
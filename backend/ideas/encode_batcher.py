@@ -0,0 +1,138 @@
+# encode_batcher.py
+# ---------------------------------------
+# 📦 MindLink Encode Batcher
+# ---------------------------------------
+# Micro-batching delle richieste di encode concorrenti: i thread delle
+# richieste HTTP inviano i propri testi e ricevono un Future; un unico
+# worker thread raccoglie le richieste per al massimo MAX_WAIT_MS o
+# MAX_BATCH testi, esegue una sola chiamata a model.encode e risolve i
+# Future con le righe corrispondenti.
+# Un batch non supera mai MAX_BATCH: le richieste più grandi sono spezzate
+# in chunk e la richiesta che non ci sta più passa al batch successivo.
+# Il worker parte al primo utilizzo (e riparte dopo un fork del processo).
+
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+BATCHING_SETTINGS = getattr(settings, "MINDLINK_BATCHING", {})
+BATCHING_ENABLED = BATCHING_SETTINGS.get("ENABLED", True)
+MAX_BATCH = BATCHING_SETTINGS.get("MAX_BATCH", 64)
+MAX_WAIT_MS = BATCHING_SETTINGS.get("MAX_WAIT_MS", 5)
+
+
+class EncodeBatcher:
+    """Dispatcher: submit(texts) → Future con la matrice (len(texts), dim)."""
+
+    def __init__(self, encode_fn, max_batch: int = MAX_BATCH, max_wait_ms: float = MAX_WAIT_MS):
+        self.encode_fn = encode_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue = queue.Queue()
+        self._carry = None  # richiesta rinviata al batch successivo (solo worker)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()  # dopo un fork la coda del padre non ha consumatori
+                    self._carry = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="encode-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, texts: list[str]) -> Future:
+        future = Future()
+        if not texts:
+            future.set_result(None)
+            return future
+        self._ensure_worker()
+        if len(texts) <= self.max_batch:
+            self._queue.put((list(texts), future))
+            return future
+        # Più testi di max_batch: un chunk per batch, righe ricomposte nell'ordine
+        parts = [self.submit(texts[i:i + self.max_batch]) for i in range(0, len(texts), self.max_batch)]
+        _gather(parts, future)
+        return future
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return self.submit(texts).result()
+
+    def _collect(self) -> list:
+        """Blocca fino alla prima richiesta, poi aggrega fino a max_batch testi o max_wait."""
+        first, self._carry = self._carry or self._queue.get(), None
+        pending = [first]
+        size = len(pending[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(item[0]) > self.max_batch:
+                self._carry = item  # supererebbe max_batch: apre il batch successivo
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            pending = self._collect()
+            pending = [(texts, f) for texts, f in pending if f.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            flat = [t for texts, _ in pending for t in texts]
+            try:
+                encoded = np.asarray(self.encode_fn(flat))
+            except Exception as e:
+                logger.error(f"Errore nel batch di encode ({len(flat)} testi): {e}")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(flat)
+            offset = 0
+            for texts, future in pending:
+                future.set_result(encoded[offset:offset + len(texts)])
+                offset += len(texts)
+
+
+def _gather(parts: list[Future], future: Future):
+    """Risolve `future` con la concatenazione dei risultati di `parts` (o con il primo errore)."""
+    lock = threading.Lock()
+    remaining = [len(parts)]
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        for part in parts:
+            error = CancelledError() if part.cancelled() else part.exception()
+            if error is not None:
+                future.set_exception(error)
+                return
+        future.set_result(np.concatenate([p.result() for p in parts]))
+
+    for part in parts:
+        part.add_done_callback(done)
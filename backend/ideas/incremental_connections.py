@@ -0,0 +1,224 @@
+# incremental_connections.py
+# ---------------------------------------
+# 🔁 MindLink Incremental Semantic Connections
+# ---------------------------------------
+# Mantiene le connessioni semantiche (top-k vicini per idea) quando una
+# singola idea viene creata, ri-analizzata o eliminata, senza ricalcolo
+# all-vs-all. Costo: una scansione O(N) dell'indice residente per l'idea
+# modificata; i suoi punteggi bastano ad aggiornare le liste inverse.
+#
+# - refresh_idea_connections(): aggiorna gli archi uscenti dell'idea e le
+#   liste top-k delle idee in cui entra (il vicino più debole viene espulso)
+#   o da cui esce. La soglia di ogni lista è il suo k-esimo punteggio: se
+#   l'idea resta sopra, o la lista non era piena, basta aggiornarla in
+#   memoria; solo una lista piena che la perde va riscansionata (al massimo
+#   MAX_RESCANS per aggiornamento, le altre restano con k-1 vicini fino al
+#   prossimo aggiornamento o ricalcolo completo)
+# - refresh_after_delete(): stessa regola per le idee che puntavano all'idea
+#   eliminata
+# - schedule(): i signals non aggiornano dentro la transazione della
+#   richiesta ma dopo il commit (on_commit), con ASYNC su un thread dedicato
+#   che applica gli aggiornamenti uno alla volta
+# Il ricalcolo completo (recalculate_semantic_connections) resta per i
+# cambi di modello.
+
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .connection_writer import sync_semantic_connections
+from .models import Connection, Idea
+from .vector_index import get_index
+
+logger = logging.getLogger(__name__)
+
+CONNECTION_SETTINGS = getattr(settings, "MINDLINK_CONNECTIONS", {})
+INCREMENTAL_ENABLED = CONNECTION_SETTINGS.get("INCREMENTAL", True)
+TOP_K = CONNECTION_SETTINGS.get("TOP_K", 20)
+MIN_THRESHOLD = CONNECTION_SETTINGS.get("MIN_THRESHOLD", 0.6)
+STRONG_THRESHOLD = CONNECTION_SETTINGS.get("STRONG_THRESHOLD", 0.85)
+# True: aggiornamenti dopo il commit su un thread dedicato, fuori dalla richiesta
+ASYNC = CONNECTION_SETTINGS.get("ASYNC", True)
+# Riscansioni O(N) massime per aggiornamento (liste piene che perdono un vicino)
+MAX_RESCANS = CONNECTION_SETTINGS.get("MAX_RESCANS", 16)
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # Un solo worker: gli aggiornamenti di idee vicine non si sovrappongono
+                _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="connections")
+    return _executor
+
+
+def schedule(fn, idea_id: int, *args):
+    """Esegue fn(idea_id, *args) dopo il commit della transazione corrente (subito se fuori transazione)."""
+    def run():
+        if ASYNC:
+            close_old_connections()
+        try:
+            fn(idea_id, *args)
+        except Exception as e:
+            logger.error(f"Errore aggiornamento incrementale connessioni Idea #{idea_id}: {e}")
+        finally:
+            if ASYNC:
+                close_old_connections()
+
+    transaction.on_commit(lambda: _get_executor().submit(run) if ASYNC else run())
+
+
+def _neighbours_above_threshold(idea_id: int, vec, top_k: int | None = None) -> list[tuple[int, float]]:
+    """Idee con similarità >= MIN_THRESHOLD (tutte, o le prime top_k), in ordine decrescente (scan esatto)."""
+    index = get_index()
+    ids, sims = index.search(vec, top_k=top_k or max(1, len(index)), min_threshold=MIN_THRESHOLD,
+                             exclude_ids=(idea_id,), exact=True)
+    return list(zip(ids, sims))
+
+
+def _top_k_of(idea_id: int) -> list[tuple[int, float]]:
+    """Top-k corrente di un'idea, ricalcolato dal suo embedding nel DB."""
+    vec = Idea.objects.only("id", "embedding").get(pk=idea_id).embedding_vector
+    if vec is None:
+        return []
+    return _neighbours_above_threshold(idea_id, vec, top_k=TOP_K)
+
+
+def _outgoing(source_ids) -> dict[int, dict[int, float]]:
+    """{source_id: {target_id: strength}} delle connessioni semantiche uscenti."""
+    lists = defaultdict(dict)
+    rows = Connection.objects.filter(
+        source_id__in=list(source_ids), type__startswith="semantic"
+    ).values_list("source_id", "target_id", "strength")
+    for source_id, target_id, strength in rows:
+        lists[source_id][target_id] = strength
+    return lists
+
+
+class _Rescans:
+    """Budget di riscansioni O(N) di un singolo aggiornamento."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.done = 0
+        self.skipped = 0
+
+    def top_k_of(self, idea_id: int) -> list[tuple[int, float]] | None:
+        """Top-k ricalcolato, o None se il budget è esaurito."""
+        if self.done >= self.limit:
+            self.skipped += 1
+            return None
+        self.done += 1
+        return _top_k_of(idea_id)
+
+
+def _without(current: dict, full: bool, rescans: _Rescans, other: int) -> list[tuple[int, float]]:
+    """
+    Lista di `other` dopo aver perso un vicino (già tolto da `current`).
+    Se la lista non era piena conteneva già tutte le idee sopra soglia: nessun
+    nuovo membro possibile. Altrimenti serve una riscansione (entro il budget).
+    """
+    if full:
+        rescanned = rescans.top_k_of(other)
+        if rescanned is not None:
+            return rescanned
+    return list(current.items())
+
+
+def refresh_idea_connections(idea_id: int, vec) -> dict | None:
+    """
+    Aggiorna gli archi semantici dopo che l'embedding di `idea_id` è cambiato
+    (l'indice residente deve già contenere il nuovo vettore).
+    """
+    if vec is None:
+        return refresh_after_delete(idea_id, list(
+            Connection.objects.filter(target_id=idea_id, type__startswith="semantic")
+            .values_list("source_id", flat=True)
+        ))
+
+    # Unica scansione O(N): i punteggi verso idea_id valgono anche per le liste inverse
+    neighbours = _neighbours_above_threshold(idea_id, vec)
+    pairs = [(idea_id, other, sim) for other, sim in neighbours[:TOP_K]]
+
+    # Liste inverse: chi punta già a idea_id e chi ha idea_id sopra soglia
+    incoming = set(
+        Connection.objects.filter(target_id=idea_id, type__startswith="semantic")
+        .values_list("source_id", flat=True)
+    )
+    sims = dict(neighbours)
+    candidates = incoming | set(sims)
+    lists = _outgoing(candidates)
+
+    rescans = _Rescans(MAX_RESCANS)
+    sources = {idea_id}
+    for other in candidates:
+        current = lists.get(other, {})
+        full = len(current) >= TOP_K
+        sim = sims.get(other)
+        old = current.pop(idea_id, None)
+        # Soglia d'ingresso: il k-esimo punteggio della lista (senza idea_id)
+        floor = min(current.values()) if current else None
+
+        if old is not None and (sim is None or sim < old):
+            # idea_id si è allontanata: se resta sopra il più debole degli altri
+            # nessuna idea esterna può superarla, altrimenti la lista va rifatta
+            if sim is not None and (not full or (floor is not None and sim >= floor)):
+                current[idea_id] = sim
+                merged = list(current.items())
+            else:
+                merged = _without(current, full, rescans, other)
+        elif sim is None:
+            continue
+        elif old is not None or len(current) < TOP_K or sim > floor:
+            # idea_id entra (o resta, più vicina) nel top-k: il più debole viene espulso
+            current[idea_id] = sim
+            merged = sorted(current.items(), key=lambda x: x[1], reverse=True)[:TOP_K]
+        else:
+            continue
+        pairs.extend((other, t, s) for t, s in merged)
+        sources.add(other)
+
+    stats = sync_semantic_connections(pairs, STRONG_THRESHOLD, sources=sources)
+    logger.info(
+        f"🔁 Connessioni incrementali per Idea #{idea_id}: {len(sources) - 1} liste inverse "
+        f"({rescans.done} riscansioni, {rescans.skipped} rinviate), "
+        f"{stats['inserted']} nuove, {stats['updated']} aggiornate, {stats['deleted']} eliminate"
+    )
+    return stats
+
+
+def refresh_after_delete(idea_id: int, incoming_sources) -> dict | None:
+    """
+    Dopo l'eliminazione (o la perdita dell'embedding) di `idea_id`: rimuove i
+    suoi archi uscenti e aggiorna il top-k delle idee che la puntavano.
+    `incoming_sources` va raccolto prima della cancellazione (CASCADE).
+    """
+    sources = {idea_id, *incoming_sources}
+    lists = _outgoing(incoming_sources)
+    rescans = _Rescans(MAX_RESCANS)
+    pairs = []
+    for other in incoming_sources:
+        current = lists.get(other, {})
+        current.pop(idea_id, None)
+        # `other` puntava a idea_id: i suoi archi possono essere già spariti (CASCADE)
+        full = len(current) + 1 >= TOP_K
+        try:
+            pairs.extend((other, t, s) for t, s in _without(current, full, rescans, other))
+        except Idea.DoesNotExist:
+            continue
+
+    stats = sync_semantic_connections(pairs, STRONG_THRESHOLD, sources=sources)
+    logger.info(
+        f"🔁 Connessioni incrementali dopo la rimozione di Idea #{idea_id}: "
+        f"{len(incoming_sources)} liste aggiornate ({rescans.done} riscansioni, "
+        f"{rescans.skipped} rinviate), {stats['inserted']} nuove"
+    )
+    return stats
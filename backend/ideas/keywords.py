@@ -0,0 +1,190 @@
+# keywords.py
+# ---------------------------------------
+# 🏷️ MindLink Keyword Engine
+# ---------------------------------------
+# Estrazione keyword TF-IDF con IDF calcolata sull'intero corpus:
+# - le document frequency dei termini di Idea.content sono salvate in
+#   TermDocumentFrequency e aggiornate in modo incrementale (signals)
+# - ogni processo ne tiene una copia in memoria, ricaricata ogni MAX_AGE s
+# - extract_keywords_batch() costruisce una sola matrice sparsa
+#   documenti x termini (conteggi) e la pesa con l'IDF in un'unica operazione
+#
+# Tokenizzazione equivalente a quella del vecchio TfidfVectorizer:
+# clean_text, minuscolo, token di almeno 2 caratteri, stopwords italiane.
+
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .text_utils import ITALIAN_STOPWORDS, clean_text
+
+logger = logging.getLogger(__name__)
+
+KEYWORD_SETTINGS = getattr(settings, "MINDLINK_KEYWORDS", {})
+MAX_AGE = KEYWORD_SETTINGS.get("MAX_AGE", 300)  # secondi prima di ricaricare le df dal DB
+
+TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+STOPWORDS = frozenset(ITALIAN_STOPWORDS)
+MAX_TERM_LENGTH = 100  # TermDocumentFrequency.term
+BATCH_SIZE = 2000
+
+
+def tokenize(text: str) -> list[str]:
+    cleaned = clean_text(text).lower()
+    return [t for t in TOKEN_RE.findall(cleaned) if t not in STOPWORDS and len(t) <= MAX_TERM_LENGTH]
+
+
+def document_terms(text: str | None) -> set[str]:
+    return set(tokenize(text)) if text else set()
+
+
+class KeywordModel:
+    """Document frequency del corpus in memoria + IDF smussata (come sklearn)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.df: dict[str, int] = {}
+        self.n_docs = 0
+        self.built_at = 0.0
+
+    def refresh(self):
+        from .models import Idea, TermDocumentFrequency
+
+        df = dict(TermDocumentFrequency.objects.values_list("term", "df").iterator(chunk_size=BATCH_SIZE))
+        n_docs = Idea.objects.count()
+        with self._lock:
+            self.df, self.n_docs = df, n_docs
+            self.built_at = time.monotonic()
+        logger.info(f"🏷️ Modello keyword caricato: {len(df)} termini su {n_docs} documenti")
+        return self
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.built_at > MAX_AGE
+
+    def apply(self, added=(), removed=(), docs_delta: int = 0):
+        """Riflette in memoria un aggiornamento già scritto nel DB."""
+        with self._lock:
+            for term in added:
+                self.df[term] = self.df.get(term, 0) + 1
+            for term in removed:
+                count = self.df.get(term, 0) - 1
+                if count > 0:
+                    self.df[term] = count
+                else:
+                    self.df.pop(term, None)
+            self.n_docs = max(0, self.n_docs + docs_delta)
+
+    def idf(self, terms: list[str]) -> np.ndarray:
+        # idf = ln((1 + N) / (1 + df)) + 1: i termini mai visti pesano di più
+        with self._lock:
+            n_docs = self.n_docs
+            df = np.fromiter((self.df.get(t, 0) for t in terms), dtype=np.float64, count=len(terms))
+        return np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+
+    def extract_batch(self, texts, top_k: int = 5) -> list[list[str]]:
+        """Top-k termini per documento per peso tf-idf (parità: ordine alfabetico)."""
+        from scipy import sparse
+
+        docs = [tokenize(t) if t else [] for t in texts]
+        vocab: dict[str, int] = {}
+        rows, cols = [], []
+        for r, tokens in enumerate(docs):
+            for token in tokens:
+                cols.append(vocab.setdefault(token, len(vocab)))
+            rows.extend([r] * len(tokens))
+        if not vocab:
+            return [[] for _ in docs]
+
+        terms = list(vocab)
+        counts = sparse.csr_matrix(
+            (np.ones(len(cols), dtype=np.float64), (rows, cols)), shape=(len(docs), len(terms))
+        )
+        counts.sum_duplicates()
+        scores = (counts @ sparse.diags(self.idf(terms))).tocsr()
+
+        keywords = []
+        for r in range(len(docs)):
+            start, end = scores.indptr[r], scores.indptr[r + 1]
+            row = sorted(
+                zip(scores.data[start:end].tolist(), scores.indices[start:end].tolist()),
+                key=lambda x: (-x[0], terms[x[1]]),
+            )
+            keywords.append([terms[c] for _, c in row[:top_k]])
+        return keywords
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_keyword_model() -> KeywordModel:
+    global _model
+    model = _model
+    if model is None or model.is_stale():
+        with _model_lock:
+            if _model is None or _model.is_stale():
+                _model = KeywordModel().refresh()
+            model = _model
+    return model
+
+
+def extract_keywords_batch(texts, top_k: int = 5) -> list[list[str]]:
+    return get_keyword_model().extract_batch(texts, top_k)
+
+
+# =====================================================
+# 🔹 AGGIORNAMENTI INCREMENTALI (signals)
+# =====================================================
+def update_document_frequencies(old_text: str | None, new_text: str | None, docs_delta: int = 0):
+    """
+    Applica la differenza tra i termini di old_text e new_text
+    (None = documento assente: creazione o eliminazione).
+    """
+    from .models import TermDocumentFrequency
+
+    old_terms, new_terms = document_terms(old_text), document_terms(new_text)
+    added, removed = list(new_terms - old_terms), list(old_terms - new_terms)
+    if not added and not removed and not docs_delta:
+        return
+
+    qs = TermDocumentFrequency.objects
+    with transaction.atomic():
+        if added:
+            qs.bulk_create([TermDocumentFrequency(term=t, df=0) for t in added], ignore_conflicts=True)
+            qs.filter(term__in=added).update(df=F("df") + 1)
+        if removed:
+            qs.filter(term__in=removed, df__gt=0).update(df=F("df") - 1)
+            qs.filter(term__in=removed, df=0).delete()
+
+    if _model is not None:
+        _model.apply(added, removed, docs_delta)
+
+
+def rebuild_document_frequencies() -> dict:
+    """Ricalcola da zero le document frequency di tutto il corpus."""
+    from .models import Idea, TermDocumentFrequency
+
+    started = time.perf_counter()
+    counter, n_docs = Counter(), 0
+    for content in Idea.objects.values_list("content", flat=True).iterator(chunk_size=BATCH_SIZE):
+        counter.update(document_terms(content))
+        n_docs += 1
+
+    with transaction.atomic():
+        TermDocumentFrequency.objects.all().delete()
+        TermDocumentFrequency.objects.bulk_create(
+            [TermDocumentFrequency(term=t, df=c) for t, c in counter.items()], batch_size=BATCH_SIZE
+        )
+
+    global _model
+    _model = None
+    elapsed = time.perf_counter() - started
+    logger.info(f"🏷️ Document frequency ricalcolate: {len(counter)} termini, {n_docs} documenti in {elapsed:.1f}s")
+    return {"terms": len(counter), "documents": n_docs, "seconds": round(elapsed, 2)}
@@ -0,0 +1,57 @@
+# ideas/management/commands/all_pairs_job.py
+# Ricalcolo all-vs-all delle connessioni semantiche per corpus molto grandi:
+# shard di righe calcolati in parallelo su più processi, con checkpoint
+# (vedi ideas/all_pairs_job.py).
+#
+#   python manage.py all_pairs_job --workers 8
+#   python manage.py all_pairs_job --resume          # riprende un job interrotto
+#   python manage.py all_pairs_job --shard 3 --no-write   # un solo shard (es. su un altro nodo)
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ideas.all_pairs_job import JOB_DIR, iter_job_pairs, prepare_job, read_manifest, run_job, run_shard
+from ideas.connection_writer import sync_semantic_connections
+
+
+class Command(BaseCommand):
+    help = "Ricalcola le connessioni semantiche con un job all-pairs a shard, multi-processo e riprendibile."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--job-dir", default=None, help="directory del job (default MINDLINK_ALL_PAIRS['JOB_DIR'])")
+        parser.add_argument("--top-k", type=int, default=20)
+        parser.add_argument("--min-threshold", type=float, default=0.6)
+        parser.add_argument("--strong-threshold", type=float, default=0.85)
+        parser.add_argument("--shard-rows", type=int, default=None)
+        parser.add_argument("--workers", type=int, default=None)
+        parser.add_argument("--resume", action="store_true", help="riusa matrice e shard già calcolati")
+        parser.add_argument("--shard", type=int, default=None, help="calcola solo questo shard")
+        parser.add_argument("--no-write", action="store_true", help="non applicare il risultato al DB")
+
+    def handle(self, *args, **opts):
+        job_dir = opts["job_dir"] or JOB_DIR
+        manifest = read_manifest(job_dir) if opts["resume"] or opts["shard"] is not None else None
+        if manifest is None:
+            if opts["shard"] is not None:
+                raise CommandError("--shard richiede un job già preparato nella directory indicata")
+            manifest = prepare_job(opts["top_k"], opts["min_threshold"], job_dir, opts["shard_rows"])
+        if manifest["count"] < 2:
+            self.stderr.write("Servono almeno due idee con embedding.")
+            return
+
+        if opts["shard"] is not None:
+            shard = manifest["shards"][opts["shard"]]
+            index, n_pairs = run_shard(job_dir, shard, manifest["top_k"], manifest["min_threshold"], manifest["count"])
+            self.stdout.write(f"✅ Shard {index}: {n_pairs} coppie (verrà riusato da --resume)")
+            return
+
+        manifest = run_job(job_dir, opts["workers"])
+        total = sum(s["pairs"] for s in manifest["shards"])
+        self.stdout.write(f"🗂️ {len(manifest['shards'])} shard, {total} coppie per {manifest['count']} idee")
+
+        if opts["no_write"]:
+            return
+        stats = sync_semantic_connections(iter_job_pairs(job_dir), opts["strong_threshold"])
+        self.stdout.write(
+            f"🔗 Connessioni: {stats['inserted']} nuove, {stats['updated']} aggiornate, "
+            f"{stats['deleted']} eliminate, {stats['unchanged']} invariate"
+        )
@@ -0,0 +1,51 @@
+# ideas/management/commands/ann_report.py
+# Report recall@k / latenza: ricerca esatta vs IVF, per scegliere
+# MINDLINK_INDEX["IVF_LISTS"] / ["IVF_NPROBE"] / ["ANN_MIN_SIZE"] dai dati.
+#
+#   python manage.py ann_report --top-k 10 --nprobe 4 8 16 32
+#   python manage.py ann_report --synthetic 200000   # corpus sintetico a cluster
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ideas.ann import evaluate, synthetic_corpus
+
+
+class Command(BaseCommand):
+    help = "Confronta recall@k e latenza della ricerca esatta con l'indice IVF."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--lists", type=int, nargs="*", default=[0], help="n_lists da provare (0 = ~sqrt(N))")
+        parser.add_argument("--nprobe", type=int, nargs="*", default=[4, 8, 16, 32])
+        parser.add_argument("--synthetic", type=int, default=0, help="usa N vettori sintetici invece del DB")
+
+    def handle(self, *args, **opts):
+        if opts["synthetic"]:
+            matrix = synthetic_corpus(opts["synthetic"])
+            source = f"sintetico ({opts['synthetic']} vettori)"
+        else:
+            from ideas.vector_index import get_index
+
+            matrix, ids = get_index().dense_snapshot()
+            matrix = np.ascontiguousarray(matrix[ids >= 0])
+            source = f"DB ({matrix.shape[0]} vettori)"
+
+        if matrix.shape[0] < 2:
+            self.stderr.write("Servono almeno due vettori per il report.")
+            return
+
+        grid = [(n_lists or None, nprobe) for n_lists in opts["lists"] for nprobe in opts["nprobe"]]
+        self.stdout.write(f"📊 Corpus: {source}, top_k={opts['top_k']}, query={opts['queries']}")
+
+        report = evaluate(matrix, top_k=opts["top_k"], n_queries=opts["queries"], grid=grid)
+
+        header = f"{'mode':<6} {'n_lists':>8} {'nprobe':>7} {'build_s':>8} {'recall':>7} {'avg_ms':>8} {'p95_ms':>8} {'scanned':>8}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for row in report:
+            self.stdout.write(
+                f"{row['mode']:<6} {row['n_lists']!s:>8} {row['nprobe']!s:>7} {row['build_s']:>8} "
+                f"{row['recall']:>7} {row['avg_ms']:>8} {row['p95_ms']:>8} {row['scanned']:>8}"
+            )
@@ -0,0 +1,30 @@
+# ideas/management/commands/embedding_cache.py
+# Stato e manutenzione della cache persistente degli encode (vedi ideas/embedding_cache.py).
+#
+#   python manage.py embedding_cache                # voci per versione del modello
+#   python manage.py embedding_cache --prune        # riporta la cache a MAX_ENTRIES
+#   python manage.py embedding_cache --drop models/mindlink-v20250101-120000
+
+from django.core.management.base import BaseCommand
+
+from ideas.embedding_cache import MAX_ENTRIES, cache_stats, drop_version, prune
+
+
+class Command(BaseCommand):
+    help = "Mostra, riduce o svuota (per versione) la cache persistente degli embedding."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prune", action="store_true", help=f"elimina le voci LRU oltre il limite ({MAX_ENTRIES})")
+        parser.add_argument("--max-entries", type=int, default=None, help="limite alternativo per --prune")
+        parser.add_argument("--drop", metavar="VERSION", default=None, help="elimina tutte le voci di una versione")
+
+    def handle(self, *args, **opts):
+        if opts["drop"]:
+            self.stdout.write(f"🧹 Eliminate {drop_version(opts['drop'])} voci di {opts['drop']}")
+        if opts["prune"]:
+            self.stdout.write(f"🧹 Eliminate {prune(opts['max_entries'])} voci meno recenti")
+
+        stats = cache_stats()
+        self.stdout.write(f"🗄️ {sum(stats.values())} voci in cache")
+        for version, count in stats.items():
+            self.stdout.write(f"   {count:>8}  {version}")
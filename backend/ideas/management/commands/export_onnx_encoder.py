@@ -0,0 +1,71 @@
+# ideas/management/commands/export_onnx_encoder.py
+# Esporta il modello corrente (o quello indicato) in ONNX, con variante int8,
+# e confronta parità e prestazioni con PyTorch (vedi ideas/onnx_encoder.py).
+#
+#   python manage.py export_onnx_encoder --check --benchmark
+#   python manage.py export_onnx_encoder --model models/mindlink-v20250101-120000 --no-quantize
+
+from django.core.management.base import BaseCommand
+
+from ideas.onnx_encoder import OnnxEncoder, benchmark, check_parity, export_onnx, onnx_dir_for
+
+SAMPLE_TEXTS = [
+    "Un'app che collega studenti e tutor del quartiere per lezioni di recupero gratuite.",
+    "Pannelli solari condivisi sui tetti dei condomini per ridurre la bolletta energetica.",
+    "Piattaforma per prenotare visite mediche di base senza passare dal centralino.",
+    "Mostra d'arte diffusa nei negozi sfitti del centro storico.",
+    "Sensori low cost per misurare la qualità dell'aria vicino alle scuole.",
+    "Corso online di educazione finanziaria per giovani lavoratori.",
+    "Rete di biciclette cargo elettriche per le consegne dell'ultimo miglio.",
+    "Orti urbani gestiti dagli anziani insieme ai bambini delle elementari.",
+]
+
+
+class Command(BaseCommand):
+    help = "Esporta il sentence encoder in ONNX (int8 opzionale) con controllo di parità e benchmark."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default=None, help="path del modello (default: ultima versione mindlink-v*)")
+        parser.add_argument("--no-quantize", action="store_true", help="non produrre la variante int8")
+        parser.add_argument("--check", action="store_true", help="parità coseno con l'output torch")
+        parser.add_argument("--benchmark", action="store_true", help="latenza e throughput torch vs ONNX")
+        parser.add_argument("--samples", type=int, default=500, help="testi dal DB per parità/benchmark")
+
+    def handle(self, *args, **opts):
+        from ideas.analyze import get_latest_model_path
+
+        model_path = opts["model"] or get_latest_model_path()
+        quantize = not opts["no_quantize"]
+        meta = export_onnx(model_path, quantize=quantize)
+        directory = onnx_dir_for(model_path)
+        self.stdout.write(f"⚡ Export di {model_path} in {directory} ({meta['dim']} dim, int8={quantize})")
+
+        if not (opts["check"] or opts["benchmark"]):
+            return
+
+        from sentence_transformers import SentenceTransformer
+
+        from ideas.models import Idea
+
+        texts = [t for t in Idea.objects.values_list("content", flat=True)[:opts["samples"]] if t] or SAMPLE_TEXTS
+        encoders = {"torch": SentenceTransformer(model_path, device="cpu"),
+                    "onnx-fp32": OnnxEncoder(directory, quantized=False)}
+        if quantize:
+            encoders["onnx-int8"] = OnnxEncoder(directory, quantized=True)
+
+        if opts["check"]:
+            for name, encoder in encoders.items():
+                if name == "torch":
+                    continue
+                parity = check_parity(encoders["torch"], encoder, texts)
+                self.stdout.write(
+                    f"🔍 {name}: cos min={parity['cos_min']} mean={parity['cos_mean']} "
+                    f"top1={parity['top1_agreement']} ({parity['texts']} testi)"
+                )
+
+        if opts["benchmark"]:
+            header = f"{'encoder':<10} {'p50_ms':>8} {'p95_ms':>8} {'texts/s':>9}"
+            self.stdout.write(header)
+            self.stdout.write("-" * len(header))
+            for row in benchmark(encoders, texts):
+                self.stdout.write(f"{row['encoder']:<10} {row['p50_ms']:>8} {row['p95_ms']:>8} {row['texts_per_s']:>9}")
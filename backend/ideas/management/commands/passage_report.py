@@ -0,0 +1,78 @@
+# ideas/management/commands/passage_report.py
+# Recall sulle idee lunghe con e senza i passaggi (vedi ideas/passages.py):
+# la query è un estratto dell'ultimo passaggio di un'idea lunga, cioè testo
+# che l'encoder tronca quando codifica l'idea intera; un hit è l'idea di
+# partenza tra i primi top-k risultati.
+#
+#   python manage.py passage_report --queries 200 --top-k 5
+#   python manage.py passage_report --backfill   # passaggi per le idee lunghe che non li hanno
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from ideas import passages
+from ideas.analyze import generate_embedding, perform_full_analysis_batch, search_similar
+from ideas.models import Idea, IdeaPassage
+
+
+class Command(BaseCommand):
+    help = "Recall@k sulle idee lunghe: solo embedding dell'idea vs idea + passaggi."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--top-k", type=int, default=5)
+        parser.add_argument("--query-words", type=int, default=32, help="parole dell'estratto usato come query")
+        parser.add_argument("--backfill", action="store_true", help="analizza prima le idee lunghe senza passaggi")
+
+    def handle(self, *args, **opts):
+        if opts["backfill"]:
+            with_passages = IdeaPassage.objects.values("idea_id")
+            candidates = Idea.objects.exclude(id__in=with_passages).only("id", "content").order_by("id")
+            missing = [idea for idea in candidates.iterator(chunk_size=1000) if passages.chunk_spans(idea.content)]
+            updated = perform_full_analysis_batch(missing)
+            self.stdout.write(f"📑 Backfill: {updated} idee lunghe analizzate con i passaggi.")
+
+        last = list(IdeaPassage.objects.values("idea_id").annotate(last=Max("position")))
+        if not last:
+            self.stderr.write("Nessuna idea con passaggi (prova --backfill).")
+            return
+        random.Random(0).shuffle(last)
+        last = last[:opts["queries"]]
+        spans = passages.passage_spans((row["idea_id"], row["last"]) for row in last)
+        contents = Idea.objects.only("id", "content").in_bulk([row["idea_id"] for row in last])
+
+        hits = {"solo idea": 0, "idea + passaggi": 0}
+        timings = {name: [] for name in hits}
+        top_k = opts["top_k"]
+        for row in last:
+            idea_id = row["idea_id"]
+            start, end = spans[(idea_id, row["last"])]
+            words = contents[idea_id].content[start:end].split()
+            middle = max(0, len(words) // 2 - opts["query_words"] // 2)
+            query = generate_embedding(" ".join(words[middle:middle + opts["query_words"]]))
+
+            t0 = time.perf_counter()
+            ids, sims = search_similar(query, top_k, -1.0)
+            timings["solo idea"].append(time.perf_counter() - t0)
+            hits["solo idea"] += idea_id in ids
+
+            t0 = time.perf_counter()
+            found = passages.search_passages(query, top_k, -1.0)
+            merged, _ = passages.merge_hits(ids, sims, found, top_k)
+            timings["idea + passaggi"].append(time.perf_counter() - t0 + timings["solo idea"][-1])
+            hits["idea + passaggi"] += idea_id in merged
+
+        index = passages.get_passage_index()
+        self.stdout.write(
+            f"📑 {len(last)} query (estratti dell'ultimo passaggio), top_k={top_k}, "
+            f"indice passaggi: {len(index)} vettori, {index.nbytes / 1e6:.1f} MB"
+        )
+        for name in hits:
+            self.stdout.write(
+                f"   {name:<16} recall@{top_k} {hits[name] / len(last):.3f}   "
+                f"mediana {statistics.median(timings[name]) * 1000:.2f} ms"
+            )
@@ -0,0 +1,63 @@
+# ideas/management/commands/quantization_report.py
+# Benchmark del primo stadio quantizzato (int8 / PQ) o a dimensione ridotta
+# (PCA / troncamento Matryoshka) contro la ricerca float32 esatta usata da
+# find_similar_ideas_by_text: memoria, latenza, recall@k con e senza re-score.
+#
+#   python manage.py quantization_report --top-k 10 --pq-subspaces 48 96
+#   python manage.py quantization_report --pca-dims 64 96 128 --truncate-dims 128
+#   python manage.py quantization_report --synthetic 200000
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ideas.ann import synthetic_corpus
+from ideas.quantization import Int8Codec, PCACodec, PQCodec, TruncateCodec, evaluate_codecs
+
+
+class Command(BaseCommand):
+    help = "Confronta memoria, latenza e recall@k della ricerca float32 con int8 / PQ + re-score."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--rerank-factor", type=int, default=4)
+        parser.add_argument("--pq-subspaces", type=int, nargs="*", default=[48])
+        parser.add_argument("--pca-dims", type=int, nargs="*", default=[64, 128])
+        parser.add_argument("--truncate-dims", type=int, nargs="*", default=[], help="solo modelli Matryoshka")
+        parser.add_argument("--synthetic", type=int, default=0, help="usa N vettori sintetici invece del DB")
+
+    def handle(self, *args, **opts):
+        if opts["synthetic"]:
+            matrix = synthetic_corpus(opts["synthetic"])
+            source = f"sintetico ({opts['synthetic']} vettori)"
+        else:
+            from ideas.vector_index import get_index
+
+            matrix, ids = get_index().dense_snapshot()
+            matrix = np.ascontiguousarray(matrix[ids >= 0])
+            source = f"DB ({matrix.shape[0]} vettori)"
+
+        if matrix.shape[0] < 2:
+            self.stderr.write("Servono almeno due vettori per il report.")
+            return
+
+        codecs = [Int8Codec()] + [PQCodec(m=m) for m in opts["pq_subspaces"] if matrix.shape[1] % m == 0]
+        codecs += [PCACodec(dim=d) for d in opts["pca_dims"] if d < matrix.shape[1]]
+        codecs += [TruncateCodec(dim=d) for d in opts["truncate_dims"] if d < matrix.shape[1]]
+        self.stdout.write(
+            f"📊 Corpus: {source}, top_k={opts['top_k']}, query={opts['queries']}, "
+            f"re-score su top_k x {opts['rerank_factor']}"
+        )
+
+        report = evaluate_codecs(
+            matrix, codecs, top_k=opts["top_k"], n_queries=opts["queries"], rerank_factor=opts["rerank_factor"]
+        )
+
+        header = f"{'codec':<8} {'MB':>9} {'fit_s':>7} {'recall@1st':>10} {'recall':>7} {'avg_ms':>8} {'p95_ms':>8}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for row in report:
+            self.stdout.write(
+                f"{row['codec']:<8} {row['bytes'] / 1e6:>9.2f} {row['fit_s']:>7} {row['recall_first']:>10} "
+                f"{row['recall']:>7} {row['avg_ms']:>8} {row['p95_ms']:>8}"
+            )
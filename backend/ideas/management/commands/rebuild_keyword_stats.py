@@ -0,0 +1,20 @@
+# ideas/management/commands/rebuild_keyword_stats.py
+# Ricalcola da zero le document frequency usate come IDF dal motore keyword
+# (vedi ideas/keywords.py). Necessario una volta dopo la migration 0009;
+# in seguito le frequenze sono aggiornate in modo incrementale dai signals.
+#
+#   python manage.py rebuild_keyword_stats
+
+from django.core.management.base import BaseCommand
+
+from ideas.keywords import rebuild_document_frequencies
+
+
+class Command(BaseCommand):
+    help = "Ricalcola le document frequency dei termini su tutte le idee."
+
+    def handle(self, *args, **opts):
+        stats = rebuild_document_frequencies()
+        self.stdout.write(
+            f"🏷️ {stats['terms']} termini su {stats['documents']} documenti in {stats['seconds']}s"
+        )
@@ -0,0 +1,22 @@
+# ideas/management/commands/run_model_server.py
+# Avvia il model server locale (vedi ideas/model_server.py): carica il modello
+# una volta sola e serve encode/analisi ai worker Django su un socket Unix.
+#
+#   python manage.py run_model_server --threads 4
+#   # nei worker: MINDLINK_MODEL_SERVER["MODE"] = "client"
+
+from django.core.management.base import BaseCommand
+
+from ideas.model_server import SOCKET_PATH, run_server
+
+
+class Command(BaseCommand):
+    help = "Avvia il demone di inferenza condiviso dai worker (socket Unix)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=None, help=f"path del socket (default {SOCKET_PATH})")
+        parser.add_argument("--threads", type=int, default=None, help="thread intra-op di torch")
+
+    def handle(self, *args, **opts):
+        self.stdout.write(f"🛰️ Avvio model server su {opts['socket'] or SOCKET_PATH}...")
+        run_server(opts["socket"], opts["threads"])
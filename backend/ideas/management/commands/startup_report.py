@@ -0,0 +1,82 @@
+# ideas/management/commands/startup_report.py
+# Benchmark dei tempi di avvio: `manage.py check` e caricamento dell'app WSGI
+# (urls inclusi, come alla prima richiesta di un worker), ciascuno in un
+# processo Python nuovo. Riporta tempo, RSS massimo e quali librerie AI
+# pesanti sono state importate: con gli import pigri nessuna deve comparire.
+# Per il confronto prima/dopo eseguirlo su due checkout diversi.
+#
+#   python manage.py startup_report --runs 5
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+HEAVY_MODULES = ("torch", "sentence_transformers", "transformers", "sklearn", "scipy", "onnxruntime")
+
+_SETUP = (
+    "import json, os, sys\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mindlink_core.settings')\n"
+)
+_REPORT = f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))\n"
+
+PROBES = {
+    "check": _SETUP + (
+        "import django\n"
+        "django.setup()\n"
+        "from django.core.management import call_command\n"
+        "call_command('check', verbosity=0)\n"
+    ) + _REPORT,
+    "wsgi": _SETUP + (
+        "from mindlink_core.wsgi import application\n"
+        "from django.urls import get_resolver\n"
+        "get_resolver().url_patterns\n"
+    ) + _REPORT,
+}
+
+
+def run_probe(code: str, cwd: str) -> dict:
+    """Esegue il probe in un processo nuovo: secondi, RSS massimo (MB), moduli pesanti caricati."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", code], cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = proc.stdout.read().decode("utf-8", "replace").strip().splitlines() or [""]
+    # wait4 invece di wait(): restituisce anche le risorse usate da questo figlio
+    _, status, usage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - started
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(output[-1])
+    return {
+        "seconds": elapsed,
+        "rss_mb": usage.ru_maxrss / 1024,  # Linux: KiB
+        "heavy": json.loads(output[-1]),
+    }
+
+
+class Command(BaseCommand):
+    help = "Misura il tempo di avvio di `manage.py check` e del caricamento WSGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="ripetizioni per probe (si riporta la mediana)")
+        parser.add_argument("--probe", choices=sorted(PROBES), nargs="*", default=sorted(PROBES))
+
+    def handle(self, *args, **opts):
+        cwd = str(settings.BASE_DIR)
+        header = f"{'probe':<8} {'median_s':>9} {'min_s':>7} {'rss_mb':>8}  moduli pesanti"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for name in opts["probe"]:
+            try:
+                runs = [run_probe(PROBES[name], cwd) for _ in range(opts["runs"])]
+            except RuntimeError as e:
+                self.stderr.write(f"❌ {name}: {e}")
+                continue
+            seconds = [r["seconds"] for r in runs]
+            self.stdout.write(
+                f"{name:<8} {statistics.median(seconds):>9.2f} {min(seconds):>7.2f} "
+                f"{max(r['rss_mb'] for r in runs):>8.0f}  {', '.join(runs[-1]['heavy']) or '-'}"
+            )
@@ -0,0 +1,79 @@
+# ideas/management/commands/summary_report.py
+# Costo del riassunto estrattivo al crescere della lunghezza del testo:
+# encode di tutte le frasi (comportamento precedente) contro le sole
+# candidate entro i budget di MINDLINK_SUMMARY (vedi ideas/summarizer.py).
+# L'encode usa direttamente il modello, senza cache degli embedding.
+#
+#   python manage.py summary_report
+#   python manage.py summary_report --sizes 1000 10000 100000 --runs 3
+
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from ideas.summarizer import candidate_sentences, for_encoding, pick_summary, split_sentences
+
+WORDS = (
+    "idea progetto rete nodo connessione modello utente testo ricerca analisi dati "
+    "sistema grafo embedding frase vettore indice memoria tempo costo risultato "
+    "processo sviluppo prodotto mercato cliente servizio piattaforma energia città"
+).split()
+
+
+def synthetic_text(chars: int, seed: int = 0) -> str:
+    """Testo di circa `chars` caratteri fatto di frasi distinte di 8-30 parole."""
+    rng = random.Random(seed)
+    sentences, length = [], 0
+    while length < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 30))).capitalize() + "."
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(sentences)
+
+
+class Command(BaseCommand):
+    help = "Benchmark del riassunto: tutte le frasi vs candidate entro budget, per lunghezza del testo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="caratteri per testo")
+        parser.add_argument("--runs", type=int, default=3)
+        parser.add_argument("--batch-size", type=int, default=64)
+
+    def handle(self, *args, **opts):
+        from ideas.analyze import get_model
+
+        model = get_model()
+
+        def encode(sentences):
+            return model.encode(sentences, batch_size=opts["batch_size"], convert_to_numpy=True, show_progress_bar=False)
+
+        def timed(fn):
+            samples = []
+            for _ in range(opts["runs"]):
+                t0 = time.perf_counter()
+                result = fn()
+                samples.append(time.perf_counter() - t0)
+            return result, statistics.median(samples) * 1000
+
+        self.stdout.write(f"✂️ Riassunto, mediana su {opts['runs']} run:")
+        self.stdout.write(f"   {'caratteri':>9} {'frasi':>6} {'ms tutte':>10} {'cand.':>6} {'ms budget':>10}  stessa frase")
+        for chars in opts["sizes"]:
+            text = synthetic_text(chars, seed=chars)
+
+            def full():
+                sentences = split_sentences(text)
+                return pick_summary(text, sentences, encode(sentences), n_sentences=1)
+
+            def bounded():
+                sentences = candidate_sentences(text)
+                return pick_summary(text, sentences, encode([for_encoding(s) for s in sentences]), n_sentences=1)
+
+            full_summary, full_ms = timed(full)
+            bounded_summary, bounded_ms = timed(bounded)
+            self.stdout.write(
+                f"   {chars:>9} {len(split_sentences(text)):>6} {full_ms:>10.1f} "
+                f"{len(candidate_sentences(text)):>6} {bounded_ms:>10.1f}  "
+                f"{'sì' if full_summary == bounded_summary else 'no'}"
+            )
@@ -0,0 +1,77 @@
+# ideas/management/commands/token_cache_report.py
+# Quanto costa la tokenizzazione in un re-embedding completo del corpus e
+# quanto si risparmia leggendo i token id dalla cache (vedi ideas/token_cache.py).
+# I tempi sono riportati per 10k idee.
+#
+#   python manage.py token_cache_report --ideas 10000 --batch-size 64
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ideas.embedding_cache import content_hash
+from ideas.models import Idea, TokenCacheEntry
+from ideas.text_utils import clean_text
+from ideas.token_cache import encode_ids, lookup, store, tokenize, tokenizer_hash
+from ideas.warmup import SAMPLE_TEXTS
+
+
+class Command(BaseCommand):
+    help = "Benchmark: tokenizzazione vs lettura dei token id dalla cache, per 10k idee."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ideas", type=int, default=10_000, help="testi da codificare (idee del DB, ripetute se poche)")
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument("--keep", action="store_true", help="non rimuovere dalla cache le voci del benchmark")
+
+    def handle(self, *args, **opts):
+        from ideas.analyze import get_model
+
+        model = get_model()
+        tok_hash = tokenizer_hash(model)
+        if tok_hash is None:
+            self.stderr.write("Il modello corrente non espone il tokenizer (model server?): niente da misurare.")
+            return
+
+        base = [clean_text(c) for c in Idea.objects.values_list("content", flat=True)[:opts["ideas"]]]
+        base = [t for t in base if t] or SAMPLE_TEXTS
+        # Testi distinti: le ripetizioni ricevono un suffisso, così non collassano sulla stessa chiave
+        texts = [base[i % len(base)] + ("" if i < len(base) else f" #{i}") for i in range(opts["ideas"])]
+        hashes = [content_hash(t) for t in texts]
+        scale = 10_000 / len(texts)
+
+        timings = {}
+        t0 = time.perf_counter()
+        token_ids = tokenize(model, texts)
+        timings["tokenizzazione"] = time.perf_counter() - t0
+
+        existing = set(lookup(tok_hash, hashes))
+        store(tok_hash, dict(zip(hashes, token_ids)))
+        t0 = time.perf_counter()
+        cached = lookup(tok_hash, hashes)
+        timings["lettura cache token"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        encode_ids(model, [cached[h] for h in hashes], opts["batch_size"])
+        timings["forward transformer"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        model.encode(texts, batch_size=opts["batch_size"], convert_to_numpy=True, show_progress_bar=False)
+        timings["encode senza cache"] = time.perf_counter() - t0
+
+        with_cache = timings["lettura cache token"] + timings["forward transformer"]
+        saved = timings["encode senza cache"] - with_cache
+
+        self.stdout.write(f"🔤 {len(texts)} testi, tokenizer {tok_hash[:12]}, tempi per 10k idee:")
+        for name, seconds in timings.items():
+            self.stdout.write(f"   {name:<22} {seconds * scale:>8.2f}s")
+        self.stdout.write(f"   {'encode con cache':<22} {with_cache * scale:>8.2f}s")
+        self.stdout.write(
+            f"   risparmio: {saved * scale:.2f}s per 10k idee "
+            f"({saved / timings['encode senza cache'] * 100:.1f}%)"
+        )
+
+        if not opts["keep"]:
+            added = list(set(hashes) - existing)
+            for start in range(0, len(added), 1000):
+                TokenCacheEntry.objects.filter(tokenizer_hash=tok_hash, content_hash__in=added[start:start + 1000]).delete()
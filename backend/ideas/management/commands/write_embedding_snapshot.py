@@ -0,0 +1,22 @@
+# ideas/management/commands/write_embedding_snapshot.py
+# Scrive una nuova versione dello snapshot embedding condiviso dai worker
+# (vedi ideas/embedding_snapshot.py). Pensato per cron o dopo un re-embedding:
+#
+#   python manage.py write_embedding_snapshot
+
+from django.core.management.base import BaseCommand
+
+from ideas.embedding_snapshot import write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Scrive lo snapshot memory-mapped degli embedding (ids + float32 normalizzati)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default=None, help="directory di destinazione (default MINDLINK_SNAPSHOT['DIR'])")
+
+    def handle(self, *args, **opts):
+        meta = write_snapshot(opts["dir"])
+        self.stdout.write(
+            f"📸 Snapshot v{meta['version']} scritto: {meta['count']} vettori, {meta['dim']} dim"
+        )
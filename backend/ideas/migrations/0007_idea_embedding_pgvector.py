@@ -0,0 +1,63 @@
+# Colonna pgvector opzionale per la ricerca dei vicini direttamente nel DB.
+# Se l'estensione `vector` non è disponibile sul server la migration non fa
+# nulla e l'app continua a usare l'indice in-Python (vedi pgvector_backend.py).
+
+import logging
+
+from django.db import migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+TABLE = "ideas_idea"
+COLUMN = "embedding_vec"
+INDEX = "ideas_idea_embedding_vec_hnsw"
+DIM = 384
+
+
+def add_vector_column(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+
+    try:
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    except Exception as e:
+        logger.warning(f"⚠️ Estensione pgvector non disponibile, colonna {COLUMN} non creata: {e}")
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS {COLUMN} vector({DIM})")
+        # Backfill dal campo JSON: '[0.1, 0.2, ...]' è già un literal valido per pgvector
+        cursor.execute(
+            f"""
+            UPDATE {TABLE}
+            SET {COLUMN} = embedding::text::vector
+            WHERE jsonb_typeof(embedding) = 'array' AND jsonb_array_length(embedding) = %s
+            """,
+            [DIM],
+        )
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {INDEX} ON {TABLE} "
+            f"USING hnsw ({COLUMN} vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+        )
+
+
+def drop_vector_column(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DROP INDEX IF EXISTS {INDEX}")
+        cursor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS {COLUMN}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0006_idea_embedding_idea_used_for_training"),
+    ]
+
+    operations = [
+        migrations.RunPython(add_vector_column, drop_vector_column),
+    ]
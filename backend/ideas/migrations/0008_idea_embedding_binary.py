@@ -0,0 +1,65 @@
+# Embedding da JSON (lista di float) a bytea con float32 contigui:
+# ~1.5 KB per riga invece di ~8 KB, letti con np.frombuffer senza parsing.
+
+import json
+
+import numpy as np
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+
+def json_to_binary(apps, schema_editor):
+    Idea = apps.get_model("ideas", "Idea")
+    batch = []
+    for idea in Idea.objects.only("id", "embedding").iterator(chunk_size=BATCH_SIZE):
+        emb = idea.embedding
+        if isinstance(emb, str):
+            emb = json.loads(emb)
+        if emb:
+            idea.embedding_bin = np.asarray(emb, dtype=np.float32).tobytes()
+            batch.append(idea)
+        if len(batch) >= BATCH_SIZE:
+            Idea.objects.bulk_update(batch, ["embedding_bin"])
+            batch = []
+    if batch:
+        Idea.objects.bulk_update(batch, ["embedding_bin"])
+
+
+def binary_to_json(apps, schema_editor):
+    Idea = apps.get_model("ideas", "Idea")
+    batch = []
+    for idea in Idea.objects.only("id", "embedding_bin").iterator(chunk_size=BATCH_SIZE):
+        data = idea.embedding_bin
+        idea.embedding = np.frombuffer(data, dtype=np.float32).tolist() if data else []
+        batch.append(idea)
+        if len(batch) >= BATCH_SIZE:
+            Idea.objects.bulk_update(batch, ["embedding"])
+            batch = []
+    if batch:
+        Idea.objects.bulk_update(batch, ["embedding"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0007_idea_embedding_pgvector"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idea",
+            name="embedding_bin",
+            field=models.BinaryField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(json_to_binary, binary_to_json),
+        migrations.RemoveField(
+            model_name="idea",
+            name="embedding",
+        ),
+        migrations.RenameField(
+            model_name="idea",
+            old_name="embedding_bin",
+            new_name="embedding",
+        ),
+    ]
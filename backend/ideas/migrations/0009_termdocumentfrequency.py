@@ -0,0 +1,22 @@
+# Document frequency dei termini per il motore keyword TF-IDF (ideas/keywords.py).
+# Popolamento iniziale: migrazione 0013 (o `python manage.py rebuild_keyword_stats`)
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0008_idea_embedding_binary"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TermDocumentFrequency",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("term", models.CharField(max_length=100, unique=True)),
+                ("df", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Cache persistente degli encode per (versione modello, hash del testo) (ideas/embedding_cache.py).
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0009_termdocumentfrequency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmbeddingCacheEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("model_version", models.CharField(max_length=255)),
+                ("content_hash", models.CharField(max_length=64)),
+                ("vector", models.BinaryField()),
+                ("last_used", models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                "unique_together": {("model_version", "content_hash")},
+            },
+        ),
+    ]
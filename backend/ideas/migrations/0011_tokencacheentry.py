@@ -0,0 +1,25 @@
+# Cache persistente dei token id per (hash del tokenizer, hash del testo) (ideas/token_cache.py).
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0010_embeddingcacheentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TokenCacheEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("tokenizer_hash", models.CharField(max_length=64)),
+                ("content_hash", models.CharField(max_length=64)),
+                ("token_ids", models.BinaryField()),
+            ],
+            options={
+                "unique_together": {("tokenizer_hash", "content_hash")},
+            },
+        ),
+    ]
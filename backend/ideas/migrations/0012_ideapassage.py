@@ -0,0 +1,33 @@
+# Passaggi sovrapposti delle idee lunghe con embedding float16 (ideas/passages.py).
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0011_tokencacheentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IdeaPassage",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("position", models.PositiveIntegerField()),
+                ("start", models.PositiveIntegerField()),
+                ("end", models.PositiveIntegerField()),
+                ("embedding", models.BinaryField()),
+                (
+                    "idea",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name="passages", to="ideas.idea"
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("idea", "position")},
+            },
+        ),
+    ]
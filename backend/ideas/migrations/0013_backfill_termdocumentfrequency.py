@@ -0,0 +1,36 @@
+# Popola TermDocumentFrequency per i corpus esistenti (0009 crea la tabella vuota:
+# senza document frequency l'IDF è uguale per tutti i termini).
+# Equivalente a `python manage.py rebuild_keyword_stats`, eseguito solo se la tabella è vuota.
+
+from collections import Counter
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_document_frequencies(apps, schema_editor):
+    from ideas.keywords import document_terms
+
+    Idea = apps.get_model("ideas", "Idea")
+    TermDocumentFrequency = apps.get_model("ideas", "TermDocumentFrequency")
+    if TermDocumentFrequency.objects.exists():
+        return
+
+    counter = Counter()
+    for content in Idea.objects.values_list("content", flat=True).iterator(chunk_size=BATCH_SIZE):
+        counter.update(document_terms(content))
+    TermDocumentFrequency.objects.bulk_create(
+        [TermDocumentFrequency(term=t, df=c) for t, c in counter.items()], batch_size=BATCH_SIZE
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0012_ideapassage"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_document_frequencies, migrations.RunPython.noop),
+    ]
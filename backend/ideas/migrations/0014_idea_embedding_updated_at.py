@@ -0,0 +1,20 @@
+# Timestamp dell'ultima scrittura dell'embedding: il delta degli snapshot
+# (embedding_snapshot.SnapshotIndex.refresh_delta) vede così anche le idee
+# create prima dello snapshot ma analizzate dopo.
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ideas", "0013_backfill_termdocumentfrequency"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="idea",
+            name="embedding_updated_at",
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
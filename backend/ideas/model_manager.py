@@ -0,0 +1,171 @@
+# model_manager.py
+# ---------------------------------------
+# 🔁 MindLink Model Manager
+# ---------------------------------------
+# Ciclo di vita thread-safe del modello di encoding:
+# - caricamento pigro con double-checked locking (un solo load anche con
+#   molte richieste concorrenti al primo avvio)
+# - promote(): costruisce la nuova versione fuori dal lock mentre la
+#   vecchia continua a servire, poi la sostituisce in modo atomico
+# - on_swap (chiamato sotto lock) invalida le cache legate al modello
+# - i lease contano le chiamate in corso: la versione sostituita viene
+#   rilasciata solo dopo che sono terminate; se restano chiamate dopo
+#   DRAIN_TIMEOUT il riferimento non viene toccato (lo libera il GC)
+# - adopt(): installa una versione caricata altrove (es. dal model server)
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class ModelSlot:
+    """Una versione caricata del modello con il conteggio delle chiamate in corso."""
+
+    def __init__(self, model, version: str, dim: int):
+        self.model = model
+        self.version = version
+        self.dim = dim
+        self.loaded_at = time.time()
+        self._inflight = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            self._inflight += 1
+
+    def release(self):
+        with self._cond:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._cond.notify_all()
+
+    def drain(self, timeout: float) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self._inflight == 0, timeout=timeout)
+
+    @property
+    def inflight(self) -> int:
+        return self._inflight
+
+
+class ModelManager:
+    """
+    loader(path) → ModelSlot (path None = versione più recente);
+    on_swap(slot) aggiorna lo stato derivato del chiamante sotto lock.
+    """
+
+    def __init__(self, loader, on_swap=None, drain_timeout: float = 60.0):
+        self.loader = loader
+        self.on_swap = on_swap
+        self.drain_timeout = drain_timeout
+        self._slot: ModelSlot | None = None
+        self._lock = threading.Lock()        # protegge _slot
+        self._build_lock = threading.Lock()  # una sola build alla volta
+        self._building: threading.Thread | None = None
+
+    def current(self) -> ModelSlot:
+        slot = self._slot
+        if slot is None:
+            with self._lock:
+                if self._slot is None:
+                    self._install(self.loader(None))
+                slot = self._slot
+        return slot
+
+    def _install(self, slot: ModelSlot) -> ModelSlot | None:
+        """Da chiamare con _lock acquisito."""
+        old, self._slot = self._slot, slot
+        if self.on_swap is not None:
+            self.on_swap(slot)
+        return old
+
+    @contextmanager
+    def lease(self):
+        """Slot corrente, protetto dal rilascio finché il blocco non termina."""
+        while True:
+            slot = self.current()
+            slot.acquire()
+            # Tra current() e acquire() una promozione può aver sostituito lo slot
+            # (e _retire averlo già rilasciato): in quel caso si riprova sul nuovo
+            if slot is self._slot and slot.model is not None:
+                break
+            slot.release()
+        try:
+            yield slot
+        finally:
+            slot.release()
+
+    # =====================================================
+    # 🔹 PROMOZIONE (hot swap)
+    # =====================================================
+    def promote(self, path: str | None = None, wait: bool = False):
+        """
+        Carica `path` (default: ultima versione) e la rende corrente.
+        wait=False: build in background, la versione attuale continua a servire.
+        """
+        if not wait:
+            thread = threading.Thread(target=self._promote, args=(path,), name="model-promote", daemon=True)
+            self._building = thread
+            thread.start()
+            return thread
+        return self._promote(path)
+
+    def _promote(self, path: str | None) -> ModelSlot | None:
+        with self._build_lock:
+            started = time.perf_counter()
+            try:
+                new = self.loader(path)
+            except Exception as e:
+                logger.error(f"⚠️ Promozione del modello {path or '(ultima versione)'} fallita: {e}")
+                return None
+
+            with self._lock:
+                old = self._install(new)
+            logger.info(
+                f"🔁 Modello promosso: {old.version if old else '-'} → {new.version} "
+                f"(build {time.perf_counter() - started:.1f}s)"
+            )
+
+        if old is not None and old is not new:
+            self._retire(old)
+        return new
+
+    def adopt(self, slot: ModelSlot):
+        """
+        Rende corrente uno slot già pronto, senza loader né build (es. versione
+        promossa nel model server da un altro worker). Il modello precedente
+        non viene chiuso: può essere condiviso con il nuovo slot.
+        """
+        with self._lock:
+            old = self._install(slot)
+        logger.info(f"🔁 Versione adottata: {old.version if old else '-'} → {slot.version}")
+
+    def _retire(self, old: ModelSlot):
+        """Attende le chiamate in corso sulla versione sostituita, poi la rilascia."""
+        if not old.drain(self.drain_timeout):
+            # Chiamate ancora in corso: chiudere ora le interromperebbe, il GC
+            # libererà il modello quando l'ultimo lease lo rilascia
+            logger.warning(
+                f"⚠️ {old.inflight} chiamate ancora in corso su {old.version} dopo {self.drain_timeout}s: "
+                f"rilascio lasciato al GC"
+            )
+            return
+        close = getattr(old.model, "close", None)
+        if callable(close):
+            close()
+        old.model = None
+        logger.info(f"🧹 Versione {old.version} rilasciata")
+
+    def status(self) -> dict:
+        slot = self._slot
+        return {
+            "loaded": slot is not None,
+            "version": slot.version if slot else None,
+            "dim": slot.dim if slot else None,
+            "inflight": slot.inflight if slot else 0,
+            "loaded_at": slot.loaded_at if slot else None,
+            "building": bool(self._building and self._building.is_alive()),
+        }
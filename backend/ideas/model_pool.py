@@ -0,0 +1,309 @@
+# model_pool.py
+# ---------------------------------------
+# 🎛️ MindLink Model Pool
+# ---------------------------------------
+# Encoder alternativi al modello principale, scelti per utente tramite la
+# preferenza `ai.model` (A/B test, confronto tra versioni mindlink-v*):
+# - caricati su richiesta, solo tra i nomi ammessi (ALLOWED + models/mindlink-v*)
+# - ogni modello ha il proprio spazio di embedding: i vettori delle idee
+#   vengono dalla cache persistente (embedding_cache) con la versione del
+#   modello come chiave, quindi dopo la prima costruzione non serve inferenza
+# - ogni modello ha il proprio EmbeddingIndex, costruito in background (finché
+#   non è pronto la ricerca usa il modello principale) e ricostruito dopo
+#   MAX_AGE continuando a servire il precedente; i testi invariati riusano
+#   i vettori già indicizzati
+# - invalidate_idea() (signals): un'idea modificata esce subito dagli indici
+#   del pool e viene ricodificata in background, una eliminata viene rimossa
+# - RAM_BUDGET_MB limita pesi + indici del pool: oltre il budget si scarica
+#   il modello usato meno di recente (LRU)
+#
+# Il modello principale (analyze.get_model, Idea.embedding, pgvector,
+# connessioni) resta fuori dal pool e dal budget.
+
+import glob
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .embedding_cache import content_hash, encode_with_cache
+from .text_utils import clean_text
+from .vector_index import EmbeddingIndex
+
+logger = logging.getLogger(__name__)
+
+POOL_SETTINGS = getattr(settings, "MINDLINK_MODEL_POOL", {})
+POOL_ENABLED = POOL_SETTINGS.get("ENABLED", False)
+RAM_BUDGET_MB = POOL_SETTINGS.get("RAM_BUDGET_MB", 2048)
+# Modelli base selezionabili oltre alle versioni models/mindlink-v*
+ALLOWED_MODELS = POOL_SETTINGS.get("ALLOWED", ["all-MiniLM-L6-v2"])
+ENCODE_CHUNK = 256
+
+_pools = weakref.WeakSet()  # pool vivi nel processo, raggiunti dai signals
+
+
+def available_models() -> dict[str, str]:
+    """Nome selezionabile → path caricabile."""
+    models = {name: name for name in ALLOWED_MODELS}
+    for path in sorted(glob.glob("models/mindlink-v*")):
+        models[os.path.basename(path)] = path
+    return models
+
+
+def resolve_model(name: str | None) -> str | None:
+    """Path del modello richiesto, o None se il nome non è ammesso (mai caricare nomi arbitrari)."""
+    if not name:
+        return None
+    models = available_models()
+    path = models.get(name) or models.get(os.path.basename(os.path.normpath(name)))
+    if path is None:
+        logger.warning(f"⚠️ Modello '{name}' non disponibile nel pool: uso il modello principale.")
+    return path
+
+
+def model_nbytes(model) -> int:
+    """Stima della RAM occupata dai pesi (torch: parametri; ONNX: file del modello)."""
+    parameters = getattr(model, "parameters", None)
+    if callable(parameters):
+        return sum(p.numel() * p.element_size() for p in parameters())
+    session = getattr(model, "session", None)
+    if session is not None and getattr(model, "meta", None):
+        from .onnx_encoder import MODEL_FILE, QUANTIZED_FILE, onnx_dir_for
+
+        filename = QUANTIZED_FILE if model.quantized else MODEL_FILE
+        path = os.path.join(onnx_dir_for(model.meta["source"]), filename)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+    return 0
+
+
+class PooledModel:
+    def __init__(self, name: str, slot):
+        self.name = name
+        self.slot = slot
+        self.model_bytes = model_nbytes(slot.model)
+        self.index: EmbeddingIndex | None = None
+        self.last_used = time.time()
+        self._index_lock = threading.Lock()  # protegge l'avvio della build
+        self._building: threading.Thread | None = None
+        # {idea_id: hash del testo indicizzato}: al rebuild i vettori dei testi invariati
+        # vengono ripresi dall'indice corrente, senza cache né inferenza
+        self._hashes: dict[int, str] = {}
+        self._dirty: set[int] = set()  # idee modificate, da ricodificare e reinserire
+
+    @property
+    def nbytes(self) -> int:
+        return self.model_bytes + (self.index.nbytes if self.index is not None else 0)
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        return encode_with_cache(
+            self.slot.version, texts,
+            lambda chunk: self.slot.model.encode(chunk, convert_to_numpy=True, show_progress_bar=False),
+        )
+
+    def _idea_vectors(self):
+        """Embedding di tutte le idee nello spazio di questo modello (indice corrente, cache persistente o encode)."""
+        from .models import Idea
+
+        matrix, previous, hashes = None, {}, {}
+        if self.index is not None:
+            matrix, ids = self.index.dense_snapshot()
+            previous = {int(idea_id): row for row, idea_id in enumerate(ids) if idea_id >= 0}
+
+        def flush(chunk):
+            pending = [(i, t) for i, h, t in chunk if not (self._hashes.get(i) == h and i in previous)]
+            encoded = dict(zip([i for i, _ in pending], self.encode([t for _, t in pending]))) if pending else {}
+            for idea_id, h, _ in chunk:
+                hashes[idea_id] = h
+                yield idea_id, encoded[idea_id] if idea_id in encoded else matrix[previous[idea_id]]
+
+        rows = Idea.objects.values_list("id", "content").order_by("id").iterator(chunk_size=ENCODE_CHUNK)
+        chunk = []
+        for idea_id, content in rows:
+            cleaned = clean_text(content or "")
+            if cleaned:
+                chunk.append((idea_id, content_hash(cleaned), cleaned))
+            if len(chunk) >= ENCODE_CHUNK:
+                yield from flush(chunk)
+                chunk = []
+        if chunk:
+            yield from flush(chunk)
+        self._hashes = hashes
+
+    def _build_index(self):
+        """Eseguito su un thread dedicato (uno alla volta per modello, vedi get_index)."""
+        try:
+            # Senza codec: il re-score dei codec rileggerebbe Idea.embedding, che è nello
+            # spazio del modello principale e non in quello di questo modello
+            index = self.index if self.index is not None else EmbeddingIndex(source=self._idea_vectors)
+            index.rebuild()
+            self.index = index
+        except Exception as e:
+            logger.error(f"⚠️ Pool: costruzione dell'indice di {self.name} fallita: {e}")
+        finally:
+            close_old_connections()
+
+    def _update_dirty(self):
+        """Ricodifica le idee modificate e le reinserisce nell'indice corrente."""
+        from .models import Idea
+
+        with self._index_lock:
+            ids, self._dirty = self._dirty, set()
+        index = self.index
+        try:
+            if not ids or index is None:
+                return
+            rows = [
+                (idea_id, clean_text(content or ""))
+                for idea_id, content in Idea.objects.filter(id__in=ids).values_list("id", "content")
+            ]
+            rows = [(idea_id, cleaned) for idea_id, cleaned in rows if cleaned]
+            for start in range(0, len(rows), ENCODE_CHUNK):
+                chunk = rows[start:start + ENCODE_CHUNK]
+                for (idea_id, cleaned), vec in zip(chunk, self.encode([c for _, c in chunk])):
+                    index.upsert(idea_id, vec)
+                    self._hashes[idea_id] = content_hash(cleaned)
+        except Exception as e:
+            logger.error(f"⚠️ Pool: aggiornamento dell'indice di {self.name} fallito: {e}")
+            with self._index_lock:
+                self._dirty |= ids  # riprovate al prossimo aggiornamento
+        finally:
+            close_old_connections()
+
+    def _start(self, target) -> bool:
+        """Avvia `target` su un thread dedicato, se non c'è già una build o un aggiornamento in corso."""
+        with self._index_lock:
+            if self._building is not None and self._building.is_alive():
+                return False
+            self._building = threading.Thread(target=target, name=f"pool-index-{self.name}", daemon=True)
+            self._building.start()
+            return True
+
+    def get_index(self) -> EmbeddingIndex | None:
+        """
+        Indice del modello, costruito e aggiornato in background: None finché la
+        prima costruzione non è terminata; se scaduto continua a servire il precedente.
+        """
+        index = self.index
+        if index is None or index.is_stale():
+            self._start(self._build_index)
+        elif self._dirty:
+            self._start(self._update_dirty)
+        return index
+
+    def invalidate(self, idea_id: int, removed: bool = False):
+        """
+        Il contenuto di `idea_id` è cambiato (removed: idea eliminata): il vettore
+        indicizzato non vale più e la prossima ricostruzione non deve riusarlo.
+        """
+        self._hashes.pop(idea_id, None)
+        index = self.index
+        if index is not None:
+            index.remove(idea_id)
+        if not removed:
+            with self._index_lock:
+                self._dirty.add(idea_id)
+
+
+class ModelPool:
+    """Pool LRU di encoder con budget di RAM; loader(path) → ModelSlot."""
+
+    def __init__(self, loader, ram_budget_mb: float = RAM_BUDGET_MB):
+        self.loader = loader
+        self.budget = int(ram_budget_mb * 1e6)
+        self._entries: OrderedDict[str, PooledModel] = OrderedDict()
+        self._lock = threading.Lock()
+        self._loading: dict[str, threading.Lock] = {}
+        _pools.add(self)
+
+    def get(self, path: str) -> PooledModel:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None:
+                self._entries.move_to_end(path)
+                entry.last_used = time.time()
+                return entry
+            load_lock = self._loading.setdefault(path, threading.Lock())
+
+        # Un solo caricamento per modello; gli altri modelli restano serviti nel frattempo
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(path)
+            if entry is None:
+                started = time.perf_counter()
+                try:
+                    entry = PooledModel(path, self.loader(path))
+                finally:
+                    with self._lock:
+                        self._loading.pop(path, None)
+                logger.info(
+                    f"🎛️ Pool: caricato {path} ({entry.model_bytes / 1e6:.0f} MB) "
+                    f"in {time.perf_counter() - started:.1f}s"
+                )
+                with self._lock:
+                    self._entries[path] = entry
+                    self._evict_locked(keep=path)
+        return entry
+
+    def _evict_locked(self, keep: str):
+        total = sum(e.nbytes for e in self._entries.values())
+        for name in list(self._entries):
+            if total <= self.budget:
+                break
+            if name == keep:
+                continue
+            evicted = self._entries.pop(name)
+            total -= evicted.nbytes
+            logger.info(f"🧹 Pool: scaricato {name} (LRU, budget {self.budget / 1e6:.0f} MB)")
+
+    def search_text(self, path: str, text: str, top_k: int, min_threshold: float, exclude_ids=()):
+        """
+        Top-k idee simili a `text` nello spazio di embedding del modello `path`;
+        None se l'indice del modello è ancora in costruzione (usare il modello principale).
+        """
+        entry = self.get(path)
+        index = entry.get_index()
+        if index is None:
+            return None
+        cleaned = clean_text(text)
+        if not cleaned:
+            return [], []
+        query = entry.encode([cleaned])[0]
+        with self._lock:
+            self._evict_locked(keep=path)  # l'indice appena costruito conta nel budget
+        return index.search(query, top_k, min_threshold, exclude_ids)
+
+    def invalidate(self, idea_id: int, removed: bool = False):
+        with self._lock:
+            entries = list(self._entries.values())
+        for entry in entries:
+            entry.invalidate(idea_id, removed)
+            if not removed:
+                # Ricodifica dopo il commit: il thread deve leggere il nuovo contenuto
+                transaction.on_commit(lambda entry=entry: entry.get_index())
+
+    def status(self) -> dict:
+        with self._lock:
+            entries = [
+                {
+                    "model": e.name,
+                    "version": e.slot.version,
+                    "model_mb": round(e.model_bytes / 1e6, 1),
+                    "index_size": len(e.index) if e.index is not None else 0,
+                    "total_mb": round(e.nbytes / 1e6, 1),
+                    "last_used": e.last_used,
+                }
+                for e in reversed(self._entries.values())
+            ]
+        return {"enabled": POOL_ENABLED, "budget_mb": round(self.budget / 1e6), "models": entries}
+
+
+def invalidate_idea(idea_id: int, removed: bool = False):
+    """Signals: contenuto di un'idea cambiato (o idea eliminata) → indici di tutti i pool del processo."""
+    for pool in list(_pools):
+        pool.invalidate(idea_id, removed)
@@ -0,0 +1,360 @@
+# model_server.py
+# ---------------------------------------
+# 🛰️ MindLink Model Server
+# ---------------------------------------
+# Demone locale che possiede il modello e serve encode/analisi su un
+# socket Unix, così i worker Django non importano torch né tengono una
+# copia del SentenceTransformer (MINDLINK_MODEL_SERVER["MODE"] = "client").
+#
+# Protocollo binario (big-endian, un frame per richiesta/risposta):
+#   richiesta: op (uint8) | lunghezza (uint32) | payload
+#   risposta:  stato (uint8, 0 = ok) | lunghezza (uint32) | payload
+#   - testi: count (uint32) + [len (uint32) + utf-8] per testo
+#   - matrice: righe (uint32) + dim (uint32) + float32 little-endian
+#   - versione: len (uint32) + utf-8, la versione del modello che ha calcolato la risposta
+#   - OP_ENCODE: testi → versione + matrice (output grezzo di model.encode)
+#   - OP_ANALYZE: testi → versione + json_len (uint32) + JSON [{summary, category, keywords, passages}]
+#     + matrice embedding + matrice degli embedding dei passaggi (concatenati)
+#   - OP_INFO: → JSON {version, dim, pid}
+#   - OP_PROMOTE: path utf-8 (vuoto = ultima versione) → hot swap nel demone (solo se
+#     diverso dalla versione caricata), poi come OP_INFO
+#
+# La versione in ogni risposta di encode/analyze tiene allineati i worker:
+# se un altro worker ha promosso un nuovo modello, il client se ne accorge
+# alla prima risposta e chiama on_version (cache per versione da invalidare).
+# check_version() fa lo stesso con OP_INFO per chi legge solo le cache.
+#
+# Avvio: `python manage.py run_model_server` (imposta anche i thread torch).
+
+import json
+import logging
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SERVER_SETTINGS = getattr(settings, "MINDLINK_MODEL_SERVER", {})
+SERVER_MODE = SERVER_SETTINGS.get("MODE", "local")  # "local" | "client"
+SOCKET_PATH = SERVER_SETTINGS.get("SOCKET", os.path.join("models", "mindlink-model.sock"))
+TORCH_THREADS = SERVER_SETTINGS.get("TORCH_THREADS")  # None = default torch
+CLIENT_TIMEOUT = SERVER_SETTINGS.get("TIMEOUT", 30)
+# Secondi dopo i quali il client riconferma la versione del demone anche senza encode
+VERSION_CHECK_INTERVAL = SERVER_SETTINGS.get("VERSION_CHECK_INTERVAL", 5)
+
+OP_ENCODE, OP_ANALYZE, OP_INFO, OP_PROMOTE = 1, 2, 3, 4
+STATUS_OK, STATUS_ERROR = 0, 1
+
+_HEADER = struct.Struct("!BI")
+_U32 = struct.Struct("!I")
+_SHAPE = struct.Struct("!II")
+
+
+class ModelServerError(RuntimeError):
+    pass
+
+
+_serving = False  # True nel processo del demone: lì il modello è sempre locale
+
+
+def use_model_server() -> bool:
+    return SERVER_MODE == "client" and not _serving
+
+
+# =====================================================
+# 🔹 CODIFICA
+# =====================================================
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray(n)
+    view, got = memoryview(buf), 0
+    while got < n:
+        read = sock.recv_into(view[got:], n - got)
+        if not read:
+            raise ConnectionError("Connessione chiusa dal peer")
+        got += read
+    return bytes(buf)
+
+
+def _send_frame(sock, code: int, payload: bytes):
+    sock.sendall(_HEADER.pack(code, len(payload)) + payload)
+
+
+def _recv_frame(sock) -> tuple[int, bytes]:
+    code, length = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return code, _recv_exact(sock, length)
+
+
+def _pack_texts(texts: list[str]) -> bytes:
+    parts = [_U32.pack(len(texts))]
+    for text in texts:
+        data = (text or "").encode("utf-8")
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def _unpack_texts(payload: bytes) -> list[str]:
+    (count,), offset = _U32.unpack_from(payload), _U32.size
+    texts = []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(payload, offset)
+        offset += _U32.size
+        texts.append(payload[offset:offset + length].decode("utf-8"))
+        offset += length
+    return texts
+
+
+def _pack_matrix(matrix) -> bytes:
+    matrix = np.ascontiguousarray(matrix, dtype="<f4")
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    return _SHAPE.pack(*matrix.shape) + matrix.tobytes()
+
+
+def _unpack_matrix(payload: bytes, offset: int = 0) -> np.ndarray:
+    rows, dim = _SHAPE.unpack_from(payload, offset)
+    start = offset + _SHAPE.size
+    return np.frombuffer(payload, dtype="<f4", count=rows * dim, offset=start).reshape(rows, dim)
+
+
+def _pack_version(version: str | None) -> bytes:
+    data = (version or "").encode("utf-8")
+    return _U32.pack(len(data)) + data
+
+
+def _unpack_version(payload: bytes) -> tuple[str, int]:
+    """(versione, offset del resto del payload)."""
+    (length,) = _U32.unpack_from(payload)
+    return payload[_U32.size:_U32.size + length].decode("utf-8"), _U32.size + length
+
+
+# =====================================================
+# 🔹 SERVER
+# =====================================================
+def _versioned(fn, texts):
+    """
+    (versione, fn(texts)): se uno swap avviene durante il calcolo non si sa
+    quale modello abbia risposto, quindi si ripete sulla nuova versione.
+    """
+    from . import analyze
+
+    while True:
+        analyze.get_model()
+        version = analyze._model_version
+        result = fn(texts)
+        if analyze._model_version == version:
+            return version, result
+
+
+def _promote_if_changed(path: str | None):
+    """Hot swap solo se `path` (default: ultima versione) non è già quello caricato."""
+    from . import analyze
+
+    path = path or analyze.get_latest_model_path()
+    analyze.get_model()
+    if (analyze._model_version or "").split("#")[0] != path:
+        analyze.promote_model(path, wait=True)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Una connessione per worker/thread client: frame serviti in sequenza."""
+
+    def handle(self):
+        from . import analyze
+
+        while True:
+            try:
+                op, payload = _recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+            try:
+                if op == OP_ENCODE:
+                    # encode_texts passa dal micro-batcher: richieste di worker diversi si aggregano
+                    version, matrix = _versioned(analyze.encode_texts, _unpack_texts(payload))
+                    response = _pack_version(version) + _pack_matrix(matrix)
+                elif op == OP_ANALYZE:
+                    version, results = _versioned(analyze.analyze_texts, _unpack_texts(payload))
+                    meta = json.dumps(
+                        [{k: r[k] for k in ("summary", "category", "keywords", "passages")} for r in results]
+                    ).encode("utf-8")
+                    embeddings = np.vstack([r["embedding"] for r in results]) if results else np.zeros((0, 0))
+                    passage_embeddings = (
+                        np.vstack([r["passage_embeddings"] for r in results]) if results else np.zeros((0, 0))
+                    )
+                    response = (
+                        _pack_version(version) + _U32.pack(len(meta)) + meta
+                        + _pack_matrix(embeddings) + _pack_matrix(passage_embeddings)
+                    )
+                elif op in (OP_INFO, OP_PROMOTE):
+                    if op == OP_PROMOTE:
+                        _promote_if_changed(payload.decode("utf-8") or None)
+                    analyze.get_model()
+                    response = json.dumps({
+                        "version": analyze._model_version, "dim": analyze.EMBEDDING_DIM, "pid": os.getpid(),
+                    }).encode("utf-8")
+                else:
+                    raise ValueError(f"Operazione sconosciuta: {op}")
+                _send_frame(self.request, STATUS_OK, response)
+            except Exception as e:
+                logger.exception(f"Errore nel model server (op={op})")
+                _send_frame(self.request, STATUS_ERROR, str(e).encode("utf-8"))
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def configure_torch_threads(threads: int | None = None):
+    """Limita i thread intra-op di torch (evita l'oversubscription dei core)."""
+    threads = threads or TORCH_THREADS
+    if not threads:
+        return
+    import torch
+
+    torch.set_num_threads(threads)
+    logger.info(f"🧵 torch intra-op threads = {threads}")
+
+
+def run_server(socket_path: str | None = None, threads: int | None = None):
+    from . import analyze
+
+    global _serving
+    _serving = True
+    socket_path = socket_path or SOCKET_PATH
+    configure_torch_threads(threads)
+    analyze.get_model()  # carica il modello prima di accettare connessioni
+
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    os.makedirs(os.path.dirname(socket_path) or ".", exist_ok=True)
+    server = _Server(socket_path, _Handler)
+    os.chmod(socket_path, 0o660)
+    logger.info(f"🛰️ Model server in ascolto su {socket_path} (pid={os.getpid()})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+# =====================================================
+# 🔹 CLIENT
+# =====================================================
+class ModelClient:
+    """
+    Sostituto di SentenceTransformer lato worker: encode() e
+    get_sentence_embedding_dimension() inoltrati al demone.
+    Una connessione per thread, riaperta in caso di errore.
+    on_version(info) è chiamato quando una risposta arriva da una versione
+    del modello diversa da quella nota (promozione fatta da un altro worker).
+    """
+
+    def __init__(self, socket_path: str | None = None, timeout: float = CLIENT_TIMEOUT, on_version=None):
+        self.socket_path = socket_path or SOCKET_PATH
+        self.timeout = timeout
+        self.on_version = on_version
+        self._local = threading.local()
+        self._info_lock = threading.Lock()
+        self._checked_at = 0.0
+        self.info = self._fetch_info()
+
+    def _fetch_info(self) -> dict:
+        self._checked_at = time.monotonic()
+        return json.loads(self._call(OP_INFO, b"").decode("utf-8"))
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        return sock
+
+    def _call(self, op: int, payload: bytes) -> bytes:
+        for attempt in (1, 2):
+            sock = getattr(self._local, "sock", None)
+            try:
+                if sock is None:
+                    sock = self._local.sock = self._connect()
+                _send_frame(sock, op, payload)
+                status, response = _recv_frame(sock)
+                break
+            except (ConnectionError, OSError):
+                self._local.sock = None
+                if sock is not None:
+                    sock.close()
+                if attempt == 2:
+                    raise
+        if status != STATUS_OK:
+            raise ModelServerError(response.decode("utf-8", "replace"))
+        return response
+
+    def _versioned_call(self, op: int, payload: bytes) -> tuple[bytes, int]:
+        """Risposta di encode/analyze e offset dopo la versione, che viene confrontata con quella nota."""
+        response = self._call(op, payload)
+        self._checked_at = time.monotonic()
+        version, offset = _unpack_version(response)
+        if version != self.info["version"]:
+            self._version_changed(version)
+        return response, offset
+
+    def _version_changed(self, version: str):
+        with self._info_lock:
+            if version == self.info["version"]:
+                return  # già gestito da un altro thread
+            info = self._fetch_info()
+            previous, self.info = self.info["version"], info
+        logger.info(f"🛰️ Il model server è passato da {previous} a {info['version']}")
+        if self.on_version is not None:
+            self.on_version(info)
+
+    def check_version(self, max_age: float = VERSION_CHECK_INTERVAL):
+        """Riconferma la versione del demone se l'ultima risposta è più vecchia di max_age secondi."""
+        if time.monotonic() - self._checked_at < max_age:
+            return
+        version = self._fetch_info()["version"]
+        if version != self.info["version"]:
+            self._version_changed(version)
+
+    @property
+    def version(self) -> str:
+        return self.info["version"]
+
+    def promote(self, path: str | None = None) -> dict:
+        """Chiede al demone di caricare e promuovere `path` (hot swap lato server, se cambia)."""
+        self.info = json.loads(self._call(OP_PROMOTE, (path or "").encode("utf-8")).decode("utf-8"))
+        return self.info
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.info["dim"]
+
+    def encode(self, sentences, convert_to_numpy: bool = True, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.info["dim"]), dtype=np.float32)
+        response, offset = self._versioned_call(OP_ENCODE, _pack_texts(texts))
+        matrix = _unpack_matrix(response, offset)
+        return matrix[0] if single else matrix
+
+    def analyze(self, texts: list[str]) -> list[dict]:
+        """Analisi completa eseguita dal demone (stesso formato di analyze_texts)."""
+        response, start = self._versioned_call(OP_ANALYZE, _pack_texts(texts))
+        (meta_len,) = _U32.unpack_from(response, start)
+        start += _U32.size
+        meta = json.loads(response[start:start + meta_len].decode("utf-8"))
+        embeddings = _unpack_matrix(response, start + meta_len)
+        passage_offset = start + meta_len + _SHAPE.size + embeddings.nbytes
+        passage_embeddings = _unpack_matrix(response, passage_offset)
+        offset = 0
+        for result, embedding in zip(meta, embeddings):
+            result["embedding"] = embedding
+            result["passages"] = [tuple(span) for span in result["passages"]]
+            result["passage_embeddings"] = passage_embeddings[offset:offset + len(result["passages"])]
+            offset += len(result["passages"])
+        return meta
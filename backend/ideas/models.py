@@ -1,10 +1,35 @@
+import numpy as np
 from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 from django.contrib.auth.models import User
 from django.db.models import JSONField
+from django.utils import timezone
 from django.contrib.postgres.search import SearchVector, SearchVectorField
 
 
+# =====================================================
+# 🔹 EMBEDDING BINARI (float32)
+# =====================================================
+EMBEDDING_DTYPE = np.float32
+# Passaggi delle idee lunghe: float16 dimezza lo spazio (vettori normalizzati)
+PASSAGE_DTYPE = np.float16
+
+
+def embedding_to_bytes(vec) -> bytes | None:
+    """Serializza un embedding come float32 contigui (384 dim = 1536 byte)."""
+    if vec is None:
+        return None
+    arr = np.asarray(vec, dtype=EMBEDDING_DTYPE).ravel()
+    return arr.tobytes() if arr.size else None
+
+
+def embedding_from_bytes(data) -> np.ndarray | None:
+    """Vista zero-copy (read-only) sui byte salvati nel DB; None se assente."""
+    if not data:
+        return None
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
 class Idea(models.Model):
     title = models.CharField(max_length=200)
     content = models.TextField()
@@ -15,7 +40,10 @@ class Idea(models.Model):
     summary = models.TextField(blank=True, null=True)
     category = models.CharField(max_length=100, blank=True, null=True)
     keywords = models.JSONField(blank=True, null=True)
-    embedding = models.JSONField(default=list, blank=True)
+    # float32 little-endian in bytea: usare embedding_vector / set_embedding
+    embedding = models.BinaryField(null=True, blank=True, editable=False)
+    # Ultima scrittura dell'embedding (anche via .update / bulk_update): il delta degli snapshot la usa
+    embedding_updated_at = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
     used_for_training = models.BooleanField(default=False)
 
     # 🔹 Campo indicizzato per ricerche full-text PostgreSQL
@@ -35,6 +63,14 @@ class Idea(models.Model):
             )
         )
 
+    @property
+    def embedding_vector(self) -> np.ndarray | None:
+        return embedding_from_bytes(self.embedding)
+
+    def set_embedding(self, vec):
+        self.embedding = embedding_to_bytes(vec)
+        self.embedding_updated_at = timezone.now()
+
     class Meta:
         indexes = [
             # 🔹 Indice GIN per velocizzare la ricerca full-text
@@ -63,6 +99,74 @@ class Connection(models.Model):
         unique_together = ("source", "target", "type")
 
 
+class TermDocumentFrequency(models.Model):
+    """
+    Document frequency di un termine su Idea.content, usata come IDF dal
+    motore keyword (ideas/keywords.py) e aggiornata a ogni create/update/delete.
+    """
+    term = models.CharField(max_length=100, unique=True)
+    df = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.df})"
+
+
+class EmbeddingCacheEntry(models.Model):
+    """
+    Encode grezzo (float32) di un testo per una versione del modello, cercato
+    per hash SHA-256 del testo prima di ogni inferenza (ideas/embedding_cache.py).
+    """
+    model_version = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=64)
+    vector = models.BinaryField()
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        unique_together = ("model_version", "content_hash")
+
+    def __str__(self):
+        return f"{self.model_version}:{self.content_hash[:12]}"
+
+
+class TokenCacheEntry(models.Model):
+    """
+    Token id (int32, troncati e senza padding) di un testo per un tokenizer,
+    riusati tra versioni del modello con lo stesso tokenizer (ideas/token_cache.py).
+    """
+    tokenizer_hash = models.CharField(max_length=64)
+    content_hash = models.CharField(max_length=64)
+    token_ids = models.BinaryField()
+
+    class Meta:
+        unique_together = ("tokenizer_hash", "content_hash")
+
+    def __str__(self):
+        return f"{self.tokenizer_hash[:12]}:{self.content_hash[:12]}"
+
+
+class IdeaPassage(models.Model):
+    """
+    Passaggio (finestra di parole sovrapposte) di un'idea lunga con il suo
+    embedding normalizzato in float16 (ideas/passages.py); il testo non è
+    duplicato: start/end sono offset in caratteri su Idea.content.
+    """
+    idea = models.ForeignKey(Idea, related_name="passages", on_delete=models.CASCADE)
+    position = models.PositiveIntegerField()
+    start = models.PositiveIntegerField()
+    end = models.PositiveIntegerField()
+    embedding = models.BinaryField()
+
+    class Meta:
+        unique_together = ("idea", "position")
+
+    @property
+    def embedding_vector(self) -> np.ndarray:
+        return np.frombuffer(self.embedding, dtype=PASSAGE_DTYPE).astype(np.float32)
+
+    def __str__(self):
+        return f"Idea #{self.idea_id} [{self.position}] {self.start}-{self.end}"
+
+
 class UserSettings(models.Model):
     """
     Impostazioni personalizzate per ogni utente MindLink.
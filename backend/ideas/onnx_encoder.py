@@ -0,0 +1,254 @@
+# onnx_encoder.py
+# ---------------------------------------
+# ⚡ MindLink ONNX Encoder
+# ---------------------------------------
+# Backend di inferenza CPU alternativo a SentenceTransformer (PyTorch):
+# - export_onnx(): esporta il transformer del modello corrente (base o
+#   models/mindlink-v*) in ONNX, con quantizzazione dinamica int8 opzionale
+# - OnnxEncoder: onnxruntime + tokenizer HF (libreria `tokenizers`),
+#   mean pooling sulla attention mask e normalizzazione L2, con la stessa
+#   interfaccia usata da analyze.py (encode / get_sentence_embedding_dimension)
+# - check_parity() / benchmark(): accordo coseno con l'output torch e
+#   latenza/throughput, per decidere l'attivazione per deployment
+#
+# Attivazione: MINDLINK_ENCODER["BACKEND"] = "onnx" (serve
+# `manage.py export_onnx_encoder`; senza export si ricade su torch).
+# Dipendenze opzionali: onnxruntime, tokenizers (onnx + torch solo per l'export).
+
+import json
+import logging
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+ENCODER_SETTINGS = getattr(settings, "MINDLINK_ENCODER", {})
+ENCODER_BACKEND = ENCODER_SETTINGS.get("BACKEND", "torch")  # "torch" | "onnx"
+ONNX_DIR = ENCODER_SETTINGS.get("ONNX_DIR", os.path.join("models", "onnx"))
+ONNX_QUANTIZED = ENCODER_SETTINGS.get("ONNX_QUANTIZED", True)
+ONNX_THREADS = ENCODER_SETTINGS.get("ONNX_THREADS")  # None = default onnxruntime
+
+META_FILE = "encoder.json"
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model-int8.onnx"
+
+
+def onnx_dir_for(model_path: str) -> str:
+    """Directory dell'export ONNX di un modello (base o versione fine-tuned)."""
+    return os.path.join(ONNX_DIR, os.path.basename(os.path.normpath(model_path)))
+
+
+# =====================================================
+# 🔹 EXPORT
+# =====================================================
+def export_onnx(model_path: str, output_dir: str | None = None, quantize: bool = True) -> dict:
+    """
+    Esporta il transformer di un SentenceTransformer in ONNX (assi dinamici
+    batch/sequenza) e salva tokenizer e metadati; opzionalmente produce
+    anche la variante int8 con quantize_dynamic.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = output_dir or onnx_dir_for(model_path)
+    os.makedirs(output_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    st_model = SentenceTransformer(model_path, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["esempio di testo"], return_tensors="pt")
+    input_names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+    dynamic = {n: {0: "batch", 1: "sequence"} for n in input_names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    onnx_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[n] for n in input_names),
+            onnx_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(onnx_path, os.path.join(output_dir, QUANTIZED_FILE), weight_type=QuantType.QInt8)
+
+    meta = {
+        "source": model_path,
+        "dim": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "inputs": input_names,
+        "pad_token": tokenizer.pad_token,
+        "quantized": quantize,
+        "exported_at": time.time(),
+    }
+    with open(os.path.join(output_dir, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=1)
+
+    logger.info(f"⚡ Export ONNX di {model_path} in {output_dir} ({time.perf_counter() - started:.1f}s)")
+    return meta
+
+
+def is_exported(model_path: str) -> bool:
+    return os.path.exists(os.path.join(onnx_dir_for(model_path), META_FILE))
+
+
+# =====================================================
+# 🔹 ENCODER
+# =====================================================
+class OnnxEncoder:
+    """Encoder onnxruntime compatibile con l'uso che analyze.py fa di SentenceTransformer."""
+
+    def __init__(self, directory: str, quantized: bool = True, threads: int | None = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+        model_file = QUANTIZED_FILE if quantized and self.meta.get("quantized") else MODEL_FILE
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            os.path.join(directory, model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.quantized = model_file == QUANTIZED_FILE
+        self.inputs = self.meta["inputs"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(directory, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.meta["max_seq_length"])
+        pad_token = self.meta.get("pad_token") or "[PAD]"
+        self.pad_id = self.tokenizer.token_to_id(pad_token) or 0
+        self.tokenizer.enable_padding(pad_id=self.pad_id, pad_token=pad_token)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.meta["dim"]
+
+    def tokenize(self, texts: list[str]) -> list[np.ndarray]:
+        """Token id (troncati, senza padding) per testo: riusabili con encode_ids()."""
+        return [
+            np.asarray(e.ids[:sum(e.attention_mask)], dtype=np.int32)
+            for e in self.tokenizer.encode_batch(texts)
+        ]
+
+    def encode_ids(self, token_ids: list[np.ndarray]) -> np.ndarray:
+        """Forward + pooling su sequenze già tokenizzate (padding fatto qui)."""
+        length = max(len(ids) for ids in token_ids)
+        input_ids = np.full((len(token_ids), length), self.pad_id, dtype=np.int64)
+        attention_mask = np.zeros((len(token_ids), length), dtype=np.int64)
+        for row, ids in enumerate(token_ids):
+            input_ids[row, :len(ids)] = ids
+            attention_mask[row, :len(ids)] = 1
+        return self._run(input_ids, attention_mask)
+
+    def _encode_batch(self, texts: list[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        return self._run(
+            np.array([e.ids for e in encodings], dtype=np.int64),
+            np.array([e.attention_mask for e in encodings], dtype=np.int64),
+        )
+
+    def _run(self, input_ids: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        feed = {
+            "input_ids": input_ids,
+            "attention_mask": attention_mask,
+            "token_type_ids": np.zeros_like(input_ids),  # sequenza singola
+        }
+        hidden = self.session.run(None, {n: feed[n] for n in self.inputs})[0]
+
+        # Mean pooling sui token reali + normalizzazione L2 (come il modello sentence-transformers)
+        mask = feed["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+        return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+    def encode(self, sentences, batch_size: int = 32, convert_to_numpy: bool = True,
+               show_progress_bar: bool = False, **kwargs) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.meta["dim"]), dtype=np.float32)
+
+        # Ordinamento per lunghezza: meno padding per batch
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        out = np.empty((len(texts), self.meta["dim"]), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            out[idx] = self._encode_batch([texts[i] for i in idx])
+        return out[0] if single else out
+
+
+def load_encoder(model_path: str) -> OnnxEncoder | None:
+    """OnnxEncoder per il modello indicato, o None se non esportato / dipendenze mancanti."""
+    directory = onnx_dir_for(model_path)
+    if not is_exported(model_path):
+        logger.warning(f"⚠️ Nessun export ONNX in {directory}: uso PyTorch (manage.py export_onnx_encoder)")
+        return None
+    try:
+        return OnnxEncoder(directory, quantized=ONNX_QUANTIZED, threads=ONNX_THREADS)
+    except Exception as e:
+        logger.error(f"⚠️ Encoder ONNX non disponibile ({directory}): {e}. Uso PyTorch.")
+        return None
+
+
+# =====================================================
+# 🔹 PARITÀ E BENCHMARK
+# =====================================================
+def check_parity(reference, candidate, texts: list[str]) -> dict:
+    """Coseno tra gli embedding del modello di riferimento (torch) e del candidato."""
+    ref = np.asarray(reference.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    cand = np.asarray(candidate.encode(texts, convert_to_numpy=True), dtype=np.float32)
+    ref /= np.clip(np.linalg.norm(ref, axis=1, keepdims=True), 1e-12, None)
+    cand /= np.clip(np.linalg.norm(cand, axis=1, keepdims=True), 1e-12, None)
+    cos = (ref * cand).sum(axis=1)
+
+    # Accordo sui vicini: il top-1 (escluso sé stesso) coincide?
+    sim_ref, sim_cand = ref @ ref.T, cand @ cand.T
+    np.fill_diagonal(sim_ref, -np.inf)
+    np.fill_diagonal(sim_cand, -np.inf)
+    top1 = float(np.mean(sim_ref.argmax(axis=1) == sim_cand.argmax(axis=1))) if len(texts) > 1 else 1.0
+
+    return {
+        "texts": len(texts),
+        "cos_min": round(float(cos.min()), 5),
+        "cos_mean": round(float(cos.mean()), 5),
+        "top1_agreement": round(top1, 4),
+    }
+
+
+def benchmark(encoders: dict, texts: list[str], batch_size: int = 32, repeat: int = 3) -> list[dict]:
+    """Latenza per singolo testo (p50/p95) e throughput a batch per ogni encoder."""
+    report = []
+    for name, encoder in encoders.items():
+        encoder.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+
+        latencies = []
+        for text in texts[:100]:
+            t0 = time.perf_counter()
+            encoder.encode([text], batch_size=1)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            encoder.encode(texts, batch_size=batch_size)
+        elapsed = time.perf_counter() - t0
+
+        report.append({
+            "encoder": name,
+            "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+            "texts_per_s": round(len(texts) * repeat / elapsed, 1),
+        })
+    return report
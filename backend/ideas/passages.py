@@ -0,0 +1,224 @@
+# passages.py
+# ---------------------------------------
+# 📑 MindLink Passages
+# ---------------------------------------
+# Embedding a livello di passaggio per le idee lunghe: l'encoder tronca
+# l'input (max_seq_length), quindi con un solo vettore per idea la parte
+# finale di un testo lungo non arriva mai all'embedding.
+# - il contenuto oltre WORDS parole viene diviso in finestre di WORDS parole
+#   sovrapposte di OVERLAP (al massimo MAX_PASSAGES per idea)
+# - i passaggi sono codificati in batch insieme al resto dell'analisi
+#   (analyze.analyze_texts) e salvati in IdeaPassage (float16, solo offset)
+# - Idea.embedding delle idee lunghe = pooling dei passaggi (POOLING
+#   "mean" / "max"; "none" = encode del testo intero come prima), quindi
+#   indice, pgvector e connessioni restano invariati
+# - indice residente dedicato ai passaggi (chiave idea_id * POSITION_STRIDE
+#   + posizione): find_similar_ideas_by_text usa per ogni idea il massimo tra
+#   lo score dell'idea e quello del suo passaggio migliore
+#
+# Le idee brevi (<= WORDS parole) non hanno passaggi: il loro embedding
+# copre già tutto il testo. Benchmark: `manage.py passage_report`.
+
+import logging
+import re
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import PASSAGE_DTYPE, IdeaPassage
+from .text_utils import clean_text
+from .vector_index import EmbeddingIndex, schedule_rebuild
+
+logger = logging.getLogger(__name__)
+
+PASSAGE_SETTINGS = getattr(settings, "MINDLINK_PASSAGES", {})
+PASSAGES_ENABLED = PASSAGE_SETTINGS.get("ENABLED", True)
+WORDS = PASSAGE_SETTINGS.get("WORDS", 128)
+OVERLAP = PASSAGE_SETTINGS.get("OVERLAP", 32)
+MAX_PASSAGES = PASSAGE_SETTINGS.get("MAX_PASSAGES", 64)
+POOLING = PASSAGE_SETTINGS.get("POOLING", "mean")
+PASSAGE_SEARCH = PASSAGE_SETTINGS.get("SEARCH", True)
+# Passaggi letti dall'indice per ogni risultato richiesto (più passaggi della stessa idea)
+SEARCH_FANOUT = PASSAGE_SETTINGS.get("SEARCH_FANOUT", 4)
+
+# Chiave dei passaggi nell'indice: idea_id * POSITION_STRIDE + posizione
+POSITION_STRIDE = 1024
+WORD_RE = re.compile(r"\S+")
+BATCH_SIZE = 1000
+
+
+# =====================================================
+# 🔹 CHUNKING E POOLING
+# =====================================================
+def chunk_spans(text: str) -> list[tuple[int, int]]:
+    """Offset (start, end) dei passaggi sovrapposti; [] per i testi brevi o se disabilitato."""
+    if not PASSAGES_ENABLED or not text:
+        return []
+    words = [m.span() for m in WORD_RE.finditer(text)]
+    if len(words) <= WORDS:
+        return []
+    step = max(1, WORDS - OVERLAP)
+    spans = []
+    for first in range(0, len(words), step):
+        window = words[first:first + WORDS]
+        spans.append((window[0][0], window[-1][1]))
+        if first + WORDS >= len(words) or len(spans) >= min(MAX_PASSAGES, POSITION_STRIDE):
+            break
+    return spans
+
+
+def split_passages(text: str) -> tuple[list[tuple[int, int]], list[str]]:
+    """Passaggi da codificare: (offset, testo pulito), scartando quelli vuoti dopo clean_text."""
+    spans, texts = [], []
+    for start, end in chunk_spans(text):
+        cleaned = clean_text(text[start:end])
+        if cleaned:
+            spans.append((start, end))
+            texts.append(cleaned)
+    return spans, texts
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms != 0)
+
+
+def pool(vectors: np.ndarray) -> np.ndarray:
+    """Vettore dell'idea dai passaggi normalizzati (mean o max elemento per elemento)."""
+    unit = normalize_rows(vectors)
+    return unit.max(axis=0) if POOLING == "max" else unit.mean(axis=0)
+
+
+def uses_pooling() -> bool:
+    return PASSAGES_ENABLED and POOLING in ("mean", "max")
+
+
+# =====================================================
+# 🔹 STORE
+# =====================================================
+def store_passages(items):
+    """
+    Sostituisce i passaggi delle idee: items = [(idea_id, spans, vettori)].
+    Le idee senza passaggi (testo breve) perdono quelli eventualmente salvati prima.
+    """
+    items = list(items)
+    if not items:
+        return
+    rows = [
+        IdeaPassage(
+            idea_id=idea_id, position=position, start=start, end=end,
+            embedding=np.asarray(vec, dtype=PASSAGE_DTYPE).tobytes(),
+        )
+        for idea_id, spans, vectors in items
+        for position, ((start, end), vec) in enumerate(zip(spans, normalize_rows(vectors)))
+    ]
+    with transaction.atomic():
+        IdeaPassage.objects.filter(idea_id__in=[idea_id for idea_id, _, _ in items]).delete()
+        IdeaPassage.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+    if _index is not None:
+        for idea_id, _, vectors in items:
+            index_remove_idea(idea_id)
+            for position, vec in enumerate(vectors):
+                _index.upsert(idea_id * POSITION_STRIDE + position, vec)
+
+
+def drop_passages(idea_id: int):
+    """Elimina i passaggi di un'idea (es. contenuto modificato: gli offset non valgono più)."""
+    IdeaPassage.objects.filter(idea_id=idea_id).delete()
+    index_remove_idea(idea_id)
+
+
+def passage_spans(pairs) -> dict[tuple[int, int], tuple[int, int]]:
+    """(idea_id, posizione) → (start, end) per i passaggi richiesti."""
+    pairs = set(pairs)
+    if not pairs:
+        return {}
+    rows = IdeaPassage.objects.filter(
+        idea_id__in={idea_id for idea_id, _ in pairs}, position__in={pos for _, pos in pairs}
+    ).values_list("idea_id", "position", "start", "end")
+    return {(i, p): (s, e) for i, p, s, e in rows if (i, p) in pairs}
+
+
+# =====================================================
+# 🔹 INDICE DEI PASSAGGI
+# =====================================================
+def _db_passages():
+    rows = (
+        IdeaPassage.objects.filter(position__lt=POSITION_STRIDE)
+        .values_list("idea_id", "position", "embedding")
+        .iterator(chunk_size=2000)
+    )
+    for idea_id, position, data in rows:
+        yield idea_id * POSITION_STRIDE + position, np.frombuffer(bytes(data), dtype=PASSAGE_DTYPE)
+
+
+_index: EmbeddingIndex | None = None
+_index_lock = threading.Lock()
+
+
+def get_passage_index() -> EmbeddingIndex:
+    """
+    Indice dei passaggi del processo (esatto/IVF come l'indice delle idee, senza
+    codec). Se scaduto viene ricostruito in background come l'indice delle idee.
+    """
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                index = EmbeddingIndex(source=_db_passages)
+                index.rebuild()
+                _index = index
+            index = _index
+    elif index.is_stale():
+        schedule_rebuild(index, name="passage-index-rebuild")
+    return index
+
+
+def index_remove_idea(idea_id: int):
+    """Tutti i passaggi dell'idea (l'intervallo di chiavi idea_id * POSITION_STRIDE + pos) in una passata."""
+    if _index is not None:
+        _index.remove_range(idea_id * POSITION_STRIDE, (idea_id + 1) * POSITION_STRIDE)
+
+
+def reset_passage_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def passage_index_status() -> dict:
+    index = _index
+    return {"built": index is not None, "size": len(index) if index is not None else 0}
+
+
+# =====================================================
+# 🔹 RICERCA
+# =====================================================
+def search_passages(query, top_k: int = 5, min_threshold: float = 0.5,
+                    exclude_ids=()) -> dict[int, tuple[int, float]]:
+    """Miglior passaggio per idea: idea_id → (posizione, similarità), in ordine decrescente."""
+    keys, sims = get_passage_index().search(query, top_k * SEARCH_FANOUT, min_threshold)
+    exclude = set(exclude_ids)
+    best = {}
+    for key, sim in zip(keys, sims):
+        idea_id, position = divmod(key, POSITION_STRIDE)
+        if idea_id not in best and idea_id not in exclude:
+            best[idea_id] = (position, sim)
+            if len(best) >= top_k:
+                break
+    return best
+
+
+def merge_hits(ids: list[int], sims: list[float], hits: dict[int, tuple[int, float]],
+               top_k: int) -> tuple[list[int], list[float]]:
+    """Score dell'idea = max(score dell'idea, score del suo passaggio migliore)."""
+    scores = dict(zip(ids, sims))
+    for idea_id, (_, sim) in hits.items():
+        scores[idea_id] = max(scores.get(idea_id, -np.inf), sim)
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [i for i, _ in ranked], [s for _, s in ranked]
@@ -0,0 +1,201 @@
+# pgvector_backend.py
+# ---------------------------------------
+# 🐘 MindLink pgvector backend
+# ---------------------------------------
+# Ricerca dei vicini più prossimi eseguita direttamente in PostgreSQL
+# sulla colonna opzionale `embedding_vec vector(384)` (indice HNSW),
+# creata e popolata dalla migration 0007.
+# Se l'estensione `vector` non è installata la colonna non esiste:
+# is_available() ritorna False e analyze.py usa l'indice in-Python.
+# La dimensione della colonna è letta dal DB: se il modello attivo produce
+# embedding di dimensione diversa (set_model_dim) il backend viene disattivato.
+
+import logging
+
+import numpy as np
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Idea
+
+logger = logging.getLogger(__name__)
+
+SEARCH_SETTINGS = getattr(settings, "MINDLINK_SEARCH", {})
+EF_SEARCH = SEARCH_SETTINGS.get("HNSW_EF_SEARCH", 64)
+
+# Righe lette per volta dal cursore lato server di all_neighbours
+FETCH_SIZE = 5000
+
+VECTOR_COLUMN = "embedding_vec"
+# Dimensione della colonna vector(n): letta dal DB in is_available() (default della migration 0007)
+VECTOR_DIM = 384
+
+_available = None
+_model_dim: int | None = None
+
+
+def is_available() -> bool:
+    """
+    True se il DB è PostgreSQL, la colonna vector esiste (controllo fatto una
+    volta per processo) e la sua dimensione coincide con quella del modello attivo.
+    """
+    global _available, VECTOR_DIM
+    if _available is None:
+        _available = False
+        if connection.vendor == "postgresql":
+            try:
+                with connection.cursor() as cursor:
+                    # atttypmod di una colonna vector(n) è n
+                    cursor.execute(
+                        "SELECT atttypmod FROM pg_attribute "
+                        "WHERE attrelid = %s::regclass AND attname = %s AND NOT attisdropped",
+                        [Idea._meta.db_table, VECTOR_COLUMN],
+                    )
+                    row = cursor.fetchone()
+                if row is not None:
+                    _available = True
+                    VECTOR_DIM = row[0] if row[0] > 0 else VECTOR_DIM
+            except Exception as e:
+                logger.warning(f"⚠️ Impossibile verificare la colonna pgvector: {e}")
+        logger.info(
+            f"🐘 Backend pgvector {'attivo (' + str(VECTOR_DIM) + ' dim)' if _available else 'non disponibile'}"
+        )
+        _check_dimension()
+    return _available and (_model_dim is None or _model_dim == VECTOR_DIM)
+
+
+def set_model_dim(dim: int):
+    """Dimensione degli embedding del modello attivo (chiamata a ogni swap del modello)."""
+    global _model_dim
+    _model_dim = dim
+    if _available:
+        _check_dimension()
+
+
+def _check_dimension():
+    if _available and _model_dim is not None and _model_dim != VECTOR_DIM:
+        logger.error(
+            f"❌ Backend pgvector disattivato: la colonna {VECTOR_COLUMN} è vector({VECTOR_DIM}) ma il "
+            f"modello attivo produce embedding di {_model_dim} dimensioni. Uso l'indice in-Python."
+        )
+
+
+def _to_literal(embedding) -> str | None:
+    """Formato testuale accettato da pgvector: '[x1,x2,...]'."""
+    vec = np.asarray(embedding, dtype=np.float32).ravel()
+    if vec.shape[0] != VECTOR_DIM or not np.any(vec):
+        return None
+    return "[" + ",".join(map(str, vec.tolist())) + "]"
+
+
+def store_embedding(idea_id: int, embedding):
+    """Allinea la colonna vector all'embedding appena salvato."""
+    if not is_available():
+        return
+    literal = _to_literal(embedding) if embedding is not None and len(embedding) else None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {Idea._meta.db_table} SET {VECTOR_COLUMN} = %s::vector WHERE id = %s",
+            [literal, idea_id],
+        )
+
+
+def store_embeddings(items):
+    """Versione batch di store_embedding: `items` è un iterabile di (idea_id, embedding)."""
+    if not is_available():
+        return
+    params = [
+        [_to_literal(emb) if emb is not None and len(emb) else None, idea_id]
+        for idea_id, emb in items
+    ]
+    if not params:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {Idea._meta.db_table} SET {VECTOR_COLUMN} = %s::vector WHERE id = %s",
+            params,
+        )
+
+
+def search(target_emb, top_k: int = 5, min_threshold: float = 0.5, exclude_ids=()) -> tuple[list[int], list[float]]:
+    """
+    Top-k per similarità coseno calcolato dal DB (operatore <=> + indice HNSW).
+    La soglia è applicata fuori dalla subquery per non impedire l'uso dell'indice.
+    """
+    literal = _to_literal(target_emb)
+    if literal is None:
+        return [], []
+
+    table = Idea._meta.db_table
+    sql = f"""
+        SELECT id, sim FROM (
+            SELECT id, 1 - ({VECTOR_COLUMN} <=> %s::vector) AS sim
+            FROM {table}
+            WHERE {VECTOR_COLUMN} IS NOT NULL AND NOT (id = ANY(%s::bigint[]))
+            ORDER BY {VECTOR_COLUMN} <=> %s::vector
+            LIMIT %s
+        ) AS knn
+        WHERE sim >= %s
+        ORDER BY sim DESC
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SET LOCAL hnsw.ef_search = %s", [max(EF_SEARCH, top_k)])
+        cursor.execute(sql, [literal, list(exclude_ids), literal, top_k, min_threshold])
+        rows = cursor.fetchall()
+
+    return [r[0] for r in rows], [float(r[1]) for r in rows]
+
+
+def all_neighbours(top_k: int, min_threshold: float):
+    """
+    Top-k vicini di *ogni* idea in una sola query (LATERAL join sull'indice HNSW).
+    La query viene eseguita subito (gli errori del DB si sollevano qui) su un
+    cursore lato server; ritorna un generatore di (source_id, target_id, similarità)
+    letto a blocchi di FETCH_SIZE righe, senza caricare N x k righe in memoria.
+    """
+    table = Idea._meta.db_table
+    sql = f"""
+        SELECT a.id, n.id, n.sim
+        FROM {table} a
+        CROSS JOIN LATERAL (
+            SELECT b.id, 1 - (b.{VECTOR_COLUMN} <=> a.{VECTOR_COLUMN}) AS sim
+            FROM {table} b
+            WHERE b.{VECTOR_COLUMN} IS NOT NULL AND b.id <> a.id
+            ORDER BY b.{VECTOR_COLUMN} <=> a.{VECTOR_COLUMN}
+            LIMIT %s
+        ) AS n
+        WHERE a.{VECTOR_COLUMN} IS NOT NULL AND n.sim >= %s
+        ORDER BY a.id, n.sim DESC
+    """
+    # SET di sessione (non LOCAL): il cursore lato server vive oltre una singola transazione
+    with connection.cursor() as cursor:
+        cursor.execute("SET hnsw.ef_search = %s", [max(EF_SEARCH, top_k)])
+    cursor = connection.chunked_cursor()
+    try:
+        cursor.execute(sql, [top_k, min_threshold])
+    except Exception:
+        cursor.close()
+        _reset_ef_search()
+        raise
+    return _stream_rows(cursor)
+
+
+def _stream_rows(cursor):
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            for source_id, target_id, sim in rows:
+                yield source_id, target_id, float(sim)
+    finally:
+        cursor.close()
+        _reset_ef_search()
+
+
+def _reset_ef_search():
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("RESET hnsw.ef_search")
+    except Exception as e:
+        logger.warning(f"⚠️ Reset di hnsw.ef_search fallito: {e}")
@@ -0,0 +1,336 @@
+# quantization.py
+# ---------------------------------------
+# 🗜️ MindLink Quantization
+# ---------------------------------------
+# Rappresentazioni compatte degli embedding per il primo stadio della
+# ricerca in EmbeddingIndex (i top candidati vengono poi ri-valutati
+# esattamente sui vettori float):
+# - Int8Codec: int8 con scala per dimensione (4x meno memoria)
+# - PQCodec: product quantization, m sottospazi x 256 centroidi (uint8),
+#   es. m=48 → 48 byte per vettore invece di 1536 (32x)
+# - PCACodec: proiezione sulle prime d componenti principali del corpus
+#   (es. 384 → 96 dim, 4x), salvata per versione del modello
+# - TruncateCodec: prime d dimensioni rinormalizzate, per i modelli
+#   addestrati Matryoshka (sugli altri la recall crolla: vedi il report)
+
+import logging
+import os
+import time
+
+import numpy as np
+
+from .ann import select_top_k
+
+logger = logging.getLogger(__name__)
+
+SCORE_BLOCK = 16384  # righe decodificate per volta: limita la memoria temporanea
+
+
+class Int8Codec:
+    """Quantizzazione scalare simmetrica: x ≈ code * scale[d], code in [-127, 127]."""
+
+    name = label = "int8"
+    dtype = np.int8
+    # Errore massimo atteso sullo score (abbassa la soglia del primo stadio)
+    margin = 0.02
+
+    def __init__(self):
+        self.scale: np.ndarray | None = None
+
+    def code_size(self, dim: int) -> int:
+        return dim
+
+    def fit(self, matrix: np.ndarray):
+        scale = np.abs(matrix).max(axis=0) / 127.0
+        self.scale = np.where(scale > 0, scale, 1e-8).astype(np.float32)
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vecs / self.scale), -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # (code * scale) · q == code · (q * scale): la scala si applica una volta sola alla query
+        q = query * self.scale
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK]
+            out[start:start + block.shape[0]] = block.astype(np.float32) @ q
+        return out
+
+
+class PQCodec:
+    """
+    Product quantization: il vettore è diviso in m sottovettori, ognuno
+    sostituito dall'indice (uint8) del centroide più vicino del proprio
+    codebook. Lo score si calcola con una lookup table m x 256 per query.
+    """
+
+    name = "pq"
+    dtype = np.uint8
+    margin = 0.08
+
+    def __init__(self, m: int = 48, n_centroids: int = 256, iters: int = 15,
+                 max_train: int = 50_000, seed: int = 0):
+        self.m = m
+        self.n_centroids = n_centroids
+        self.iters = iters
+        self.max_train = max_train
+        self.seed = seed
+        self.codebooks: np.ndarray | None = None  # (m, n_centroids, dsub)
+
+    @property
+    def label(self) -> str:
+        return f"pq{self.m}"
+
+    def code_size(self, dim: int) -> int:
+        return self.m
+
+    def fit(self, matrix: np.ndarray):
+        n, dim = matrix.shape
+        if dim % self.m:
+            raise ValueError(f"La dimensione {dim} non è divisibile per m={self.m}")
+        rng = np.random.default_rng(self.seed)
+        sample = matrix if n <= self.max_train else matrix[rng.choice(n, self.max_train, replace=False)]
+        dsub = dim // self.m
+        k = min(self.n_centroids, sample.shape[0])
+
+        codebooks = np.zeros((self.m, self.n_centroids, dsub), dtype=np.float32)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(sample[:, j * dsub:(j + 1) * dsub])
+            codebooks[j, :k] = _kmeans(sub, k, self.iters, rng)
+        self.codebooks = codebooks
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = np.atleast_2d(vecs)
+        dsub = self.codebooks.shape[2]
+        codes = np.empty((vecs.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest(vecs[:, j * dsub:(j + 1) * dsub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.hstack(parts)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Lookup table: prodotto scalare tra ogni sotto-query e ogni centroide
+        lut = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.m, -1))
+        cols = np.arange(self.m)
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK):
+            block = codes[start:start + SCORE_BLOCK]
+            out[start:start + block.shape[0]] = lut[cols, block].sum(axis=1)
+        return out
+
+
+class PCACodec:
+    """
+    x ≈ mean + components.T @ code, code = components @ (x - mean) in d dimensioni.
+    Lo score ricostruito è esatto per la ricostruzione: x·q ≈ code·(components q) + mean·q.
+    Con `path` la proiezione è letta/salvata su disco (una per versione del modello).
+    """
+
+    name = "pca"
+    dtype = np.float32
+    margin = 0.1
+
+    def __init__(self, dim: int = 128, max_train: int = 100_000, path: str | None = None, seed: int = 0):
+        self.dim = dim
+        self.max_train = max_train
+        self.path = path
+        self.seed = seed
+        self.mean: np.ndarray | None = None
+        self.components: np.ndarray | None = None  # (dim, D)
+        self.explained: float | None = None
+
+    @property
+    def label(self) -> str:
+        return f"pca{self.dim}"
+
+    def code_size(self, dim: int) -> int:
+        return self.dim
+
+    def fit(self, matrix: np.ndarray):
+        if self.path and self._load(matrix.shape[1]):
+            return
+        n, full_dim = matrix.shape
+        rng = np.random.default_rng(self.seed)
+        sample = matrix if n <= self.max_train else matrix[rng.choice(n, self.max_train, replace=False)]
+        mean = sample.mean(axis=0)
+        centered = sample - mean
+        # Autovettori della covarianza (D x D): costo indipendente da N
+        eigvals, eigvecs = np.linalg.eigh(centered.T @ centered / max(1, sample.shape[0] - 1))
+        order = np.argsort(eigvals)[::-1][:self.dim]
+        components = np.zeros((self.dim, full_dim), dtype=np.float32)
+        components[:order.size] = eigvecs[:, order].T
+        self.mean, self.components = mean.astype(np.float32), components
+        total = float(eigvals.clip(min=0).sum())
+        self.explained = float(eigvals[order].clip(min=0).sum()) / total if total > 0 else 1.0
+        logger.info(f"🗜️ PCA {full_dim}→{self.dim} su {sample.shape[0]} vettori: varianza spiegata {self.explained:.3f}")
+        if self.path:
+            self._save()
+
+    def _load(self, full_dim: int) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        data = np.load(self.path)
+        if data["components"].shape != (self.dim, full_dim):
+            return False
+        self.mean, self.components = data["mean"], data["components"]
+        self.explained = float(data["explained"])
+        return True
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp.npz"
+        np.savez(tmp, mean=self.mean, components=self.components, explained=self.explained)
+        os.replace(tmp, self.path)
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        return ((np.atleast_2d(vecs) - self.mean) @ self.components.T).astype(np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes @ self.components + self.mean
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes @ (self.components @ query) + float(self.mean @ query)
+
+
+class TruncateCodec:
+    """Prime d dimensioni, rinormalizzate (embedding Matryoshka: nessun fit)."""
+
+    name = "truncate"
+    dtype = np.float32
+    margin = 0.1
+
+    def __init__(self, dim: int = 128):
+        self.dim = dim
+
+    @property
+    def label(self) -> str:
+        return f"trunc{self.dim}"
+
+    def code_size(self, dim: int) -> int:
+        return self.dim
+
+    def fit(self, matrix: np.ndarray):
+        if matrix.shape[1] < self.dim:
+            raise ValueError(f"Impossibile troncare {matrix.shape[1]} dimensioni a {self.dim}")
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        head = np.atleast_2d(vecs)[:, :self.dim].astype(np.float32)
+        norms = np.linalg.norm(head, axis=1, keepdims=True)
+        return np.divide(head, norms, out=np.zeros_like(head), where=norms > 0)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes  # le dimensioni scartate non sono recuperabili
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return codes @ self.encode(query)[0]
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Indice del centroide più vicino (distanza euclidea), a blocchi."""
+    c_norms = (centroids ** 2).sum(axis=1)
+    out = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], SCORE_BLOCK):
+        block = data[start:start + SCORE_BLOCK]
+        out[start:start + block.shape[0]] = np.argmin(c_norms - 2 * block @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(data: np.ndarray, k: int, iters: int, rng) -> np.ndarray:
+    """K-means euclideo (Lloyd) usato per i codebook PQ."""
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].copy()
+    for _ in range(iters):
+        labels = _nearest(data, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        nonempty = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)])[nonempty]
+        sums = np.add.reduceat(data[order], starts, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            centroids[empty] = data[rng.choice(data.shape[0], empty.size, replace=False)]
+    return centroids
+
+
+def make_codec(name: str | None, pq_subspaces: int = 48, projection_dim: int = 128,
+               projection_path: str | None = None):
+    """Codec dal nome configurato in MINDLINK_INDEX["QUANTIZATION"] (None = float32)."""
+    if not name:
+        return None
+    if name == "int8":
+        return Int8Codec()
+    if name == "pq":
+        return PQCodec(m=pq_subspaces)
+    if name == "pca":
+        return PCACodec(dim=projection_dim, path=projection_path)
+    if name == "truncate":
+        return TruncateCodec(dim=projection_dim)
+    raise ValueError(f"Quantizzazione sconosciuta: {name}")
+
+
+# =====================================================
+# 🔹 BENCHMARK MEMORIA / LATENZA / RECALL
+# =====================================================
+def evaluate_codecs(matrix: np.ndarray, codecs: list, top_k: int = 10, n_queries: int = 200,
+                    rerank_factor: int = 4, seed: int = 0) -> list[dict]:
+    """
+    Confronta la ricerca float esatta con primo stadio quantizzato + re-score
+    esatto dei migliori top_k * rerank_factor candidati.
+    Le query sono righe del corpus (escluse dal proprio risultato).
+    """
+    rng = np.random.default_rng(seed)
+    n = matrix.shape[0]
+    q_idx = rng.choice(n, min(n_queries, n), replace=False)
+
+    truth, latencies = [], []
+    for qi in q_idx:
+        t0 = time.perf_counter()
+        sims = matrix @ matrix[qi]
+        sims[qi] = -np.inf
+        truth.append(set(select_top_k(sims, top_k, -np.inf).tolist()))
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    report = [{
+        "codec": "float32", "bytes": matrix.nbytes, "fit_s": 0.0, "recall_first": 1.0,
+        "recall": 1.0, "avg_ms": round(float(np.mean(latencies)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+    }]
+
+    n_cand = top_k * rerank_factor
+    for codec in codecs:
+        t0 = time.perf_counter()
+        codec.fit(matrix)
+        codes = codec.encode(matrix)
+        fit_s = time.perf_counter() - t0
+
+        hits_first, hits, latencies = 0, 0, []
+        for qi, expected in zip(q_idx, truth):
+            q = matrix[qi]
+            t0 = time.perf_counter()
+            approx = codec.scores(codes, q)
+            approx[qi] = -np.inf
+            cand = select_top_k(approx, n_cand, -np.inf)
+            exact = matrix[cand] @ q
+            found = cand[select_top_k(exact, top_k, -np.inf)]
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+            hits_first += len(expected.intersection(cand[:top_k].tolist()))
+            hits += len(expected.intersection(found.tolist()))
+
+        total = max(1, sum(len(t) for t in truth))
+        report.append({
+            "codec": codec.label,
+            "bytes": codes.nbytes,
+            "fit_s": round(fit_s, 2),
+            "recall_first": round(hits_first / total, 4),
+            "recall": round(hits / total, 4),
+            "avg_ms": round(float(np.mean(latencies)), 3),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        })
+    return report
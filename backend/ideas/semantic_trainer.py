@@ -1,12 +1,12 @@
 import logging
 import os, random
-import numpy as np
 from datetime import datetime
-from sentence_transformers import SentenceTransformer, losses, InputExample
-from torch.utils.data import DataLoader
-from ideas.models import Idea, Connection
+from ideas.all_pairs import iter_topk_pairs, load_embedding_matrix, summarize_stats
+from ideas.analyze import promote_model
+from ideas.connection_writer import sync_semantic_connections
+from ideas.models import Idea
+from ideas.onnx_encoder import ENCODER_BACKEND, ONNX_QUANTIZED, export_onnx
 from django.conf import settings
-import torch
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +28,12 @@ DEFAULTS = getattr(settings, "MINDLINK_TRAIN", {
 # =====================================================
 
 def fine_tune_model():
+    # Import pigri: torch e sentence-transformers pesano secondi e centinaia di MB,
+    # questo modulo è importato da admin e urls ma il training è raro
+    import torch
+    from sentence_transformers import InputExample, SentenceTransformer, losses
+    from torch.utils.data import DataLoader
+
     ideas = list(Idea.objects.filter(used_for_training=False)[:50])
     if len(ideas) < 10:
         logger.info("⏳ Meno di 10 nuove idee, salto il training.")
@@ -76,6 +82,16 @@ def fine_tune_model():
     model.save(new_path)
     logger.info(f"✅ Nuovo modello salvato in {new_path}")
 
+    # 🔹 Con il backend ONNX la nuova versione va esportata prima di essere caricata
+    if ENCODER_BACKEND == "onnx":
+        try:
+            export_onnx(new_path, quantize=ONNX_QUANTIZED)
+        except Exception as e:
+            logger.error(f"⚠️ Export ONNX di {new_path} fallito, verrà usato PyTorch: {e}")
+
+    # 🔹 Promozione senza downtime: build in background, poi swap atomico nel processo web
+    promote_model(new_path)
+
     # 🔹 Marca le idee come usate
     Idea.objects.filter(id__in=[i.id for i in ideas]).update(used_for_training=True)
     logger.info(f"📘 Marcate {len(ideas)} idee come addestrate.")
@@ -96,71 +112,24 @@ def update_semantic_connections(model=None, top_k=None, strong_thr=None, weak_th
     strong_thr = strong_thr or DEFAULTS["STRONG_THR"]
     weak_thr = weak_thr or DEFAULTS["WEAK_THR"]
 
-    ideas = list(Idea.objects.exclude(embedding=None))
-    if len(ideas) < 2:
+    ids, matrix = load_embedding_matrix()
+    if len(ids) < 2:
         logger.info("ℹ️ Troppe poche idee per aggiornare connessioni.")
         return
 
-    # === Embedding Matrix ===
-    embeddings = np.array([np.array(i.embedding, dtype=float) for i in ideas])
-    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    embeddings = np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms != 0)
-
-    # === Similarity Matrix ===
-    sim_matrix = np.dot(embeddings, embeddings.T)
-    np.fill_diagonal(sim_matrix, 0.0)
-
-    new_connections = 0
-    updated_connections = 0
-    total_strong = 0
-    total_weak = 0
-    new_pairs = set()
-
-    for i, source in enumerate(ideas):
-        top_indices = np.argsort(sim_matrix[i])[::-1][:top_k]
-        for j in top_indices:
-            sim = float(sim_matrix[i, j])
-            if sim < weak_thr:
-                continue
-
-            target = ideas[j]
-            ctype = "semantic_strong" if sim >= strong_thr else "semantic_weak"
-            new_pairs.add((source.id, target.id))
-
-            conn, created = Connection.objects.update_or_create(
-                source=source,
-                target=target,
-                defaults={"strength": sim, "type": ctype}
-            )
-
-            if created:
-                new_connections += 1
-            else:
-                updated_connections += 1
-
-            if ctype == "semantic_strong":
-                total_strong += 1
-            else:
-                total_weak += 1
-
-    # === Pulizia connessioni obsolete ===
-    existing_pairs = set(
-        Connection.objects.filter(type__startswith="semantic")
-        .values_list("source_id", "target_id")
-    )
-    obsolete_pairs = existing_pairs - new_pairs
-    if obsolete_pairs:
-        Connection.objects.filter(
-            source_id__in=[s for s, _ in obsolete_pairs],
-            target_id__in=[t for _, t in obsolete_pairs],
-            type__startswith="semantic"
-        ).delete()
-        logger.info(f"🧹 Rimosse {len(obsolete_pairs)} connessioni obsolete.")
+    # === Top-k a blocchi (niente matrice N x N) + diff set-based sul DB ===
+    stats = {}
+    pairs = iter_topk_pairs(ids, matrix, top_k, weak_thr, stats=stats)
+    result = sync_semantic_connections(pairs, strong_thr)
+    new_connections = result["inserted"]
+    updated_connections = result["updated"]
+    total_strong = result["strong"]
+    total_weak = result["weak"]
+    if result["deleted"]:
+        logger.info(f"🧹 Rimosse {result['deleted']} connessioni obsolete.")
 
     # === Metriche di qualità ===
-    valid_sims = sim_matrix[sim_matrix > 0]
-    avg_sim = np.mean(valid_sims) if valid_sims.size else 0.0
-    std_sim = np.std(valid_sims) if valid_sims.size else 0.0
+    avg_sim, std_sim = summarize_stats(stats)
 
     logger.info(
         f"🔗 Connessioni aggiornate: {new_connections} nuove, {updated_connections} modificate "
@@ -174,6 +143,7 @@ def update_semantic_connections(model=None, top_k=None, strong_thr=None, weak_th
     return {
         "new": new_connections,
         "updated": updated_connections,
+        "deleted": result["deleted"],
         "strong": total_strong,
         "weak": total_weak,
         "avg_similarity": round(avg_sim, 4),
@@ -25,6 +25,7 @@ class ConnectionSerializer(serializers.ModelSerializer):
 class IdeaSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source="user.username")
     outgoing_connections = ConnectionSerializer(many=True, read_only=True)
+    embedding = serializers.SerializerMethodField()
 
     class Meta:
         model = Idea
@@ -35,6 +36,10 @@ class IdeaSerializer(serializers.ModelSerializer):
             "outgoing_connections",
         ]
 
+    def get_embedding(self, obj):
+        vec = obj.embedding_vector
+        return vec.tolist() if vec is not None else []
+
     def validate_title(self, value):
         if len(value) < 3:
             raise serializers.ValidationError("Il titolo deve contenere almeno 3 caratteri.")
@@ -0,0 +1,114 @@
+# ideas/signals.py
+# ---------------------------------------
+# 🔔 Signals del modello Idea
+# ---------------------------------------
+# Mantengono allineati l'indice vettoriale residente (vector_index), quello
+# dei passaggi (passages), la colonna pgvector, le connessioni semantiche
+# incrementali (incremental_connections), le document frequency delle
+# keyword (keywords) e gli indici dei modelli del pool (model_pool) quando
+# un'idea viene salvata o eliminata.
+# NB: gli update via queryset (.update()) non generano signals:
+# in quei casi l'indice va aggiornato esplicitamente (vedi analyze.py).
+
+import logging
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import incremental_connections, keywords, model_pool, passages, pgvector_backend
+from .models import Connection, Idea
+from .vector_index import index_remove, index_upsert
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(pre_save, sender=Idea)
+def remember_old_values(sender, instance, update_fields=None, **kwargs):
+    # Contenuto ed embedding precedenti: keyword e connessioni si aggiornano solo se cambiano
+    if instance.pk and (update_fields is None or {"content", "embedding"} & set(update_fields)):
+        old = Idea.objects.filter(pk=instance.pk).values_list("content", "embedding").first()
+        if old is not None:
+            instance._old_content = old[0]
+            instance._old_embedding = bytes(old[1]) if old[1] is not None else None
+
+
+@receiver(post_save, sender=Idea)
+def sync_keyword_stats_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and "content" not in update_fields:
+        return
+    old = None if created else getattr(instance, "_old_content", None)
+    if created or old != instance.content:
+        try:
+            keywords.update_document_frequencies(old, instance.content, docs_delta=1 if created else 0)
+        except Exception as e:
+            logger.error(f"Errore aggiornamento document frequency Idea #{instance.id}: {e}")
+
+
+@receiver(post_save, sender=Idea)
+def drop_passages_on_content_change(sender, instance, created, update_fields=None, **kwargs):
+    # Offset ed embedding dei passaggi si riferiscono al testo precedente: vengono
+    # ricalcolati alla prossima analisi (perform_full_analysis / batch)
+    if created or (update_fields is not None and "content" not in update_fields):
+        return
+    if getattr(instance, "_old_content", instance.content) != instance.content:
+        try:
+            passages.drop_passages(instance.id)
+        except Exception as e:
+            logger.error(f"Errore rimozione passaggi Idea #{instance.id}: {e}")
+
+
+@receiver(post_save, sender=Idea)
+def sync_pool_on_content_change(sender, instance, created, update_fields=None, **kwargs):
+    # Gli indici del pool codificano il contenuto con i propri modelli: il vettore
+    # dell'idea va ricalcolato (in background) quando il testo cambia
+    if update_fields is not None and "content" not in update_fields:
+        return
+    if created or getattr(instance, "_old_content", instance.content) != instance.content:
+        model_pool.invalidate_idea(instance.id)
+
+
+@receiver(post_save, sender=Idea)
+def sync_index_on_save(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and "embedding" not in update_fields:
+        return
+    new = bytes(instance.embedding) if instance.embedding is not None else None
+    if (created and new is None) or (not created and new == getattr(instance, "_old_embedding", False)):
+        return  # embedding invariato (es. modifica del solo titolo): niente da aggiornare
+    vec = instance.embedding_vector
+    if vec is not None:
+        index_upsert(instance.id, vec)
+    else:
+        index_remove(instance.id)
+    pgvector_backend.store_embedding(instance.id, vec)
+
+    if incremental_connections.INCREMENTAL_ENABLED:
+        # Scan O(N) dopo il commit, fuori dalla transazione della richiesta
+        incremental_connections.schedule(
+            incremental_connections.refresh_idea_connections, instance.id, None if vec is None else vec.copy()
+        )
+
+
+@receiver(pre_delete, sender=Idea)
+def collect_incoming_on_delete(sender, instance, **kwargs):
+    # Le connessioni entranti spariscono in CASCADE: servono dopo per ricalcolare le sorgenti
+    if incremental_connections.INCREMENTAL_ENABLED:
+        instance._semantic_incoming = list(
+            Connection.objects.filter(target_id=instance.id, type__startswith="semantic")
+            .values_list("source_id", flat=True)
+        )
+
+
+@receiver(post_delete, sender=Idea)
+def sync_index_on_delete(sender, instance, **kwargs):
+    index_remove(instance.id)
+    passages.index_remove_idea(instance.id)  # le righe IdeaPassage spariscono in CASCADE
+    model_pool.invalidate_idea(instance.id, removed=True)
+
+    try:
+        keywords.update_document_frequencies(instance.content, None, docs_delta=-1)
+    except Exception as e:
+        logger.error(f"Errore aggiornamento document frequency dopo Idea #{instance.id}: {e}")
+
+    incoming = getattr(instance, "_semantic_incoming", None)
+    if incoming:
+        incremental_connections.schedule(incremental_connections.refresh_after_delete, instance.id, incoming)
@@ -0,0 +1,101 @@
+# summarizer.py
+# ---------------------------------------
+# ✂️ MindLink Summarizer
+# ---------------------------------------
+# Riassunto estrattivo a costo limitato, indipendente dalla lunghezza del testo:
+# 1. split in frasi (come prima: [.!?], frasi di almeno 5 parole)
+# 2. prefiltro economico senza modello: score di posizione (le prime frasi
+#    pesano di più) + score lessicale (frequenza nel documento delle parole
+#    non stopword); restano al massimo MAX_SENTENCES frasi entro TOKEN_BUDGET
+#    parole, ognuna codificata con al massimo MAX_SENTENCE_WORDS parole
+# 3. encode in batch delle sole candidate (lo fa analyze.py)
+# 4. selezione: frase più vicina al centroide delle candidate oppure, con
+#    SUMMARY_SENTENCES > 1, selezione MMR (rilevanza vs ridondanza)
+#
+# Sui testi brevi (tutte le frasi entro i budget) il risultato coincide con
+# il riassunto precedente. Benchmark: `manage.py summary_report`.
+
+import re
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .keywords import tokenize
+from .text_utils import clean_text
+
+SUMMARY_SETTINGS = getattr(settings, "MINDLINK_SUMMARY", {})
+MAX_SENTENCES = SUMMARY_SETTINGS.get("MAX_SENTENCES", 32)
+TOKEN_BUDGET = SUMMARY_SETTINGS.get("TOKEN_BUDGET", 1024)  # parole codificate per testo
+MAX_SENTENCE_WORDS = SUMMARY_SETTINGS.get("MAX_SENTENCE_WORDS", 64)
+SUMMARY_SENTENCES = SUMMARY_SETTINGS.get("SUMMARY_SENTENCES", 1)
+MMR_LAMBDA = SUMMARY_SETTINGS.get("MMR_LAMBDA", 0.7)
+POSITION_WEIGHT = SUMMARY_SETTINGS.get("POSITION_WEIGHT", 0.3)
+
+SENTENCE_RE = re.compile(r"[.!?]")
+MIN_WORDS = 5
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s.strip() for s in SENTENCE_RE.split(text) if len(s.split()) >= MIN_WORDS]
+
+
+def for_encoding(sentence: str) -> str:
+    """Testo effettivamente codificato: la frase troncata a MAX_SENTENCE_WORDS parole."""
+    words = sentence.split()
+    return sentence if len(words) <= MAX_SENTENCE_WORDS else " ".join(words[:MAX_SENTENCE_WORDS])
+
+
+def candidate_sentences(text: str, max_sentences: int = MAX_SENTENCES,
+                        token_budget: int = TOKEN_BUDGET) -> list[str]:
+    """Frasi da codificare (in ordine di apparizione), entro i budget di frasi e parole."""
+    sentences = split_sentences(text)
+    lengths = [min(len(s.split()), MAX_SENTENCE_WORDS) for s in sentences]
+    if len(sentences) <= max_sentences and sum(lengths) <= token_budget:
+        return sentences
+
+    # Score economici: posizione + frequenza nel documento dei termini della frase
+    terms = [tokenize(s) for s in sentences]
+    tf = Counter(t for sentence_terms in terms for t in sentence_terms)
+    lexical = np.array([sum(tf[t] for t in set(st)) / (1 + len(st)) for st in terms], dtype=np.float64)
+    if lexical.max() > 0:
+        lexical /= lexical.max()
+    position = 1.0 / (1.0 + np.arange(len(sentences)) / 4.0)
+    scores = (1 - POSITION_WEIGHT) * lexical + POSITION_WEIGHT * position
+
+    chosen, used = [], 0
+    for i in np.argsort(-scores, kind="stable"):
+        if len(chosen) >= max_sentences:
+            break
+        if used + lengths[i] > token_budget:
+            continue
+        chosen.append(int(i))
+        used += lengths[i]
+    return [sentences[i] for i in sorted(chosen)]
+
+
+def pick_summary(text: str, sentences: list[str], embeddings: np.ndarray,
+                 n_sentences: int = SUMMARY_SENTENCES, mmr_lambda: float = MMR_LAMBDA) -> str:
+    """Frase più vicina al centroide delle candidate, o n frasi scelte con MMR."""
+    if not sentences:
+        return clean_text(text)[:150]
+    centroid = np.mean(embeddings, axis=0)
+    norms = np.linalg.norm(embeddings, axis=1)
+    norm_centroid = np.linalg.norm(centroid)
+    if norm_centroid == 0 or np.any(norms == 0):
+        return sentences[0].strip()
+    relevance = np.dot(embeddings, centroid) / (norms * norm_centroid)
+    if n_sentences <= 1 or len(sentences) == 1:
+        return sentences[int(np.argmax(relevance))].strip()
+
+    # MMR: rilevanza rispetto al centroide meno la somiglianza con le frasi già scelte
+    unit = embeddings / norms[:, None]
+    selected = [int(np.argmax(relevance))]
+    redundancy = unit @ unit[selected[0]]
+    while len(selected) < min(n_sentences, len(sentences)):
+        mmr = mmr_lambda * relevance - (1 - mmr_lambda) * redundancy
+        mmr[selected] = -np.inf
+        best = int(np.argmax(mmr))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, unit @ unit[best])
+    return ". ".join(sentences[i].strip() for i in sorted(selected)) + "."
@@ -0,0 +1,67 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas.ann import IVFIndex, select_top_k, synthetic_corpus
+
+
+def _recall(matrix, ivf, queries, top_k, nprobe):
+    found = 0
+    for qi in queries:
+        query = matrix[qi]
+        exact = set(select_top_k(matrix @ query, top_k, -np.inf).tolist())
+        cand = ivf.candidates(query, nprobe=nprobe)
+        approx = set(cand[select_top_k(matrix[cand] @ query, top_k, -np.inf)].tolist())
+        found += len(exact & approx)
+    return found / (top_k * len(queries))
+
+
+class SelectTopKTests(SimpleTestCase):
+    def test_sorted_and_thresholded(self):
+        sims = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+        self.assertEqual(select_top_k(sims, 3, 0.0).tolist(), [1, 3, 2])
+        self.assertEqual(select_top_k(sims, 3, 0.6).tolist(), [1, 3])
+        self.assertEqual(select_top_k(sims, 10, 0.0).size, 5)
+        self.assertEqual(select_top_k(np.array([]), 3, 0.0).size, 0)
+
+
+class IVFIndexTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.matrix = synthetic_corpus(3000, dim=32, n_clusters=60, seed=0)
+        cls.queries = np.random.default_rng(1).choice(cls.matrix.shape[0], 50, replace=False)
+
+    def test_every_row_assigned_once(self):
+        ivf = IVFIndex(n_lists=40, nprobe=4)
+        ivf.build(self.matrix)
+        self.assertEqual(len(ivf), self.matrix.shape[0])
+        everything = ivf.candidates(self.matrix[0], nprobe=40)
+        self.assertEqual(sorted(everything.tolist()), list(range(self.matrix.shape[0])))
+
+    def test_recall_grows_with_nprobe(self):
+        ivf = IVFIndex(n_lists=40, nprobe=4)
+        ivf.build(self.matrix)
+        low = _recall(self.matrix, ivf, self.queries, 10, nprobe=2)
+        high = _recall(self.matrix, ivf, self.queries, 10, nprobe=16)
+        self.assertGreaterEqual(high, low)
+        self.assertGreaterEqual(high, 0.9)
+        self.assertEqual(_recall(self.matrix, ivf, self.queries, 10, nprobe=40), 1.0)
+
+    def test_add_and_remove(self):
+        ivf = IVFIndex(n_lists=20, nprobe=20)
+        ivf.build(self.matrix, np.arange(100))
+        ivf.add(500, self.matrix[500])
+        self.assertIn(500, ivf.candidates(self.matrix[500]).tolist())
+        ivf.remove(500)
+        ivf.remove(3)
+        candidates = ivf.candidates(self.matrix[3]).tolist()
+        self.assertNotIn(500, candidates)
+        self.assertNotIn(3, candidates)
+        self.assertEqual(len(ivf), 99)
+
+    def test_reassigned_keeps_centroids(self):
+        ivf = IVFIndex(n_lists=20)
+        ivf.build(self.matrix[:200])
+        moved = ivf.reassigned(self.matrix[100:200], np.arange(100))
+        self.assertIs(moved.centroids, ivf.centroids)
+        self.assertEqual(len(moved), 100)
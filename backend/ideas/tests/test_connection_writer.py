@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ideas.connection_writer import sync_semantic_connections
+from ideas.models import Connection, Idea
+
+STRONG = 0.85
+
+
+class SyncSemanticConnectionsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="writer")
+        # bulk_create: niente signals (indice, connessioni incrementali)
+        self.a, self.b, self.c, self.d = Idea.objects.bulk_create(
+            [Idea(title=f"idea {i}", content=f"contenuto {i}", user=user) for i in range(4)]
+        )
+
+    def _connections(self):
+        return set(Connection.objects.values_list("source_id", "target_id", "type"))
+
+    def test_insert(self):
+        stats = sync_semantic_connections([(self.a.id, self.b.id, 0.9), (self.a.id, self.c.id, 0.7)], STRONG)
+        self.assertEqual(stats["inserted"], 2)
+        self.assertEqual(self._connections(), {
+            (self.a.id, self.b.id, "semantic_strong"),
+            (self.a.id, self.c.id, "semantic_weak"),
+        })
+
+    def test_update_type_flip_and_unchanged(self):
+        Connection.objects.create(source=self.a, target=self.b, type="semantic_weak", strength=0.7)
+        Connection.objects.create(source=self.a, target=self.c, type="semantic_weak", strength=0.7)
+        stats = sync_semantic_connections([(self.a.id, self.b.id, 0.9), (self.a.id, self.c.id, 0.70001)], STRONG)
+        self.assertEqual((stats["updated"], stats["unchanged"], stats["inserted"]), (1, 1, 0))
+        row = Connection.objects.get(source=self.a, target=self.b)
+        self.assertEqual((row.type, row.strength), ("semantic_strong", 0.9))
+
+    def test_stale_rows_deleted(self):
+        Connection.objects.create(source=self.a, target=self.d, type="semantic_weak", strength=0.6)
+        stats = sync_semantic_connections([(self.a.id, self.b.id, 0.7)], STRONG)
+        self.assertEqual(stats["deleted"], 1)
+        self.assertEqual(self._connections(), {(self.a.id, self.b.id, "semantic_weak")})
+
+    def test_manual_connections_untouched(self):
+        Connection.objects.create(source=self.a, target=self.b, type="related", strength=1.0)
+        stats = sync_semantic_connections([(self.a.id, self.b.id, 0.9), (self.b.id, self.b.id, 1.0)], STRONG)
+        self.assertEqual((stats["skipped_manual"], stats["inserted"]), (1, 0))
+        self.assertEqual(self._connections(), {(self.a.id, self.b.id, "related")})
+
+    def test_duplicates_removed_before_type_flip(self):
+        Connection.objects.create(source=self.a, target=self.b, type="semantic_weak", strength=0.7)
+        Connection.objects.create(source=self.a, target=self.b, type="semantic_strong", strength=0.9)
+        sync_semantic_connections([(self.a.id, self.b.id, 0.95)], STRONG)
+        self.assertEqual(self._connections(), {(self.a.id, self.b.id, "semantic_strong")})
+
+    def test_sources_limit_the_diff(self):
+        Connection.objects.create(source=self.c, target=self.d, type="semantic_weak", strength=0.6)
+        stats = sync_semantic_connections(
+            [(self.a.id, self.b.id, 0.7), (self.c.id, self.a.id, 0.7)], STRONG, sources={self.a.id}
+        )
+        self.assertEqual((stats["inserted"], stats["deleted"]), (1, 0))
+        self.assertEqual(self._connections(), {
+            (self.a.id, self.b.id, "semantic_weak"),
+            (self.c.id, self.d.id, "semantic_weak"),
+        })
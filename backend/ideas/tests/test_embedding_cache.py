@@ -0,0 +1,74 @@
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase
+from django.utils import timezone
+
+from ideas import embedding_cache
+from ideas.embedding_cache import cache_stats, content_hash, drop_version, encode_with_cache, prune
+from ideas.models import EmbeddingCacheEntry
+
+
+class RecordingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+class EmbeddingCacheTests(TestCase):
+    def test_only_missing_texts_are_encoded(self):
+        encoder = RecordingEncoder()
+        first = encode_with_cache("v1", ["aa", "b", "aa"], encoder)
+        np.testing.assert_array_equal(first, [[2, 1], [1, 1], [2, 1]])
+        self.assertEqual(encoder.calls, [["aa", "b"]])
+
+        second = encode_with_cache("v1", ["b", "ccc"], encoder)
+        np.testing.assert_array_equal(second, [[1, 1], [3, 1]])
+        self.assertEqual(encoder.calls[-1], ["ccc"])
+        self.assertEqual(EmbeddingCacheEntry.objects.count(), 3)
+
+    def test_versions_never_share_vectors(self):
+        encoder = RecordingEncoder()
+        encode_with_cache("v1", ["testo"], encoder)
+        encode_with_cache("v2", ["testo"], encoder)
+        self.assertEqual(len(encoder.calls), 2)
+        self.assertEqual(cache_stats(), {"v1": 1, "v2": 1})
+        self.assertEqual(drop_version("v1"), 1)
+        self.assertEqual(cache_stats(), {"v2": 1})
+
+    def test_superseded_version_is_not_stored(self):
+        encoder = RecordingEncoder()
+        encode_with_cache("v1", ["testo"], encoder, is_current=lambda: False)
+        self.assertFalse(EmbeddingCacheEntry.objects.exists())
+
+    def test_without_version_the_cache_is_bypassed(self):
+        encoder = RecordingEncoder()
+        encode_with_cache(None, ["testo"], encoder)
+        with mock.patch.object(embedding_cache, "CACHE_ENABLED", False):
+            encode_with_cache("v1", ["testo"], encoder)
+        self.assertEqual(len(encoder.calls), 2)
+        self.assertFalse(EmbeddingCacheEntry.objects.exists())
+
+    def test_lookup_errors_fall_back_to_encode(self):
+        encoder = RecordingEncoder()
+        with mock.patch.object(embedding_cache, "lookup", side_effect=RuntimeError("db giù")), \
+                self.assertLogs("ideas.embedding_cache", "WARNING"):
+            np.testing.assert_array_equal(encode_with_cache("v1", ["ab"], encoder), [[2, 1]])
+
+    def test_prune_drops_least_recently_used(self):
+        encode_with_cache("v1", ["a", "b", "c"], RecordingEncoder())
+        old = timezone.now() - timedelta(days=1)
+        EmbeddingCacheEntry.objects.filter(content_hash__in=[content_hash("a"), content_hash("c")]).update(
+            last_used=old
+        )
+        # Un hit su una voce vecchia ne rinfresca last_used
+        embedding_cache.lookup("v1", [content_hash("c")])
+
+        self.assertEqual(prune(max_entries=2), 1)
+        remaining = set(EmbeddingCacheEntry.objects.values_list("content_hash", flat=True))
+        self.assertEqual(remaining, {content_hash("b"), content_hash("c")})
+        self.assertEqual(prune(max_entries=2), 0)
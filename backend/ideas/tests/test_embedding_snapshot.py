@@ -0,0 +1,92 @@
+import shutil
+import tempfile
+import time
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from ideas import embedding_snapshot
+from ideas.embedding_snapshot import SnapshotIndex, read_pointer, write_snapshot
+from ideas.models import Idea, embedding_to_bytes
+
+
+def _unit(*values):
+    vec = np.zeros(8, dtype=np.float32)
+    vec[:len(values)] = values
+    return vec / np.linalg.norm(vec)
+
+
+class SnapshotIndexTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.user = User.objects.create(username="snapshot")
+        # bulk_create: niente signals (l'indice di processo non è coinvolto)
+        self.a, self.b, self.c = Idea.objects.bulk_create([
+            Idea(title="a", content="a", user=self.user, embedding=embedding_to_bytes(_unit(1))),
+            Idea(title="b", content="b", user=self.user, embedding=embedding_to_bytes(_unit(0, 1))),
+            Idea(title="c", content="c", user=self.user),
+        ])
+
+    def _open(self):
+        write_snapshot(self.directory)
+        return SnapshotIndex.open(self.directory)
+
+    def test_write_and_search(self):
+        index = self._open()
+        self.assertEqual(read_pointer(self.directory)["count"], 2)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.search(_unit(1, 0.1), top_k=1, min_threshold=0.0)[0], [self.a.id])
+
+    def test_no_snapshot(self):
+        self.assertIsNone(SnapshotIndex.open(self.directory))
+
+    def test_local_upsert_shadows_base(self):
+        index = self._open()
+        index.upsert(self.a.id, _unit(0, 0, 1))
+        self.assertEqual(index.search(_unit(1), top_k=1, min_threshold=0.5)[0], [])
+        self.assertEqual(index.search(_unit(0, 0, 1), top_k=1, min_threshold=0.5)[0], [self.a.id])
+        index.remove(self.b.id)
+        self.assertEqual(len(index), 1)
+
+    def test_delta_sees_ideas_analyzed_after_the_snapshot(self):
+        index = self._open()
+        # Idea creata prima dello snapshot, analizzata dopo (da un altro worker)
+        Idea.objects.filter(pk=self.c.pk).update(
+            embedding=embedding_to_bytes(_unit(0, 0, 1)), embedding_updated_at=timezone.now()
+        )
+        self.assertEqual(index.refresh_delta(), 1)
+        self.assertEqual(index.search(_unit(0, 0, 1), top_k=1, min_threshold=0.5)[0], [self.c.id])
+        self.assertEqual(index.refresh_delta(), 0)  # invariata: niente da riapplicare
+
+        Idea.objects.filter(pk=self.c.pk).delete()
+        self.assertEqual(index.refresh_delta(), 1)
+        self.assertEqual(index.search(_unit(0, 0, 1), top_k=1, min_threshold=0.5)[0], [])
+
+    def test_rebuild_maps_new_version_and_keeps_newer_delta(self):
+        index = self._open()
+        first = index.version
+        time.sleep(0.01)
+        write_snapshot(self.directory)
+        index.upsert(999, _unit(1, 1))  # modifica successiva al nuovo snapshot
+        index.rebuild()
+        self.assertNotEqual(index.version, first)
+        self.assertIn(999, index.search(_unit(1, 1), top_k=1, min_threshold=0.9)[0])
+
+    def test_is_stale_does_no_io(self):
+        index = self._open()
+        self.assertFalse(index.is_stale())
+        with mock.patch.object(embedding_snapshot, "read_pointer") as read:
+            index._checked_at = 0.0
+            self.assertTrue(index.is_stale())
+        read.assert_not_called()
+
+    def test_rebuild_schedules_snapshot_when_too_old(self):
+        index = self._open()
+        index.created_at -= embedding_snapshot.MAX_AGE + 1
+        with mock.patch.object(embedding_snapshot, "schedule_snapshot") as schedule:
+            index.rebuild()
+        schedule.assert_called_once_with(self.directory)
@@ -0,0 +1,64 @@
+import threading
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas.encode_batcher import EncodeBatcher
+
+
+class RecordingEncoder:
+    """encode_fn finta: un vettore [len(testo)] per testo, registra le dimensioni dei batch."""
+
+    def __init__(self, gate: threading.Event | None = None):
+        self.sizes = []
+        self.gate = gate
+
+    def __call__(self, texts):
+        if self.gate is not None:
+            self.gate.wait(5)
+        self.sizes.append(len(texts))
+        return np.array([[len(t)] for t in texts], dtype=np.float32)
+
+
+class EncodeBatcherTests(SimpleTestCase):
+    def test_rows_returned_in_order(self):
+        batcher = EncodeBatcher(RecordingEncoder(), max_batch=8, max_wait_ms=1)
+        texts = ["a", "bb", "ccc"]
+        self.assertEqual(batcher.encode(texts)[:, 0].tolist(), [1, 2, 3])
+        self.assertIsNone(batcher.encode([]))
+
+    def test_concurrent_requests_are_merged(self):
+        gate = threading.Event()
+        encoder = RecordingEncoder(gate)
+        batcher = EncodeBatcher(encoder, max_batch=64, max_wait_ms=50)
+        # La prima richiesta occupa il worker finché gate non si apre: le altre si accodano
+        first = batcher.submit(["x"])
+        futures = [batcher.submit(["t" * (i + 1)] * 2) for i in range(5)]
+        gate.set()
+        self.assertEqual(first.result(5)[:, 0].tolist(), [1])
+        for i, future in enumerate(futures):
+            self.assertEqual(future.result(5)[:, 0].tolist(), [i + 1, i + 1])
+        self.assertEqual(sum(encoder.sizes), 11)
+        self.assertLess(batcher.batches, 6)
+
+    def test_batches_never_exceed_max_batch(self):
+        gate = threading.Event()
+        encoder = RecordingEncoder(gate)
+        batcher = EncodeBatcher(encoder, max_batch=4, max_wait_ms=50)
+        futures = [batcher.submit(["a"] * 3) for _ in range(4)]
+        big = batcher.submit([str(i) * (i + 1) for i in range(10)])
+        gate.set()
+        for future in futures:
+            self.assertEqual(future.result(5).shape, (3, 1))
+        self.assertEqual(big.result(5)[:, 0].tolist(), list(range(1, 11)))
+        self.assertTrue(encoder.sizes)
+        self.assertLessEqual(max(encoder.sizes), 4)
+        self.assertEqual(sum(encoder.sizes), 22)
+
+    def test_errors_propagate_to_every_request(self):
+        def failing(texts):
+            raise ValueError("modello non disponibile")
+
+        batcher = EncodeBatcher(failing, max_batch=2, max_wait_ms=1)
+        with self.assertRaises(ValueError), self.assertLogs("ideas.encode_batcher", "ERROR"):
+            batcher.encode(["a", "b", "c"])
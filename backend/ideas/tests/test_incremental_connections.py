@@ -0,0 +1,117 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ideas import incremental_connections as inc
+from ideas import vector_index
+from ideas.models import Connection, Idea
+from ideas.vector_index import EmbeddingIndex
+
+TOP_K = 3
+
+
+def _rows(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(size=(n, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+@mock.patch.multiple(inc, TOP_K=TOP_K, MIN_THRESHOLD=-1.0, STRONG_THRESHOLD=0.9)
+class IncrementalConnectionsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="incremental")
+        self.vectors = dict(enumerate(_rows(30), start=0))
+        ideas = [Idea(title=f"idea {i}", content=f"contenuto {i}", user=user) for i in self.vectors]
+        for idea, vec in zip(ideas, self.vectors.values()):
+            idea.set_embedding(vec)
+        # bulk_create: niente signals (indice, connessioni incrementali)
+        self.ids = [idea.id for idea in Idea.objects.bulk_create(ideas)]
+        self.vectors = {idea_id: vec for idea_id, vec in zip(self.ids, self.vectors.values())}
+
+        self.index = EmbeddingIndex(source=lambda: list(self.vectors.items()))
+        self.index.rebuild()
+        patcher = mock.patch.object(vector_index, "_index", self.index)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _exact(self):
+        """Top-k esatto di tutte le idee presenti, come insieme di archi."""
+        ids = list(self.vectors)
+        matrix = np.stack([self.vectors[i] for i in ids])
+        sims = matrix @ matrix.T
+        np.fill_diagonal(sims, -np.inf)
+        return {
+            (ids[row], ids[col])
+            for row in range(len(ids))
+            for col in np.argsort(-sims[row])[:TOP_K].tolist()
+        }
+
+    def _edges(self):
+        return set(Connection.objects.filter(type__startswith="semantic").values_list("source_id", "target_id"))
+
+    def _seed_connections(self):
+        for idea_id in self.vectors:
+            inc.sync_semantic_connections(
+                [(idea_id, t, s) for t, s in inc._top_k_of(idea_id)], 0.9, sources={idea_id}
+            )
+
+    def _move(self, idea_id, vec):
+        self.vectors[idea_id] = vec
+        Idea.objects.filter(pk=idea_id).update(embedding=vec.astype(np.float32).tobytes())
+        self.index.upsert(idea_id, vec)
+
+    def test_new_idea_needs_no_rescan(self):
+        new_id = self.ids[-1]
+        vec = self.vectors.pop(new_id)
+        self.index.remove(new_id)
+        self._seed_connections()
+
+        self.vectors[new_id] = vec
+        self.index.upsert(new_id, vec)
+        with mock.patch.object(inc, "_top_k_of", wraps=inc._top_k_of) as top_k_of:
+            inc.refresh_idea_connections(new_id, vec)
+        top_k_of.assert_not_called()
+        self.assertEqual(self._edges(), self._exact())
+
+    def test_moved_idea_matches_full_recompute(self):
+        self._seed_connections()
+        moved = self.ids[0]
+        self._move(moved, _rows(1, seed=7)[0])
+        inc.refresh_idea_connections(moved, self.vectors[moved])
+        self.assertEqual(self._edges(), self._exact())
+
+    def test_rescans_are_capped(self):
+        self._seed_connections()
+        moved = self.ids[0]
+        # Lontanissima da tutte: esce da ogni lista che la conteneva
+        incoming = set(Connection.objects.filter(target_id=moved).values_list("source_id", flat=True))
+        self.assertTrue(incoming)
+        far = -np.mean(list(self.vectors.values()), axis=0)
+        self._move(moved, far / np.linalg.norm(far))
+
+        with mock.patch.object(inc, "MAX_RESCANS", 0), \
+                mock.patch.object(inc, "_top_k_of", wraps=inc._top_k_of) as top_k_of:
+            inc.refresh_idea_connections(moved, self.vectors[moved])
+        top_k_of.assert_not_called()
+
+        # Le liste non riscansionate restano con k-1 vicini, tutti corretti
+        edges, exact = self._edges(), self._exact()
+        self.assertFalse(Connection.objects.filter(source_id__in=incoming, target_id=moved).exclude(
+            source_id__in=[s for s, t in exact if t == moved]).exists())
+        for source in incoming - {s for s, t in exact if t == moved}:
+            mine = {t for s, t in edges if s == source}
+            self.assertEqual(len(mine), TOP_K - 1)
+            self.assertTrue(mine <= {t for s, t in exact if s == source})
+
+    def test_delete_refreshes_incoming_lists(self):
+        self._seed_connections()
+        removed = self.ids[5]
+        incoming = list(Connection.objects.filter(target_id=removed).values_list("source_id", flat=True))
+        self.vectors.pop(removed)
+        self.index.remove(removed)
+        Idea.objects.filter(pk=removed).delete()
+
+        inc.refresh_after_delete(removed, incoming)
+        self.assertEqual(self._edges(), self._exact())
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ideas import keywords
+from ideas.models import Idea, TermDocumentFrequency
+from ideas.text_utils import clean_text
+
+CORPUS = [
+    "Il gatto dorme sul divano mentre il cane gioca in giardino",
+    "Il cane abbaia al postino, il gatto osserva dalla finestra",
+    "Una ricetta veloce: pasta, pomodoro, basilico e olio",
+    "Pasta fresca fatta in casa con farina e uova",
+]
+
+
+def _df():
+    return dict(TermDocumentFrequency.objects.values_list("term", "df"))
+
+
+class TokenizeTests(TestCase):
+    def test_lowercase_stopwords_and_short_tokens(self):
+        self.assertEqual(keywords.tokenize("Il Gatto e il CANE, a casa!"), ["gatto", "cane", "casa"])
+        self.assertEqual(keywords.document_terms(None), set())
+
+
+class KeywordModelTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="keywords")
+        patcher = mock.patch.object(keywords, "_model", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _bulk(self, texts):
+        # bulk_create: niente signals, le df si costruiscono con il rebuild
+        Idea.objects.bulk_create([Idea(title=f"idea {i}", content=t, user=self.user) for i, t in enumerate(texts)])
+
+    def test_matches_tfidf_vectorizer_on_the_corpus(self):
+        self._bulk(CORPUS)
+        stats = keywords.rebuild_document_frequencies()
+        self.assertEqual(stats["documents"], len(CORPUS))
+
+        vectorizer = TfidfVectorizer(
+            preprocessor=lambda t: clean_text(t).lower(), stop_words=list(keywords.STOPWORDS), norm=None
+        )
+        matrix = vectorizer.fit_transform(CORPUS).toarray()
+        terms = vectorizer.get_feature_names_out().tolist()
+        expected = [
+            [terms[c] for _, c in sorted(((-w, c) for c, w in enumerate(row) if w > 0),
+                                         key=lambda x: (x[0], terms[x[1]]))[:3]]
+            for row in matrix
+        ]
+        self.assertEqual(keywords.extract_keywords_batch(CORPUS, top_k=3), expected)
+
+    def test_empty_texts(self):
+        self.assertEqual(keywords.extract_keywords_batch(["", None, "il e a"]), [[], [], []])
+
+    def test_signals_keep_document_frequencies_incremental(self):
+        model = keywords.get_keyword_model()
+        idea = Idea.objects.create(title="a", content="gatto cane", user=self.user)
+        Idea.objects.create(title="b", content="gatto", user=self.user)
+        self.assertEqual(_df(), {"gatto": 2, "cane": 1})
+        self.assertEqual((model.df, model.n_docs), ({"gatto": 2, "cane": 1}, 2))
+
+        idea.content = "cane pasta"
+        idea.save()
+        self.assertEqual(_df(), {"gatto": 1, "cane": 1, "pasta": 1})
+
+        idea.delete()
+        self.assertEqual(_df(), {"gatto": 1})
+        self.assertEqual((model.df, model.n_docs), ({"gatto": 1}, 1))
+
+        # Il rebuild completo concorda con gli aggiornamenti incrementali
+        keywords.rebuild_document_frequencies()
+        self.assertEqual(_df(), {"gatto": 1})
+
+    def test_stale_model_is_reloaded(self):
+        model = keywords.get_keyword_model()
+        self.assertIs(keywords.get_keyword_model(), model)
+        with mock.patch.object(keywords, "MAX_AGE", -1):
+            self.assertIsNot(keywords.get_keyword_model(), model)
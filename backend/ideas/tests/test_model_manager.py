@@ -0,0 +1,133 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ideas import analyze
+from ideas.model_manager import ModelManager, ModelSlot
+from ideas.model_server import ModelClient
+
+
+class FakeModel:
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def _loader(path):
+    name = path or "v1"
+    return ModelSlot(FakeModel(name), name, 4)
+
+
+class ModelManagerTests(SimpleTestCase):
+    def test_single_load_under_concurrency(self):
+        calls = []
+
+        def loader(path):
+            calls.append(path)
+            return _loader(path)
+
+        manager = ModelManager(loader)
+        threads = [threading.Thread(target=manager.current) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(calls, [None])
+
+    def test_promote_swaps_and_calls_on_swap(self):
+        swapped = []
+        manager = ModelManager(_loader, on_swap=lambda slot: swapped.append(slot.version))
+        old = manager.current()
+        new = manager.promote("v2", wait=True)
+        self.assertIs(manager.current(), new)
+        self.assertEqual(swapped, ["v1", "v2"])
+        self.assertIsNone(old.model)
+
+    def test_failed_promotion_keeps_current(self):
+        manager = ModelManager(_loader)
+        current = manager.current()
+
+        def broken(path):
+            raise OSError("modello mancante")
+
+        manager.loader = broken
+        with self.assertLogs("ideas.model_manager", "ERROR"):
+            self.assertIsNone(manager.promote("v2", wait=True))
+        self.assertIs(manager.current(), current)
+
+    def test_retire_waits_for_leases(self):
+        manager = ModelManager(_loader, drain_timeout=5)
+        inside, release = threading.Event(), threading.Event()
+        seen = []
+
+        def long_call():
+            with manager.lease() as slot:
+                inside.set()
+                release.wait(5)
+                seen.append(slot.model)
+
+        worker = threading.Thread(target=long_call)
+        worker.start()
+        inside.wait(5)
+        old = manager.current()
+        promotion = manager.promote("v2")
+        release.set()
+        worker.join(5)
+        promotion.join(5)
+        self.assertEqual(seen[0].name, "v1")
+        self.assertTrue(seen[0].closed)
+        self.assertIsNone(old.model)
+
+    def test_leased_model_survives_drain_timeout(self):
+        manager = ModelManager(_loader, drain_timeout=0.01)
+        with manager.lease() as slot:
+            with self.assertLogs("ideas.model_manager", "WARNING"):
+                manager.promote("v2", wait=True)
+            # Il lease in corso continua a usare il vecchio modello, né chiuso né rilasciato
+            self.assertIsNotNone(slot.model)
+            self.assertFalse(slot.model.closed)
+        with manager.lease() as slot:
+            self.assertEqual(slot.version, "v2")
+
+    def test_adopt_installs_without_loading_or_closing(self):
+        swapped = []
+        manager = ModelManager(_loader, on_swap=lambda slot: swapped.append(slot.version))
+        old = manager.current()
+        shared = old.model
+        manager.adopt(ModelSlot(shared, "v2", 8))
+        self.assertEqual((manager.current().version, manager.current().dim), ("v2", 8))
+        self.assertEqual(swapped, ["v1", "v2"])
+        self.assertIs(old.model, shared)
+        self.assertFalse(shared.closed)
+
+
+class ServerVersionTests(SimpleTestCase):
+    """Modalità client: una promozione fatta da un altro worker aggiorna lo stato del processo."""
+
+    def test_server_version_change_is_adopted(self):
+        client = mock.create_autospec(ModelClient, instance=True)
+        manager = ModelManager(lambda path: ModelSlot(client, "v1", 4), on_swap=analyze._on_model_swap)
+        with mock.patch.object(analyze, "_manager", manager), \
+                mock.patch.object(analyze, "on_model_version") as on_model_version, \
+                mock.patch.object(analyze.pgvector_backend, "set_model_dim"), \
+                mock.patch.object(analyze, "_model_version", None), \
+                mock.patch.object(analyze, "EMBEDDING_DIM", 384):
+            manager.current()
+            analyze._cached_encode.cache_clear()
+            with mock.patch.object(analyze, "_encode_through_cache", return_value=[[1.0, 0.0]]):
+                analyze._cached_encode("v1", "testo")
+            self.assertEqual(analyze._cached_encode.cache_info().currsize, 1)
+
+            analyze._on_server_version({"version": "v2", "dim": 8, "pid": 1})
+            self.assertEqual((analyze._model_version, analyze.EMBEDDING_DIM), ("v2", 8))
+            self.assertIs(manager.current().model, client)
+            self.assertEqual(analyze._cached_encode.cache_info().currsize, 0)
+            on_model_version.assert_called_with("v2")
+
+            # Stessa versione: nessuno swap
+            analyze._on_server_version({"version": "v2", "dim": 8, "pid": 1})
+            self.assertEqual(on_model_version.call_count, 2)
@@ -0,0 +1,120 @@
+import string
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from ideas import model_pool
+from ideas.model_manager import ModelSlot
+from ideas.model_pool import ModelPool, PooledModel, resolve_model
+from ideas.models import Idea
+
+
+class _Weights:
+    def __init__(self, n):
+        self.n = n
+
+    def numel(self):
+        return self.n
+
+    def element_size(self):
+        return 1
+
+
+class LetterEncoder:
+    """Encoder finto: conteggio delle lettere del testo (26 dimensioni)."""
+
+    def __init__(self, nbytes=1000):
+        self.nbytes = nbytes
+        self.encoded = 0
+
+    def parameters(self):
+        return [_Weights(self.nbytes)]
+
+    def encode(self, texts, **kwargs):
+        self.encoded += len(texts)
+        return np.array(
+            [[t.lower().count(c) for c in string.ascii_lowercase] for t in texts], dtype=np.float32
+        )
+
+
+def _loader(path):
+    return ModelSlot(LetterEncoder(), f"pool-{path}", 26)
+
+
+def _built(entry):
+    entry.get_index()
+    return entry.get_index()
+
+
+class ResolveModelTests(TestCase):
+    @mock.patch.object(model_pool, "ALLOWED_MODELS", ["all-MiniLM-L6-v2"])
+    def test_only_allowed_names(self):
+        self.assertEqual(resolve_model("all-MiniLM-L6-v2"), "all-MiniLM-L6-v2")
+        self.assertIsNone(resolve_model(None))
+        with self.assertLogs("ideas.model_pool", "WARNING"):
+            self.assertIsNone(resolve_model("/etc/passwd"))
+
+
+class ModelPoolTests(TestCase):
+    def setUp(self):
+        # Build e aggiornamenti eseguiti subito nel thread del test (stessa transazione)
+        for target, name, value in (
+            (PooledModel, "_start", lambda entry, target: target() or True),
+            (model_pool, "close_old_connections", lambda: None),
+        ):
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.user = User.objects.create(username="pool")
+        self.ideas = Idea.objects.bulk_create([
+            Idea(title="a", content="aaaa", user=self.user),
+            Idea(title="b", content="bbbb", user=self.user),
+            Idea(title="c", content="cccc", user=self.user),
+        ])
+
+    def test_lru_eviction_within_budget(self):
+        pool = ModelPool(_loader, ram_budget_mb=0.0025)  # due modelli da 1000 byte
+        pool.get("m1")
+        pool.get("m2")
+        pool.get("m1")
+        pool.get("m3")
+        self.assertEqual([m["model"] for m in pool.status()["models"]], ["m3", "m1"])
+
+    def test_search_falls_back_while_building(self):
+        pool = ModelPool(_loader)
+        entry = pool.get("m1")
+        with mock.patch.object(entry, "get_index", return_value=None):
+            self.assertIsNone(pool.search_text("m1", "aaaa", 2, 0.5))
+        _built(entry)
+        ids, sims = pool.search_text("m1", "aaa", 2, 0.5)
+        self.assertEqual(ids, [self.ideas[0].id])
+        self.assertAlmostEqual(sims[0], 1.0, places=5)
+
+    def test_rebuild_reuses_unchanged_vectors(self):
+        pool = ModelPool(_loader)
+        entry = pool.get("m1")
+        _built(entry)
+        encoded = entry.slot.model.encoded
+        entry._build_index()
+        self.assertEqual(entry.slot.model.encoded, encoded)
+
+    def test_content_change_and_delete_follow_signals(self):
+        pool = ModelPool(_loader)
+        entry = pool.get("m1")
+        index = _built(entry)
+        idea = self.ideas[0]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            idea.content = "zzzz"
+            idea.save()
+        # Il vettore vecchio esce subito; quello nuovo arriva dall'aggiornamento in background
+        self.assertEqual(pool.search_text("m1", "aaaa", 3, 0.5), ([], []))
+        ids, _ = pool.search_text("m1", "zz", 1, 0.5)
+        self.assertEqual(ids, [idea.id])
+        self.assertIs(entry.get_index(), index)
+
+        self.ideas[1].delete()
+        self.assertEqual(pool.search_text("m1", "bbbb", 3, 0.5), ([], []))
+        self.assertEqual(len(index), 2)
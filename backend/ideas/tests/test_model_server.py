@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas import analyze, model_server
+from ideas.model_server import ModelClient, ModelServerError
+
+
+class CodecTests(SimpleTestCase):
+    def test_texts_round_trip(self):
+        texts = ["ciao", "", "perché ☕", "x" * 1000]
+        self.assertEqual(model_server._unpack_texts(model_server._pack_texts(texts)), texts)
+
+    def test_matrix_round_trip(self):
+        matrix = np.arange(12, dtype=np.float64).reshape(3, 4)
+        unpacked = model_server._unpack_matrix(model_server._pack_matrix(matrix))
+        self.assertEqual(unpacked.dtype, np.dtype("<f4"))
+        np.testing.assert_array_equal(unpacked, matrix)
+        self.assertEqual(model_server._unpack_matrix(model_server._pack_matrix(np.ones(4))).shape, (1, 4))
+
+
+def _fake_encode(texts):
+    return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def _fake_analyze(texts):
+    return [
+        {
+            "summary": t[:3], "category": "arte", "keywords": [t], "passages": [(0, len(t))] * (i + 1),
+            "embedding": np.full(2, i, dtype=np.float32),
+            "passage_embeddings": np.full((i + 1, 2), 10 + i, dtype=np.float32),
+        }
+        for i, t in enumerate(texts)
+    ]
+
+
+class ModelServerRoundTripTests(SimpleTestCase):
+    """Demone reale su un socket Unix temporaneo, con le funzioni di analyze sostituite."""
+
+    def setUp(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        self.socket_path = os.path.join(tmp, "model.sock")
+
+        for name, value in {
+            "encode_texts": _fake_encode, "analyze_texts": _fake_analyze, "get_model": lambda: None,
+            "promote_model": mock.DEFAULT, "_model_version": "v1", "EMBEDDING_DIM": 2,
+            "get_latest_model_path": lambda: "v1",
+        }.items():
+            patcher = mock.patch.object(analyze, name, value)
+            patched = patcher.start()
+            self.addCleanup(patcher.stop)
+            if name == "promote_model":
+                self.promote = patched
+
+        server = model_server._Server(self.socket_path, model_server._Handler)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def test_info_and_encode(self):
+        client = ModelClient(self.socket_path)
+        self.assertEqual((client.version, client.get_sentence_embedding_dimension()), ("v1", 2))
+        self.assertEqual(client.info["pid"], os.getpid())
+
+        np.testing.assert_array_equal(client.encode(["ab", "c"]), [[2, 1], [1, 1]])
+        np.testing.assert_array_equal(client.encode("abc"), [3, 1])
+        self.assertEqual(client.encode([]).shape, (0, 2))
+
+    def test_analyze_splits_passage_embeddings(self):
+        client = ModelClient(self.socket_path)
+        results = client.analyze(["uno", "due"])
+        self.assertEqual([r["summary"] for r in results], ["uno", "due"])
+        self.assertEqual(results[1]["passages"], [(0, 3), (0, 3)])
+        np.testing.assert_array_equal(results[1]["embedding"], [1, 1])
+        np.testing.assert_array_equal(results[0]["passage_embeddings"], [[10, 10]])
+        np.testing.assert_array_equal(results[1]["passage_embeddings"], [[11, 11], [11, 11]])
+
+    def test_promote_forwards_path(self):
+        client = ModelClient(self.socket_path)
+        client.promote("models/mindlink-v2")
+        self.promote.assert_called_once_with("models/mindlink-v2", wait=True)
+
+    def test_promote_to_the_loaded_version_is_skipped(self):
+        client = ModelClient(self.socket_path)
+        self.assertEqual(client.promote("v1")["version"], "v1")
+        self.promote.assert_not_called()
+
+    def test_version_change_in_reply_calls_on_version(self):
+        on_version = mock.Mock()
+        client = ModelClient(self.socket_path, on_version=on_version)
+        client.encode(["a"])
+        on_version.assert_not_called()
+
+        # Un altro worker ha promosso v2 nel demone
+        with mock.patch.object(analyze, "_model_version", "v2"):
+            np.testing.assert_array_equal(client.encode(["ab"]), [[2, 1]])
+            client.analyze(["uno"])
+        on_version.assert_called_once()
+        self.assertEqual(on_version.call_args.args[0]["version"], "v2")
+        self.assertEqual(client.version, "v2")
+
+    def test_check_version_without_encode(self):
+        on_version = mock.Mock()
+        client = ModelClient(self.socket_path, on_version=on_version)
+        with mock.patch.object(analyze, "_model_version", "v2"):
+            client.check_version()  # risposta recente: nessuna verifica
+            on_version.assert_not_called()
+            client.check_version(max_age=0)
+        self.assertEqual(on_version.call_args.args[0]["version"], "v2")
+
+    def test_server_errors_are_raised_on_the_client(self):
+        client = ModelClient(self.socket_path)
+        with mock.patch.object(analyze, "encode_texts", side_effect=ValueError("boom")), \
+                self.assertLogs("ideas.model_server", "ERROR"):
+            with self.assertRaisesMessage(ModelServerError, "boom"):
+                client.encode(["a"])
+        # La connessione resta utilizzabile dopo un errore applicativo
+        np.testing.assert_array_equal(client.encode(["a"]), [[1, 1]])
+
+    def test_client_reconnects_after_a_dropped_socket(self):
+        client = ModelClient(self.socket_path)
+        client._local.sock.close()
+        np.testing.assert_array_equal(client.encode(["ab"]), [[2, 1]])
@@ -0,0 +1,85 @@
+import threading
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas import passages, vector_index
+from ideas.vector_index import EmbeddingIndex
+
+
+@mock.patch.object(passages, "PASSAGES_ENABLED", True)
+@mock.patch.object(passages, "WORDS", 10)
+@mock.patch.object(passages, "OVERLAP", 3)
+@mock.patch.object(passages, "MAX_PASSAGES", 64)
+class ChunkSpansTests(SimpleTestCase):
+    def _text(self, n):
+        return " ".join(f"w{i}" for i in range(n))
+
+    def test_short_text_has_no_passages(self):
+        self.assertEqual(passages.chunk_spans(self._text(10)), [])
+        self.assertEqual(passages.chunk_spans(""), [])
+
+    def test_overlapping_windows_cover_the_text(self):
+        text = self._text(24)
+        spans = passages.chunk_spans(text)
+        windows = [text[s:e].split() for s, e in spans]
+        self.assertEqual([w[0] for w in windows], ["w0", "w7", "w14"])
+        self.assertTrue(all(len(w) <= 10 for w in windows))
+        self.assertEqual(windows[0][-3:], windows[1][:3])  # OVERLAP parole in comune
+        self.assertEqual(spans[-1][1], len(text))
+
+    def test_max_passages(self):
+        with mock.patch.object(passages, "MAX_PASSAGES", 2):
+            self.assertEqual(len(passages.chunk_spans(self._text(100))), 2)
+
+    def test_disabled(self):
+        with mock.patch.object(passages, "PASSAGES_ENABLED", False):
+            self.assertEqual(passages.chunk_spans(self._text(100)), [])
+
+
+class MergeHitsTests(SimpleTestCase):
+    def test_best_of_idea_and_passage(self):
+        ids, sims = passages.merge_hits(
+            [1, 2, 3], [0.9, 0.6, 0.5],
+            {2: (0, 0.95), 3: (4, 0.4), 7: (1, 0.7)},
+            top_k=3,
+        )
+        self.assertEqual(ids, [2, 1, 7])
+        self.assertEqual(sims, [0.95, 0.9, 0.7])
+
+    def test_no_hits_keeps_order(self):
+        self.assertEqual(passages.merge_hits([4, 5], [0.8, 0.7], {}, top_k=5), ([4, 5], [0.8, 0.7]))
+
+
+class PassageIndexTests(SimpleTestCase):
+    def setUp(self):
+        passages.reset_passage_index()
+        self.addCleanup(passages.reset_passage_index)
+
+    def _index(self, keys):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(len(keys), 8)).astype(np.float32)
+        index = EmbeddingIndex(source=lambda: zip(keys, vectors))
+        index.rebuild()
+        passages._index = index
+        return index
+
+    def test_remove_idea_drops_every_position(self):
+        stride = passages.POSITION_STRIDE
+        index = self._index([7 * stride, 7 * stride + 1, 7 * stride + 900, 8 * stride, 6 * stride + 3])
+        passages.index_remove_idea(7)
+        _, ids = index.snapshot()
+        self.assertEqual(sorted(int(i) for i in ids if i >= 0), [6 * stride + 3, 8 * stride])
+
+    def test_stale_index_rebuilt_in_background(self):
+        index = self._index([1, 2])
+        release = threading.Event()
+        source = index.source
+        index.source = lambda: (release.wait(5), source())[1]
+        index.built_at = 1.0  # scaduto
+        self.assertIs(passages.get_passage_index(), index)
+        self.assertEqual(len(index), 2)  # servito durante il rebuild
+        release.set()
+        vector_index._rebuilding["passage-index-rebuild"].join(5)
+        self.assertFalse(index.is_stale())
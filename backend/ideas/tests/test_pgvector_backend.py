@@ -0,0 +1,89 @@
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TransactionTestCase
+
+from ideas import pgvector_backend
+from ideas.models import Idea
+
+
+class LiteralTests(SimpleTestCase):
+    def test_literal_format(self):
+        vec = np.zeros(pgvector_backend.VECTOR_DIM, dtype=np.float32)
+        vec[0] = 0.5
+        literal = pgvector_backend._to_literal(vec)
+        self.assertTrue(literal.startswith("[0.5,0.0,"))
+        self.assertEqual(literal.count(","), pgvector_backend.VECTOR_DIM - 1)
+
+    def test_wrong_dimension_or_zero_vector(self):
+        self.assertIsNone(pgvector_backend._to_literal(np.ones(pgvector_backend.VECTOR_DIM + 1)))
+        self.assertIsNone(pgvector_backend._to_literal(np.zeros(pgvector_backend.VECTOR_DIM)))
+
+
+@mock.patch.object(pgvector_backend, "VECTOR_DIM", 384)
+@mock.patch.object(pgvector_backend, "_available", True)
+class DimensionCheckTests(SimpleTestCase):
+    def tearDown(self):
+        pgvector_backend._model_dim = None
+
+    def test_disabled_when_model_dimension_differs(self):
+        with self.assertLogs(pgvector_backend.logger, "ERROR"):
+            pgvector_backend.set_model_dim(768)
+        self.assertFalse(pgvector_backend.is_available())
+
+    def test_enabled_when_dimensions_match(self):
+        pgvector_backend.set_model_dim(384)
+        self.assertTrue(pgvector_backend.is_available())
+
+
+class AllNeighboursStreamTests(SimpleTestCase):
+    def test_rows_streamed_in_chunks_and_cursor_closed(self):
+        batches = [[(1, 2, 0.9), (1, 3, 0.7)], [(2, 1, 0.9)], []]
+        server_cursor = mock.MagicMock()
+        server_cursor.fetchmany.side_effect = batches
+        fake = mock.MagicMock()
+        fake.chunked_cursor.return_value = server_cursor
+
+        with mock.patch.object(pgvector_backend, "connection", fake):
+            rows = pgvector_backend.all_neighbours(top_k=2, min_threshold=0.5)
+            server_cursor.execute.assert_called_once()  # query eseguita prima di iterare
+            self.assertEqual(next(rows), (1, 2, 0.9))
+            self.assertEqual(server_cursor.fetchmany.call_count, 1)
+            self.assertEqual(list(rows), [(1, 3, 0.7), (2, 1, 0.9)])
+        server_cursor.close.assert_called_once()
+
+    def test_query_error_raised_immediately(self):
+        server_cursor = mock.MagicMock()
+        server_cursor.execute.side_effect = RuntimeError("boom")
+        fake = mock.MagicMock()
+        fake.chunked_cursor.return_value = server_cursor
+
+        with mock.patch.object(pgvector_backend, "connection", fake):
+            with self.assertRaises(RuntimeError):
+                pgvector_backend.all_neighbours(top_k=2, min_threshold=0.5)
+        server_cursor.close.assert_called_once()
+
+
+class PgvectorDatabaseTests(TransactionTestCase):
+    def setUp(self):
+        pgvector_backend._available = None
+        self.addCleanup(setattr, pgvector_backend, "_available", None)
+        if connection.vendor != "postgresql" or not pgvector_backend.is_available():
+            self.skipTest("pgvector non disponibile")
+
+    def test_search_and_all_neighbours(self):
+        user = User.objects.create(username="pgvector")
+        ideas = Idea.objects.bulk_create([Idea(title=str(i), content=str(i), user=user) for i in range(3)])
+        dim = pgvector_backend.VECTOR_DIM
+        vectors = np.eye(3, dim, dtype=np.float32)
+        vectors[1, 0] = 1.0
+        pgvector_backend.store_embeddings((idea.id, vec) for idea, vec in zip(ideas, vectors))
+
+        ids, sims = pgvector_backend.search(vectors[0], top_k=2, min_threshold=0.5)
+        self.assertEqual(ids, [ideas[0].id, ideas[1].id])
+        self.assertAlmostEqual(sims[0], 1.0, places=5)
+
+        pairs = list(pgvector_backend.all_neighbours(top_k=1, min_threshold=0.5))
+        self.assertIn((ideas[0].id, ideas[1].id), [(s, t) for s, t, _ in pairs])
@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas.ann import select_top_k, synthetic_corpus
+from ideas.quantization import Int8Codec, PCACodec, PQCodec, TruncateCodec, make_codec
+
+
+class CodecRoundTripTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.matrix = synthetic_corpus(1000, dim=32, n_clusters=20, seed=0)
+        cls.query = cls.matrix[7]
+
+    def _fit(self, codec):
+        codec.fit(self.matrix)
+        codes = codec.encode(self.matrix)
+        self.assertEqual(codes.shape, (self.matrix.shape[0], codec.code_size(self.matrix.shape[1])))
+        self.assertEqual(codes.dtype, codec.dtype)
+        return codes
+
+    def _top_k_overlap(self, scores, top_k=10):
+        exact = set(select_top_k(self.matrix @ self.query, top_k, -np.inf).tolist())
+        approx = set(select_top_k(scores, top_k, -np.inf).tolist())
+        return len(exact & approx) / top_k
+
+    def test_int8(self):
+        codec = Int8Codec()
+        codes = self._fit(codec)
+        np.testing.assert_allclose(codec.decode(codes), self.matrix, atol=float(codec.scale.max()))
+        np.testing.assert_allclose(codec.scores(codes, self.query), self.matrix @ self.query, atol=codec.margin)
+
+    def test_pq(self):
+        codec = PQCodec(m=8, n_centroids=32, iters=5)
+        codes = self._fit(codec)
+        error = np.linalg.norm(codec.decode(codes) - self.matrix, axis=1).mean()
+        self.assertLess(error, 0.6)
+        np.testing.assert_allclose(codec.scores(codes, self.query), codec.decode(codes) @ self.query, atol=1e-4)
+        self.assertGreaterEqual(self._top_k_overlap(codec.scores(codes, self.query)), 0.5)
+
+    def test_pca_full_rank_is_lossless(self):
+        codec = PCACodec(dim=32)
+        codes = self._fit(codec)
+        np.testing.assert_allclose(codec.decode(codes), self.matrix, atol=1e-4)
+        np.testing.assert_allclose(codec.scores(codes, self.query), self.matrix @ self.query, atol=1e-4)
+        self.assertAlmostEqual(codec.explained, 1.0, places=4)
+
+    def test_pca_projection_saved_and_reloaded(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pca.npz")
+            first = PCACodec(dim=8, path=path)
+            first.fit(self.matrix)
+            self.assertTrue(os.path.exists(path))
+            second = PCACodec(dim=8, path=path)
+            second.fit(self.matrix[:10])  # letta dal disco, non riaddestrata
+            np.testing.assert_array_equal(second.components, first.components)
+
+    def test_truncate(self):
+        codec = TruncateCodec(dim=8)
+        codes = self._fit(codec)
+        np.testing.assert_allclose(np.linalg.norm(codes, axis=1), 1.0, atol=1e-5)
+        head = self.matrix[:, :8] / np.linalg.norm(self.matrix[:, :8], axis=1, keepdims=True)
+        np.testing.assert_allclose(codes, head, atol=1e-6)
+        with self.assertRaises(ValueError):
+            TruncateCodec(dim=64).fit(self.matrix)
+
+    def test_make_codec(self):
+        self.assertIsNone(make_codec(None))
+        self.assertIsInstance(make_codec("int8"), Int8Codec)
+        self.assertEqual(make_codec("pq", pq_subspaces=16).m, 16)
+        self.assertEqual(make_codec("pca", projection_dim=64).dim, 64)
+        self.assertEqual(make_codec("truncate", projection_dim=64).label, "trunc64")
+        with self.assertRaises(ValueError):
+            make_codec("fp4")
+
+    def test_pq_requires_divisible_dim(self):
+        with self.assertRaises(ValueError):
+            PQCodec(m=5).fit(self.matrix)
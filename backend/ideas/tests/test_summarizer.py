@@ -0,0 +1,56 @@
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas.summarizer import candidate_sentences, pick_summary, split_sentences
+
+
+def _sentence(topic, i):
+    return f"La frase numero {i} parla di {topic} in modo abbastanza dettagliato"
+
+
+class CandidateSentencesTests(SimpleTestCase):
+    def test_short_text_keeps_every_sentence(self):
+        text = ". ".join(_sentence("reti", i) for i in range(4)) + ". Troppo corta."
+        self.assertEqual(candidate_sentences(text), split_sentences(text))
+        self.assertEqual(len(candidate_sentences(text)), 4)
+
+    def test_sentence_budget_keeps_order_of_appearance(self):
+        sentences = [_sentence("grafi" if i % 3 else "embedding", i) for i in range(40)]
+        chosen = candidate_sentences(". ".join(sentences) + ".", max_sentences=8)
+        self.assertEqual(len(chosen), 8)
+        positions = [sentences.index(s) for s in chosen]
+        self.assertEqual(positions, sorted(positions))
+        self.assertIn(sentences[0], chosen)  # le prime frasi hanno lo score di posizione più alto
+
+    def test_token_budget(self):
+        sentences = [_sentence("modelli", i) for i in range(20)]
+        words = len(sentences[0].split())
+        chosen = candidate_sentences(". ".join(sentences) + ".", max_sentences=100, token_budget=5 * words)
+        self.assertLessEqual(sum(len(s.split()) for s in chosen), 5 * words)
+        self.assertEqual(len(chosen), 5)
+
+
+class PickSummaryTests(SimpleTestCase):
+    def test_no_sentences_falls_back_to_text(self):
+        text = "Breve. " * 60
+        summary = pick_summary(text, [], np.zeros((0, 3)))
+        self.assertLessEqual(len(summary), 150)
+        self.assertTrue(summary.startswith("Breve"))
+
+    def test_closest_to_centroid(self):
+        sentences = ["a", "b", "c"]
+        embeddings = np.array([[1.0, 0.0], [0.7, 0.7], [0.0, 1.0]])
+        self.assertEqual(pick_summary("", sentences, embeddings, n_sentences=1), "b")
+
+    def test_zero_vector_returns_first_sentence(self):
+        embeddings = np.array([[0.0, 0.0], [1.0, 0.0]])
+        self.assertEqual(pick_summary("", ["prima", "seconda"], embeddings), "prima")
+
+    def test_mmr_skips_redundant_sentences(self):
+        sentences = ["gatto", "felino", "auto"]
+        embeddings = np.array([[1.0, 0.1], [1.0, 0.11], [0.2, 1.0]])
+        summary = pick_summary("", sentences, embeddings, n_sentences=2, mmr_lambda=0.3)
+        self.assertEqual(summary.count("."), 2)
+        self.assertTrue(summary.endswith("auto."))
+        # Con la sola rilevanza vincono le due frasi quasi identiche
+        self.assertEqual(pick_summary("", sentences, embeddings, n_sentences=2, mmr_lambda=1.0), "gatto. felino.")
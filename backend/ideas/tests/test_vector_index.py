@@ -0,0 +1,132 @@
+import threading
+from unittest import mock
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from ideas import vector_index
+from ideas.vector_index import EmbeddingIndex
+
+
+def _rows(n, dim=8, seed=0):
+    rng = np.random.default_rng(seed)
+    matrix = rng.normal(size=(n, dim)).astype(np.float32)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def _index(matrix, ids=None, **kwargs):
+    ids = list(range(1, len(matrix) + 1)) if ids is None else ids
+    index = EmbeddingIndex(source=lambda: zip(ids, matrix), **kwargs)
+    index.rebuild()
+    return index
+
+
+class EmbeddingIndexTests(SimpleTestCase):
+    def test_search_matches_brute_force(self):
+        matrix = _rows(50)
+        index = _index(matrix)
+        ids, sims = index.search(matrix[3], top_k=5, min_threshold=-1.0)
+        expected = np.argsort(-(matrix @ matrix[3]))[:5] + 1
+        self.assertEqual(ids, expected.tolist())
+        self.assertAlmostEqual(sims[0], 1.0, places=5)
+
+    def test_threshold_and_exclude(self):
+        matrix = _rows(20, seed=1)
+        index = _index(matrix)
+        ids, sims = index.search(matrix[0], top_k=20, min_threshold=0.3, exclude_ids=(1,))
+        self.assertNotIn(1, ids)
+        self.assertTrue(all(s >= 0.3 for s in sims))
+
+    def test_upsert_replaces_and_remove_hides(self):
+        matrix = _rows(10, seed=2)
+        index = _index(matrix)
+        index.upsert(4, matrix[7])
+        self.assertEqual(len(index), 10)
+        self.assertEqual(sorted(index.search(matrix[7], top_k=2, min_threshold=0.99)[0]), [4, 8])
+        index.remove(8)
+        self.assertEqual(index.search(matrix[7], top_k=2, min_threshold=0.99)[0], [4])
+        self.assertEqual(len(index), 9)
+
+    def test_remove_range(self):
+        matrix = _rows(12, seed=5)
+        index = _index(matrix, ids=[100, 101, 102, 103, 200, 201, 202, 203, 300, 301, 302, 303])
+        self.assertEqual(index.remove_range(200, 300), 4)
+        self.assertEqual(len(index), 8)
+        self.assertEqual(index.search(matrix[5], top_k=12, min_threshold=-1.0)[0].count(201), 0)
+        # Intervallo più grande dell'indice: scansione delle chiavi presenti
+        self.assertEqual(index.remove_range(0, 10**9), 8)
+        self.assertEqual(len(index), 0)
+
+    def test_wrong_dimension_is_removed(self):
+        index = _index(_rows(5))
+        index.upsert(2, np.ones(3))
+        self.assertEqual(len(index), 4)
+
+    def test_compaction_keeps_results(self):
+        matrix = _rows(40, seed=3)
+        index = _index(matrix)
+        for idea_id in range(1, 31):
+            index.remove(idea_id)
+        self.assertEqual(len(index), 10)
+        matrix_view, ids = index.snapshot()
+        self.assertEqual(int((ids >= 0).sum()), 10)
+        self.assertEqual(index.search(matrix[35], top_k=1, min_threshold=0.0)[0], [36])
+
+    def test_changes_during_rebuild_are_replayed(self):
+        matrix = _rows(10, seed=4)
+        index = _index(matrix)
+
+        def source():
+            # Upsert concorrente mentre il rebuild legge i vettori
+            index.upsert(99, matrix[0])
+            return zip(range(1, 11), matrix)
+
+        index.source = source
+        index.rebuild()
+        self.assertIn(99, index.search(matrix[0], top_k=2, min_threshold=0.99)[0])
+
+    def test_ivf_search(self):
+        matrix = _rows(400, dim=16, seed=5)
+        with mock.patch.object(vector_index, "ANN_MIN_SIZE", 100):
+            index = _index(matrix)
+            ids, _ = index.search(matrix[10], top_k=1, min_threshold=0.0, nprobe=1000)
+            self.assertEqual(ids, [11])
+            index.upsert(1000, matrix[20])
+            ids, _ = index.search(matrix[20], top_k=2, min_threshold=0.99, nprobe=1000)
+            self.assertEqual(sorted(ids), [21, 1000])
+
+    def test_codec_rerank_falls_back_to_first_stage(self):
+        matrix = _rows(30, seed=6)
+        from ideas.quantization import Int8Codec
+
+        index = _index(matrix, codec=Int8Codec())
+        self.assertIsNot(index._codec, index.codec)  # il modello non viene addestrato
+        with mock.patch.object(vector_index, "RERANK", False):
+            ids, _ = index.search(matrix[5], top_k=1, min_threshold=0.0)
+        self.assertEqual(ids, [6])
+
+
+class GetIndexTests(SimpleTestCase):
+    def setUp(self):
+        vector_index.reset_index()
+        self.addCleanup(vector_index.reset_index)
+
+    def test_stale_index_rebuilt_in_background(self):
+        matrix = _rows(10, seed=7)
+        index = _index(matrix)
+        vector_index._index = index
+        release = threading.Event()
+
+        def slow_source():
+            release.wait(5)
+            return zip(range(1, 11), matrix)
+
+        index.source = slow_source
+        index.built_at = 1.0  # scaduto
+        self.assertIs(vector_index.get_index(), index)
+        # Il rebuild è in corso: la ricerca usa ancora gli array correnti
+        self.assertEqual(index.search(matrix[0], top_k=1, min_threshold=0.0)[0], [1])
+        self.assertFalse(vector_index.schedule_rebuild(index))
+        release.set()
+        vector_index._rebuilding["embedding-index-rebuild"].join(5)
+        self.assertFalse(index.is_stale())
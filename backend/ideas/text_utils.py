@@ -0,0 +1,36 @@
+# text_utils.py
+# ---------------------------------------
+# ✂️ MindLink Text Utils
+# ---------------------------------------
+# Pulizia del testo e stopwords condivise da analisi (analyze.py) e
+# motore keyword (keywords.py), senza dipendenze dal modello AI.
+
+import re
+
+# =====================================================
+# 🔹 STOPWORDS
+# =====================================================
+ITALIAN_STOPWORDS = [
+    "a", "ad", "al", "allo", "ai", "agli", "alla", "alle", "con", "col", "coi", "da", "dal",
+    "dallo", "dai", "dagli", "dalla", "dalle", "di", "del", "dello", "dei", "degli",
+    "della", "delle", "in", "nel", "nello", "nei", "negli", "nella", "nelle", "su", "sul",
+    "sullo", "sui", "sugli", "sulla", "sulle", "per", "tra", "fra", "il", "lo", "la", "i",
+    "gli", "le", "un", "uno", "una", "ma", "o", "e", "anche", "come", "dove", "quando",
+    "che", "chi", "cui", "non", "più", "meno", "mi", "ti", "si", "ci", "vi", "ne", "ho",
+    "hai", "ha", "abbiamo", "avete", "hanno", "sono", "sei", "era", "erano", "fui", "fu",
+    "fummo", "foste", "furono", "questo", "quello", "quella", "queste", "questi",
+    "quelli", "quelle"
+]
+
+
+# =====================================================
+# 🔹 PULIZIA
+# =====================================================
+def clean_text(text: str) -> str:
+    if not text:
+        return ""
+    # Mantieni spazi e newline, rimuovi solo simboli strani
+    text = re.sub(r"[^a-zA-Zàèéìòùç0-9\s.,;:!?]", "", text)
+    # Non comprimere \s, ma normalizza solo spazi multipli
+    text = re.sub(r"[ ]{2,}", " ", text)
+    return text.strip()
@@ -0,0 +1,185 @@
+# token_cache.py
+# ---------------------------------------
+# 🔤 MindLink Token Cache
+# ---------------------------------------
+# Cache persistente dei token id per gli encode di massa (re-embedding del
+# corpus dopo un fine-tuning): ogni mindlink-v* ha una nuova versione e
+# quindi nessun hit nella cache degli embedding, ma il tokenizer di norma
+# è lo stesso del modello precedente.
+# - chiave (hash del tokenizer, SHA-256 del testo); l'hash del tokenizer
+#   copre vocabolario, normalizzazione, pre/post-processing e lunghezza
+#   massima, non lo stato di padding/troncamento del momento
+# - i token id in cache vanno direttamente al transformer: forward +
+#   pooling di SentenceTransformer (torch) o OnnxEncoder.encode_ids
+# - solo per gli encode di massa (analyze._encode_sorted con batch_size,
+#   es. perform_full_analysis_batch): le richieste online, anche quando il
+#   micro-batcher le aggrega, non scrivono nel DB
+#
+# Benchmark: `manage.py token_cache_report --ideas 10000`
+
+import hashlib
+import json
+import logging
+import threading
+import weakref
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .embedding_cache import content_hash
+from .models import TokenCacheEntry
+
+logger = logging.getLogger(__name__)
+
+TOKEN_SETTINGS = getattr(settings, "MINDLINK_TOKEN_CACHE", {})
+TOKEN_CACHE_ENABLED = TOKEN_SETTINGS.get("ENABLED", True)
+MAX_ENTRIES = TOKEN_SETTINGS.get("MAX_ENTRIES", 500_000)
+PRUNE_EVERY = TOKEN_SETTINGS.get("PRUNE_EVERY", 10_000)
+BATCH_SIZE = 1000
+
+_hashes = weakref.WeakKeyDictionary()
+_inserted = 0
+_inserted_lock = threading.Lock()
+
+
+def _is_onnx(model) -> bool:
+    return hasattr(model, "encode_ids")
+
+
+def tokenizer_hash(model) -> str | None:
+    """Hash stabile del tokenizer del modello; None se il modello non lo espone (es. ModelClient)."""
+    cached = _hashes.get(model)
+    if cached is not None:
+        return cached
+
+    if _is_onnx(model):
+        definition, max_length = model.tokenizer.to_str(), model.meta["max_seq_length"]
+    else:
+        backend = getattr(getattr(model, "tokenizer", None), "backend_tokenizer", None)
+        if backend is None or not hasattr(model, "max_seq_length"):
+            return None
+        definition, max_length = backend.to_str(), model.max_seq_length
+
+    spec = json.loads(definition)
+    spec.pop("truncation", None)
+    spec.pop("padding", None)
+    spec["max_length"] = max_length
+    digest = hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+    _hashes[model] = digest
+    return digest
+
+
+def tokenize(model, texts: list[str]) -> list[np.ndarray]:
+    if _is_onnx(model):
+        return model.tokenize(texts)
+    encoded = model.tokenizer(texts, truncation=True, max_length=model.max_seq_length, padding=False)
+    return [np.asarray(ids, dtype=np.int32) for ids in encoded["input_ids"]]
+
+
+def _torch_forward(model, token_ids: list[np.ndarray]) -> np.ndarray:
+    import torch
+
+    length = max(len(ids) for ids in token_ids)
+    input_ids = torch.full((len(token_ids), length), model.tokenizer.pad_token_id or 0, dtype=torch.long)
+    attention_mask = torch.zeros((len(token_ids), length), dtype=torch.long)
+    for row, ids in enumerate(token_ids):
+        input_ids[row, :len(ids)] = torch.from_numpy(ids.astype(np.int64))
+        attention_mask[row, :len(ids)] = 1
+
+    features = {"input_ids": input_ids, "attention_mask": attention_mask}
+    if "token_type_ids" in model.tokenizer.model_input_names:
+        features["token_type_ids"] = torch.zeros_like(input_ids)
+    features = {k: v.to(model.device) for k, v in features.items()}
+    with torch.no_grad():
+        return model(features)["sentence_embedding"].float().cpu().numpy()
+
+
+def encode_ids(model, token_ids: list[np.ndarray], batch_size: int = 64) -> np.ndarray:
+    """Embedding grezzi da token id, a batch di lunghezza simile (meno padding)."""
+    order = sorted(range(len(token_ids)), key=lambda i: len(token_ids[i]))
+    forward = model.encode_ids if _is_onnx(model) else lambda chunk: _torch_forward(model, chunk)
+    out = None
+    for start in range(0, len(order), batch_size):
+        idx = order[start:start + batch_size]
+        encoded = forward([token_ids[i] for i in idx])
+        if out is None:
+            out = np.empty((len(token_ids), encoded.shape[1]), dtype=np.float32)
+        out[idx] = encoded
+    return out
+
+
+# =====================================================
+# 🔹 STORE
+# =====================================================
+def lookup(tok_hash: str, hashes: list[str]) -> dict[str, np.ndarray]:
+    found = {}
+    for start in range(0, len(hashes), BATCH_SIZE):
+        rows = TokenCacheEntry.objects.filter(
+            tokenizer_hash=tok_hash, content_hash__in=hashes[start:start + BATCH_SIZE]
+        ).values_list("content_hash", "token_ids")
+        for digest, data in rows:
+            found[digest] = np.frombuffer(bytes(data), dtype=np.int32)
+    return found
+
+
+def store(tok_hash: str, items: dict[str, np.ndarray]):
+    global _inserted
+    if not items:
+        return
+    TokenCacheEntry.objects.bulk_create(
+        [TokenCacheEntry(tokenizer_hash=tok_hash, content_hash=h, token_ids=np.asarray(ids, dtype=np.int32).tobytes())
+         for h, ids in items.items()],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    with _inserted_lock:
+        _inserted += len(items)
+        due = _inserted >= PRUNE_EVERY
+        if due:
+            _inserted = 0
+    if due:
+        prune()
+
+
+def prune(max_entries: int | None = None) -> int:
+    """Elimina le voci più vecchie (per id) oltre max_entries."""
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    excess = TokenCacheEntry.objects.count() - max_entries
+    if excess <= 0:
+        return 0
+    ids = list(TokenCacheEntry.objects.order_by("id").values_list("id", flat=True)[:excess])
+    deleted = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        with transaction.atomic():
+            deleted += TokenCacheEntry.objects.filter(id__in=ids[start:start + BATCH_SIZE]).delete()[0]
+    logger.info(f"🔤 Cache token: eliminate {deleted} voci (limite {max_entries})")
+    return deleted
+
+
+def encode_with_token_cache(model, texts: list[str], batch_size: int = 64) -> np.ndarray:
+    """Come model.encode(texts), ma tokenizza solo i testi assenti dalla cache."""
+    tok_hash = tokenizer_hash(model) if texts else None
+    if tok_hash is None:
+        return model.encode(texts, batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+
+    hashes = [content_hash(t) for t in texts]
+    try:
+        found = lookup(tok_hash, list(set(hashes)))
+    except Exception as e:
+        logger.warning(f"⚠️ Cache token non disponibile: {e}")
+        found = {}
+
+    first = {}
+    for i, h in enumerate(hashes):
+        if h not in found:
+            first.setdefault(h, i)
+    if first:
+        computed = dict(zip(first, tokenize(model, [texts[i] for i in first.values()])))
+        found.update(computed)
+        try:
+            store(tok_hash, computed)
+        except Exception as e:
+            logger.warning(f"⚠️ Salvataggio nella cache token fallito: {e}")
+
+    return encode_ids(model, [found[h] for h in hashes], batch_size)
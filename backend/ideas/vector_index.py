@@ -0,0 +1,508 @@
+# vector_index.py
+# ---------------------------------------
+# 🧭 MindLink Vector Index
+# ---------------------------------------
+# Indice residente (per processo) per la ricerca di similarità:
+# - matrice float32 contigua (N x D) con vettori già normalizzati
+# - array di id allineato alle righe della matrice
+# Viene costruito una sola volta dal DB, poi aggiornato in-place
+# quando le idee vengono create / modificate / eliminate.
+# Il rebuild (in background quando l'indice è scaduto) costruisce nuovi
+# array e li sostituisce atomicamente.
+# Sopra ANN_MIN_SIZE vettori la ricerca passa da esatta (brute force)
+# ad approssimata tramite l'indice IVF di ann.py.
+# Con QUANTIZATION ("int8" / "pq" / "pca" / "truncate") la matrice residente
+# contiene i codici compressi o proiettati di quantization.py e i migliori
+# candidati vengono ri-valutati esattamente sui vettori float letti dal DB.
+
+import copy
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .ann import IVFIndex, select_top_k
+from .quantization import make_codec
+
+logger = logging.getLogger(__name__)
+
+# =====================================================
+# 🔹 PARAMETRI CONFIGURABILI
+# =====================================================
+INDEX_SETTINGS = getattr(settings, "MINDLINK_INDEX", {})
+
+# Dopo quanti secondi l'indice viene ricostruito dal DB
+# (serve a recepire le modifiche fatte da altri processi worker).
+MAX_AGE = INDEX_SETTINGS.get("MAX_AGE", 300)
+INITIAL_CAPACITY = INDEX_SETTINGS.get("INITIAL_CAPACITY", 1024)
+# Frazione di righe "tombstone" oltre la quale la matrice viene compattata
+COMPACT_RATIO = INDEX_SETTINGS.get("COMPACT_RATIO", 0.25)
+# Ricerca approssimata (IVF) solo sopra questa dimensione del corpus
+ANN_MIN_SIZE = INDEX_SETTINGS.get("ANN_MIN_SIZE", 20_000)
+IVF_LISTS = INDEX_SETTINGS.get("IVF_LISTS")  # None = ~sqrt(N)
+IVF_NPROBE = INDEX_SETTINGS.get("IVF_NPROBE", 12)
+# Primo stadio quantizzato: None (float32), "int8" o "pq"
+QUANTIZATION = INDEX_SETTINGS.get("QUANTIZATION")
+PQ_SUBSPACES = INDEX_SETTINGS.get("PQ_SUBSPACES", 48)
+# Candidati ri-valutati in float = top_k * RERANK_FACTOR
+RERANK_FACTOR = INDEX_SETTINGS.get("RERANK_FACTOR", 4)
+# False: si usano direttamente gli score del primo stadio (niente lettura dei vettori float)
+RERANK = INDEX_SETTINGS.get("RERANK", True)
+# "pca" / "truncate": dimensioni del tier di ricerca; PCA salvata per versione del modello
+PROJECTION_DIM = INDEX_SETTINGS.get("PROJECTION_DIM", 128)
+PROJECTION_DIR = INDEX_SETTINGS.get("PROJECTION_DIR", os.path.join("models", "projection"))
+
+
+def _normalize(vec) -> np.ndarray | None:
+    """Converte in float32 e normalizza; None se il vettore è vuoto o nullo."""
+    if vec is None:
+        return None
+    arr = np.asarray(vec, dtype=np.float32).ravel()
+    if arr.size == 0:
+        return None
+    norm = np.linalg.norm(arr)
+    if norm == 0 or not np.isfinite(norm):
+        return None
+    return arr / norm
+
+
+def _db_embeddings():
+    from .models import Idea, embedding_from_bytes
+
+    rows = Idea.objects.exclude(embedding=None).values_list("id", "embedding").iterator(chunk_size=2000)
+    for idea_id, emb in rows:
+        yield idea_id, embedding_from_bytes(emb)
+
+
+class EmbeddingIndex:
+    """
+    Matrice di embedding residente in memoria.
+
+    Le scritture (upsert/remove) sono serializzate da un lock; le letture
+    prendono sotto lock solo i riferimenti agli array e calcolano il
+    prodotto matrice-vettore fuori dal lock. Gli update non sovrascrivono
+    mai una riga: la vecchia riga diventa "tombstone" (id = -1) e il nuovo
+    vettore viene accodato, così una ricerca concorrente non legge mai
+    un vettore scritto a metà.
+
+    Con un `codec` (vedi quantization.py) le righe sono codici compressi:
+    lo score del primo stadio è approssimato e i candidati migliori
+    vengono ri-valutati sui vettori float.
+    """
+
+    def __init__(self, dim: int | None = None, codec=None, source=None):
+        self._lock = threading.RLock()
+        self.dim = dim
+        # Codec "modello": ogni rebuild ne addestra una copia, pubblicata con la nuova matrice
+        self.codec = codec
+        # source() → iterabile di (id, vettore); default: Idea.embedding dal DB
+        self.source = source
+        # Codec effettivamente usato dagli array correnti (None finché non addestrato)
+        self._codec = None
+        self._matrix = np.zeros((0, dim or 0), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._size = 0
+        self._positions: dict[int, int] = {}
+        self._tombstones = 0
+        self._ivf: IVFIndex | None = None
+        self.built_at = 0.0
+        # Modifiche arrivate durante un rebuild (riapplicate dopo lo swap)
+        self._journal: list[tuple[str, int, np.ndarray | None]] | None = None
+
+    # -------------------------------------------------
+    # Costruzione / rebuild
+    # -------------------------------------------------
+    def rebuild(self):
+        """Ricarica tutti gli embedding (dal DB o da `source`) e sostituisce gli array atomicamente."""
+        with self._lock:
+            self._journal = []
+
+        try:
+            started = time.perf_counter()
+            rows = self.source() if self.source is not None else _db_embeddings()
+
+            ids, vectors = [], []
+            dim = self.dim
+            for idea_id, emb in rows:
+                vec = _normalize(emb)
+                if vec is None:
+                    continue
+                if dim is None:
+                    dim = vec.shape[0]
+                if vec.shape[0] != dim:
+                    logger.warning(f"⚠️ Embedding di dimensione {vec.shape[0]} ignorato per idea {idea_id} (attesa {dim}).")
+                    continue
+                ids.append(idea_id)
+                vectors.append(vec)
+
+            dim = dim or 0
+            capacity = max(INITIAL_CAPACITY, int(len(ids) * 1.25))
+            matrix = np.zeros((capacity, dim), dtype=np.float32)
+            if vectors:
+                matrix[:len(vectors)] = np.vstack(vectors)
+            id_array = np.full(capacity, -1, dtype=np.int64)
+            id_array[:len(ids)] = ids
+
+            ivf = None
+            if len(ids) >= ANN_MIN_SIZE:
+                ivf = IVFIndex(n_lists=IVF_LISTS, nprobe=IVF_NPROBE)
+                ivf.build(matrix, np.arange(len(ids)))
+
+            # Quantizzazione: la matrice float viene sostituita dai codici. Copia nuova:
+            # ricerche e upsert in corso continuano a usare il codec dei codici correnti
+            codec = None
+            if self.codec is not None and ids:
+                codec = copy.deepcopy(self.codec)
+                codec.fit(matrix[:len(ids)])
+                codes = np.zeros((capacity, codec.code_size(dim)), dtype=codec.dtype)
+                codes[:len(ids)] = codec.encode(matrix[:len(ids)])
+                matrix = codes
+
+            with self._lock:
+                self.dim = dim
+                self._codec = codec
+                self._matrix = matrix
+                self._ids = id_array
+                self._size = len(ids)
+                self._positions = {idea_id: pos for pos, idea_id in enumerate(ids)}
+                self._tombstones = 0
+                self._ivf = ivf
+                self.built_at = time.monotonic()
+
+                journal, self._journal = self._journal, None
+                for op, idea_id, vec in journal:
+                    if op == "upsert":
+                        self._upsert_locked(idea_id, vec)
+                    else:
+                        self._remove_locked(idea_id)
+
+            logger.info(
+                f"🧭 Indice embedding costruito: {len(ids)} vettori ({dim} dim, "
+                f"{'IVF ' + str(ivf.centroids.shape[0]) + ' liste' if ivf else 'esatto'}, "
+                f"{codec.name if codec else 'float32'} {matrix.nbytes / 1e6:.1f} MB) "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def is_stale(self) -> bool:
+        return not self.built_at or (MAX_AGE and time.monotonic() - self.built_at > MAX_AGE)
+
+    def __len__(self):
+        return len(self._positions)
+
+    @property
+    def nbytes(self) -> int:
+        return self._matrix.nbytes + self._ids.nbytes
+
+    # -------------------------------------------------
+    # Aggiornamenti incrementali
+    # -------------------------------------------------
+    def upsert(self, idea_id: int, embedding):
+        vec = _normalize(embedding)
+        with self._lock:
+            if vec is None or (self.dim and vec.shape[0] != self.dim):
+                self._remove_locked(idea_id)
+                if self._journal is not None:
+                    self._journal.append(("remove", idea_id, None))
+                return
+            self._upsert_locked(idea_id, vec)
+            if self._journal is not None:
+                self._journal.append(("upsert", idea_id, vec))
+
+    def remove(self, idea_id: int):
+        with self._lock:
+            self._remove_locked(idea_id)
+            if self._journal is not None:
+                self._journal.append(("remove", idea_id, None))
+
+    def remove_range(self, start: int, stop: int) -> int:
+        """Rimuove tutte le chiavi in [start, stop) con un solo lock (es. i passaggi di un'idea)."""
+        with self._lock:
+            if stop - start <= len(self._positions):
+                keys = [k for k in range(start, stop) if k in self._positions]
+            else:
+                keys = [k for k in self._positions if start <= k < stop]
+            for key in keys:
+                self._remove_locked(key, compact=False)
+                if self._journal is not None:
+                    self._journal.append(("remove", key, None))
+            self._maybe_compact_locked()
+            return len(keys)
+
+    def _upsert_locked(self, idea_id: int, vec: np.ndarray):
+        if not self.dim:
+            self.dim = vec.shape[0]
+            self._matrix = np.zeros((INITIAL_CAPACITY, self.dim), dtype=np.float32)
+            self._ids = np.full(INITIAL_CAPACITY, -1, dtype=np.int64)
+
+        self._remove_locked(idea_id)
+
+        if self._size >= self._matrix.shape[0]:
+            self._grow_locked()
+
+        pos = self._size
+        self._matrix[pos] = vec if self._codec is None else self._codec.encode(vec[None, :])[0]
+        self._ids[pos] = idea_id
+        self._positions[idea_id] = pos
+        if self._ivf is not None:
+            self._ivf.add(pos, vec)
+        # L'incremento di _size "pubblica" la riga ai lettori successivi
+        self._size = pos + 1
+
+    def _remove_locked(self, idea_id: int, compact: bool = True):
+        pos = self._positions.pop(idea_id, None)
+        if pos is None:
+            return
+        self._ids[pos] = -1
+        self._tombstones += 1
+        if self._ivf is not None:
+            self._ivf.remove(pos)
+        if compact:
+            self._maybe_compact_locked()
+
+    def _maybe_compact_locked(self):
+        if self._size and self._tombstones / self._size > COMPACT_RATIO:
+            self._compact_locked()
+
+    def _grow_locked(self):
+        capacity = max(INITIAL_CAPACITY, self._matrix.shape[0] * 2)
+        matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=self._matrix.dtype)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids = np.full(capacity, -1, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        # Swap dei riferimenti: i lettori in corso continuano sui vecchi array
+        self._matrix, self._ids = matrix, ids
+
+    def _compact_locked(self):
+        live = np.flatnonzero(self._ids[:self._size] >= 0)
+        capacity = max(INITIAL_CAPACITY, int(live.size * 1.25))
+        matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=self._matrix.dtype)
+        matrix[:live.size] = self._matrix[live]
+        ids = np.full(capacity, -1, dtype=np.int64)
+        ids[:live.size] = self._ids[live]
+        self._matrix, self._ids = matrix, ids
+        self._size = int(live.size)
+        self._positions = {int(idea_id): pos for pos, idea_id in enumerate(ids[:live.size])}
+        self._tombstones = 0
+        if self._ivf is not None:
+            # Le posizioni cambiano: nuove liste con gli stessi centroidi (swap come per la matrice)
+            self._ivf = self._ivf.reassigned(self._dense(matrix[:live.size]), np.arange(live.size))
+
+    # -------------------------------------------------
+    # Ricerca
+    # -------------------------------------------------
+    def snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """Viste (matrice, ids) coerenti sulle righe pubblicate; ids = -1 per le righe eliminate."""
+        with self._lock:
+            n = self._size
+            return self._matrix[:n], self._ids[:n]
+
+    def dense_snapshot(self) -> tuple[np.ndarray, np.ndarray]:
+        """Come snapshot(), ma con righe float32 (decodificate se l'indice è quantizzato)."""
+        with self._lock:
+            matrix, ids = self.snapshot()
+            return self._dense(matrix), ids
+
+    def _dense(self, rows: np.ndarray) -> np.ndarray:
+        return rows if self._codec is None else self._codec.decode(rows)
+
+    def _scores(self, codec, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        return rows @ query if codec is None else codec.scores(rows, query)
+
+    def search(
+            self,
+            target_emb,
+            top_k: int = 5,
+            min_threshold: float = 0.5,
+            exclude_ids=(),
+            nprobe: int | None = None,
+            exact: bool | None = None,
+    ) -> tuple[list[int], list[float]]:
+        """
+        Top-k per similarità coseno.
+        Sotto ANN_MIN_SIZE (o con exact=True): un solo prodotto matrice-vettore.
+        Sopra: scansione delle sole `nprobe` liste IVF più vicine alla query.
+        Se quantizzato, i top_k * RERANK_FACTOR candidati vengono ri-valutati
+        sui vettori float (unica query al DB, per id).
+        Ritorna (ids, similarità) in ordine decrescente.
+        """
+        query = _normalize(target_emb)
+        positions = None
+        with self._lock:
+            matrix, ids = self.snapshot()
+            codec = self._codec
+            if query is None or ids.size == 0 or query.shape[0] != self.dim:
+                return [], []
+            if self._ivf is None:
+                exact = True
+            elif exact is None:
+                exact = len(self) < ANN_MIN_SIZE
+            if not exact:
+                # Le liste IVF cambiano in-place con upsert/remove: i candidati (copia) si leggono sotto lock
+                positions = self._ivf.candidates(query, nprobe)
+
+        if exact:
+            sims = self._scores(codec, matrix, query)
+            row_ids = ids
+        else:
+            positions = positions[positions < ids.shape[0]]
+            row_ids = ids[positions]
+            sims = self._scores(codec, matrix[positions], query)
+
+        sims[row_ids < 0] = -np.inf
+        if exclude_ids:
+            sims[np.isin(row_ids, list(exclude_ids))] = -np.inf
+
+        if codec is None or not RERANK:
+            top = select_top_k(sims, top_k, min_threshold)
+            return row_ids[top].tolist(), sims[top].tolist()
+
+        # Primo stadio approssimato: soglia allargata dell'errore del codec
+        top = select_top_k(sims, max(top_k * RERANK_FACTOR, top_k), min_threshold - codec.margin)
+        return self._rerank(row_ids[top], sims[top], query, top_k, min_threshold)
+
+    def _rerank(self, cand_ids, approx_sims, query, top_k, min_threshold) -> tuple[list[int], list[float]]:
+        """Re-score esatto dei candidati sui vettori float del DB."""
+        from .models import Idea, embedding_from_bytes
+
+        if cand_ids.size == 0:
+            return [], []
+        try:
+            rows = Idea.objects.filter(id__in=cand_ids.tolist()).values_list("id", "embedding")
+            exact = {idea_id: _normalize(embedding_from_bytes(data)) for idea_id, data in rows}
+        except Exception as e:
+            logger.warning(f"⚠️ Re-score non disponibile, uso gli score quantizzati: {e}")
+            exact = {}
+
+        sims = np.array([
+            float(exact[i] @ query) if exact.get(i) is not None else float(approx)
+            for i, approx in zip(cand_ids.tolist(), approx_sims.tolist())
+        ], dtype=np.float32)
+        top = select_top_k(sims, top_k, min_threshold)
+        return cand_ids[top].tolist(), sims[top].tolist()
+
+
+# =====================================================
+# 🔹 SINGLETON DI PROCESSO
+# =====================================================
+_index: EmbeddingIndex | None = None
+_index_lock = threading.Lock()
+_rebuilding: dict[str, threading.Thread] = {}  # rebuild in corso per nome (indice idee, passaggi)
+_rebuild_lock = threading.Lock()
+
+
+def _create_index():
+    """Snapshot memory-mapped condiviso se abilitato e presente, altrimenti indice costruito dal DB."""
+    from .embedding_snapshot import SNAPSHOT_ENABLED, SnapshotIndex
+
+    if SNAPSHOT_ENABLED:
+        index = SnapshotIndex.open()
+        if index is not None:
+            return index
+        logger.warning("⚠️ Nessuno snapshot embedding disponibile: costruisco l'indice dal DB.")
+
+    index = EmbeddingIndex(codec=make_search_codec())
+    index.rebuild()
+    return index
+
+
+def projection_path(version: str, dim: int = PROJECTION_DIM) -> str:
+    """File della PCA per una versione del modello (la variante ONNX condivide quella torch)."""
+    name = os.path.basename(os.path.normpath(version.split("#")[0]))
+    return os.path.join(PROJECTION_DIR, f"{name}-pca{dim}.npz")
+
+
+def make_search_codec():
+    """Codec configurato per l'indice principale, con la PCA legata alla versione del modello corrente."""
+    projection = None
+    if QUANTIZATION == "pca":
+        from .analyze import get_latest_model_path, model_status
+
+        projection = projection_path(model_status()["version"] or get_latest_model_path())
+    return make_codec(QUANTIZATION, PQ_SUBSPACES, PROJECTION_DIM, projection)
+
+
+def get_index() -> EmbeddingIndex:
+    """
+    Indice del processo corrente, costruito al primo uso. Se troppo vecchio
+    viene ricostruito in background: nel frattempo si continua a servire
+    con gli array correnti, sostituiti atomicamente a fine rebuild.
+    """
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = _create_index()
+            index = _index
+    elif index.is_stale():
+        schedule_rebuild(index)
+    return index
+
+
+def schedule_rebuild(index, name: str = "embedding-index-rebuild") -> bool:
+    """Avvia index.rebuild() su un thread dedicato `name`, se non ce n'è già uno in corso."""
+    with _rebuild_lock:
+        running = _rebuilding.get(name)
+        if running is not None and running.is_alive():
+            return False
+        thread = _rebuilding[name] = threading.Thread(
+            target=_rebuild_in_background, args=(index,), name=name, daemon=True
+        )
+        thread.start()
+        return True
+
+
+def _rebuild_in_background(index):
+    from django.db import close_old_connections
+
+    try:
+        index.rebuild()
+    except Exception:
+        logger.exception("Errore nel rebuild in background dell'indice embedding")
+    finally:
+        close_old_connections()
+
+
+def index_upsert(idea_id: int, embedding):
+    """Aggiorna l'indice solo se già costruito (altrimenti lo leggerà dal DB al primo uso)."""
+    if _index is not None:
+        _index.upsert(idea_id, embedding)
+
+
+def index_remove(idea_id: int):
+    if _index is not None:
+        _index.remove(idea_id)
+
+
+def on_model_version(version: str):
+    """Dopo uno swap del modello: la PCA dell'indice va ricalcolata per la nuova versione."""
+    index = _index
+    if QUANTIZATION == "pca" and index is not None and getattr(index.codec, "path", None) != projection_path(version):
+        reset_index()
+
+
+def reset_index():
+    """Scarta l'indice (es. dopo un cambio di modello: gli embedding vanno ricalcolati)."""
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def index_status() -> dict:
+    """Dimensione e freschezza dell'indice del processo (senza costruirlo)."""
+    index = _index
+    if index is None:
+        return {"built": False, "size": 0}
+    return {
+        "built": True,
+        "type": type(index).__name__,
+        "size": len(index),
+        "age_s": round(time.monotonic() - index.built_at, 1) if index.built_at else None,
+        "stale": bool(index.is_stale()),
+    }
@@ -12,19 +12,17 @@ from rest_framework.response import Response
 from rest_framework.throttling import UserRateThrottle
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenRefreshView
+from django.conf import settings
 from django.db.models import Count
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
 
 
 from ideas.analyze import (
     find_similar_ideas_by_text,
-    summarize_text,
-    classify_text,
-    extract_keywords,
-    generate_embedding,
-    clear_model_cache,
-    perform_full_analysis, find_similar_ideas,
+    analyze_texts,
+    promote_model,
+    perform_full_analysis, perform_full_analysis_batch, find_similar_ideas,
+    preferred_model,
+    search_similar,
 )
 from ideas.models import Idea
 from ideas.serializers import IdeaSerializer, RegisterSerializer
@@ -32,6 +30,9 @@ from notifications.utils import notify_related_ideas
 
 logger = logging.getLogger(__name__)
 
+# Quante idee (le più vicine per coseno) valutare con lo score ibrido in /related/
+RELATED_CANDIDATES = getattr(settings, "MINDLINK_SEARCH", {}).get("RELATED_CANDIDATES", 200)
+
 
 # =====================================================
 # 🔹 VIEWSET PER LE IDEE
@@ -74,7 +75,9 @@ class IdeaViewSet(viewsets.ModelViewSet):
             return Response({"error": "missing text"}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            results = find_similar_ideas_by_text(text, top_k=5, min_threshold=0.5)
+            results = find_similar_ideas_by_text(
+                text, top_k=5, min_threshold=0.5, model=preferred_model(request.user)
+            )
             return Response({"results": results})
         except Exception as e:
             logger.error(f"Errore imprevisto in endpoint 'similar': {e}")
@@ -108,26 +111,22 @@ class IdeaViewSet(viewsets.ModelViewSet):
         except Idea.DoesNotExist:
             return Response({"error": "Idea non trovata o non tua."}, status=404)
 
-        # 🧠 Genera automaticamente embedding se mancante o vuoto
-        if not idea.embedding or len(idea.embedding) == 0:
-            try:
-                idea.embedding = generate_embedding(idea.content).tolist()
-                idea.save(update_fields=["embedding"])
-                logger.info(f"✅ Embedding generato automaticamente per idea {idea.id}")
-            except Exception as e:
-                logger.error(f"❌ Errore generazione embedding idea {idea.id}: {e}")
+        # 🧠 Embedding mancante: analisi completa (stesso embedding e passaggi del batch)
+        if idea.embedding_vector is None:
+            if perform_full_analysis(idea) is None:
                 return Response({"error": "Impossibile generare embedding per questa idea."}, status=500)
+            logger.info(f"✅ Embedding generato automaticamente per idea {idea.id}")
 
-        # Embedding di riferimento
-        emb_a = np.array(idea.embedding).reshape(1, -1)
         keywords_a = set(idea.keywords or [])
         category_a = idea.category or None
 
-        # Recupera altre idee con embedding validi
-        others = [
-            other for other in Idea.objects.exclude(id=idea.id).exclude(embedding=None)
-            if other.embedding and len(other.embedding) == len(idea.embedding)
-        ]
+        # Candidati: le idee più vicine per coseno (pgvector o indice residente),
+        # senza caricare gli embedding delle altre idee dal DB
+        ids, cos_sims = search_similar(
+            idea.embedding_vector, top_k=RELATED_CANDIDATES, min_threshold=-1.0, exclude_ids=(idea.id,)
+        )
+        others_by_id = Idea.objects.only("id", "title", "category", "keywords").in_bulk(ids)
+        others = [(others_by_id[i], sim) for i, sim in zip(ids, cos_sims) if i in others_by_id]
 
         if not others:
             return Response({
@@ -145,10 +144,9 @@ class IdeaViewSet(viewsets.ModelViewSet):
             w_cos, w_kw, w_cat = 0.6, 0.3, 0.1  # fallback sicuro
 
         sims = []
-        for other in others:
+        for other, sim_cos in others:
             try:
-                emb_b = np.array(other.embedding).reshape(1, -1)
-                sim_cos = float(cosine_similarity(emb_a, emb_b)[0][0])
+                sim_cos = float(sim_cos)
 
                 # Overlap keywords
                 kw_overlap = 0.0
@@ -238,41 +236,35 @@ def analyze_idea_endpoint(request):
     if not text:
         return Response({"error": "missing text or idea id"}, status=400)
 
-    summary = summarize_text(text)
-    category = classify_text(text)
-    keywords = extract_keywords(text)
-
+    # Una sola passata del modello: summary, categoria, keyword ed embedding insieme
     if idea_instance:
-        idea_instance.summary = summary
-        idea_instance.category = category
-        idea_instance.keywords = keywords
-        idea_instance.embedding = generate_embedding(text).tolist()
-        idea_instance.save(update_fields=["summary", "category", "keywords", "embedding"])
+        result = perform_full_analysis(idea_instance)
+        if result is None:
+            return Response({"error": "analisi non riuscita"}, status=500)
         message = f"Idea {idea_id} analizzata e aggiornata."
     else:
+        result = analyze_texts([text])[0]
         message = "Analisi completata (test standalone, nessun salvataggio)."
 
     return Response({
         "message": message,
-        "summary": summary,
-        "category": category,
-        "keywords": keywords,
+        "summary": result["summary"],
+        "category": result["category"],
+        "keywords": result["keywords"],
     })
 
 
 @api_view(["POST"])
 def refresh_all_analysis_endpoint(request):
     """Rianalizza *tutte* le idee con il modello più recente."""
-    clear_model_cache()
+    # Hot swap: le altre richieste restano servite dalla versione corrente fino allo scambio
+    promote_model(wait=True)
 
     ideas = Idea.objects.all()
     if not ideas.exists():
         return Response({"message": "Nessuna idea trovata nel database."}, status=404)
 
-    updated = 0
-    for idea in ideas:
-        perform_full_analysis(idea)
-        updated += 1
+    updated = perform_full_analysis_batch()
 
     return Response({
         "message": f"Analisi completata. Aggiornate {updated} idee.",
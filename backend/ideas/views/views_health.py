@@ -0,0 +1,31 @@
+# ideas/views/views_health.py
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.response import Response
+
+from ideas.analyze import model_pool_status, model_status
+from ideas.passages import passage_index_status
+from ideas.vector_index import index_status
+from ideas.warmup import is_ready, warmup_state
+
+
+@api_view(["GET"])
+@authentication_classes([])
+@permission_classes([permissions.AllowAny])
+def health_ready(request):
+    """
+    Readiness per il load balancer: 200 solo a warm-up concluso (o disabilitato),
+    503 durante il warm-up o se è fallito. Non carica nulla: legge solo lo stato.
+    """
+    ready = is_ready()
+    return Response(
+        {
+            "ready": ready,
+            "warmup": warmup_state(),
+            "model": model_status(),
+            "index": index_status(),
+            "passage_index": passage_index_status(),
+            "pool": model_pool_status(),
+        },
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
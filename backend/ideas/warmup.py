@@ -0,0 +1,96 @@
+# warmup.py
+# ---------------------------------------
+# 🔥 MindLink Warm-up
+# ---------------------------------------
+# Warm-up opzionale all'avvio del worker (wsgi.py / asgi.py), così la prima
+# richiesta non paga caricamento del modello, prima inferenza e costruzione
+# dell'indice:
+#   1. model: caricamento del modello (o collegamento al model server)
+#   2. keywords: document frequency del corpus
+#   3. inference: analisi completa di un batch fittizio (encode + prototipi topic)
+#   4. index: indice di similarità residente
+# Lo stato e i tempi di ogni fase sono esposti da /health/ready: il load
+# balancer instrada solo verso i worker pronti (200), non verso quelli in
+# warm-up (503). Non parte nei comandi manage.py (vedi startup_report).
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+WARMUP_SETTINGS = getattr(settings, "MINDLINK_WARMUP", {})
+WARMUP_ENABLED = WARMUP_SETTINGS.get("ENABLED", False)
+# True: warm-up in un thread, il worker risponde subito (503 su /health/ready fino al termine)
+WARMUP_BACKGROUND = WARMUP_SETTINGS.get("BACKGROUND", True)
+WARMUP_INDEX = WARMUP_SETTINGS.get("INDEX", True)
+
+SAMPLE_TEXTS = [
+    "Un'app che collega studenti e tutor del quartiere per lezioni di recupero gratuite. "
+    "Le lezioni si tengono nelle biblioteche comunali il pomeriggio.",
+    "Pannelli solari condivisi sui tetti dei condomini per ridurre la bolletta energetica.",
+    "Sensori low cost per misurare la qualità dell'aria vicino alle scuole.",
+]
+
+_lock = threading.Lock()
+_state = {
+    "status": "pending" if WARMUP_ENABLED else "disabled",
+    "timings_ms": {},
+    "started_at": None,
+    "finished_at": None,
+    "error": None,
+}
+
+
+def _step(name: str, fn):
+    t0 = time.perf_counter()
+    fn()
+    _state["timings_ms"][name] = round((time.perf_counter() - t0) * 1000, 1)
+
+
+def warm_up() -> dict:
+    from .analyze import analyze_texts, get_model
+    from .keywords import get_keyword_model
+    from .vector_index import get_index
+
+    _state.update(status="running", started_at=time.time(), error=None, timings_ms={})
+    logger.info("🔥 Warm-up del worker avviato")
+    try:
+        _step("model", get_model)
+        _step("keywords", get_keyword_model)
+        _step("inference", lambda: analyze_texts(SAMPLE_TEXTS))
+        if WARMUP_INDEX:
+            _step("index", get_index)
+    except Exception as e:
+        _state.update(status="error", error=str(e), finished_at=time.time())
+        logger.exception("❌ Warm-up fallito")
+        return _state
+
+    _state.update(status="ready", finished_at=time.time())
+    logger.info(f"✅ Warm-up completato: {_state['timings_ms']}")
+    return _state
+
+
+def start_warmup():
+    """Avvia il warm-up una sola volta per processo (se abilitato)."""
+    if not WARMUP_ENABLED:
+        return
+    with _lock:
+        if _state["status"] != "pending":
+            return
+        _state["status"] = "running"
+    if WARMUP_BACKGROUND:
+        threading.Thread(target=warm_up, name="mindlink-warmup", daemon=True).start()
+    else:
+        warm_up()
+
+
+def is_ready() -> bool:
+    # Senza warm-up il worker è "pronto" e carica tutto al primo uso
+    return _state["status"] in ("ready", "disabled")
+
+
+def warmup_state() -> dict:
+    return {**_state, "timings_ms": dict(_state["timings_ms"])}
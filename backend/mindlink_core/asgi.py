@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mindlink_core.settings")
 
 application = get_asgi_application()
+
+# Warm-up opzionale del worker (MINDLINK_WARMUP): modello, prima inferenza, indice
+from ideas.warmup import start_warmup  # noqa: E402
+
+start_warmup()
@@ -184,3 +184,152 @@ MINDLINK_TRAIN = {
     "STRONG_THR": 0.85,
     "WEAK_THR": 0.6,
 }
+
+# Backend di inferenza del sentence encoder (ideas/onnx_encoder.py)
+# "onnx" richiede `manage.py export_onnx_encoder` (parità e benchmark con --check / --benchmark)
+MINDLINK_ENCODER = {
+    "BACKEND": "torch",  # "torch" | "onnx"
+    "ONNX_DIR": os.path.join(BASE_DIR, "models", "onnx"),
+    "ONNX_QUANTIZED": True,  # usa la variante int8 (quantize_dynamic) se esportata
+    "ONNX_THREADS": None,  # intra-op threads di onnxruntime (None = default)
+}
+
+# Analisi batch (generate_embeddings / perform_full_analysis_batch in ideas/analyze.py)
+MINDLINK_ANALYSIS = {
+    "ENCODE_BATCH_SIZE": 64,  # testi per batch di model.encode (ordinati per lunghezza)
+    "WRITE_BATCH_SIZE": 256,  # idee per bulk_update
+    "DRAIN_TIMEOUT": 60,  # s di attesa delle chiamate in corso sul modello sostituito (hot swap)
+}
+
+# Keyword TF-IDF con IDF sul corpus (ideas/keywords.py)
+# Popolamento iniziale / riallineamento: `manage.py rebuild_keyword_stats`
+MINDLINK_KEYWORDS = {
+    "MAX_AGE": 300,  # secondi prima di ricaricare le document frequency dal DB
+}
+
+# Cache persistente degli encode per (versione modello, SHA-256 del testo) (ideas/embedding_cache.py)
+# Manutenzione: `manage.py embedding_cache --prune` / `--drop <versione>`
+MINDLINK_EMBEDDING_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 200_000,  # oltre questa soglia si eliminano le voci usate meno di recente
+    "TOUCH_INTERVAL": 3600,  # s: last_used aggiornato al più una volta per intervallo
+    "PRUNE_EVERY": 1000,  # inserimenti (per processo) tra due controlli della dimensione
+}
+
+# Cache persistente dei token id per gli encode di massa (ideas/token_cache.py):
+# solo perform_full_analysis_batch, le richieste online non la usano
+# Benchmark: `manage.py token_cache_report --ideas 10000`
+MINDLINK_TOKEN_CACHE = {
+    "ENABLED": True,
+    "MAX_ENTRIES": 500_000,
+    "PRUNE_EVERY": 10_000,
+}
+
+# Riassunto estrattivo a costo limitato per i testi lunghi (ideas/summarizer.py)
+MINDLINK_SUMMARY = {
+    "MAX_SENTENCES": 32,  # frasi candidate codificate per testo
+    "TOKEN_BUDGET": 1024,  # parole codificate per testo
+    "MAX_SENTENCE_WORDS": 64,  # le frasi più lunghe vengono troncate prima dell'encode
+    "SUMMARY_SENTENCES": 1,  # > 1: selezione MMR di più frasi
+    "MMR_LAMBDA": 0.7,
+    "POSITION_WEIGHT": 0.3,
+}
+
+# Passaggi sovrapposti delle idee lunghe: embedding per passaggio e pooling (ideas/passages.py)
+MINDLINK_PASSAGES = {
+    "ENABLED": True,
+    "WORDS": 128,  # parole per passaggio (entro max_seq_length dell'encoder)
+    "OVERLAP": 32,
+    "MAX_PASSAGES": 64,  # passaggi per idea: limita il costo dell'ingest
+    "POOLING": "mean",  # Idea.embedding delle idee lunghe: "mean" / "max" / "none" (testo intero)
+    "SEARCH": True,  # find_similar_ideas_by_text valuta anche il passaggio migliore
+    "SEARCH_FANOUT": 4,
+}
+
+# Warm-up del worker all'avvio (wsgi/asgi) e readiness su /health/ready (ideas/warmup.py)
+MINDLINK_WARMUP = {
+    "ENABLED": False,
+    "BACKGROUND": True,  # False: il worker non accetta richieste finché non è caldo
+    "INDEX": True,  # costruisce anche l'indice di similarità residente
+}
+
+# Encoder alternativi per utente (preferenza ai.model) con budget di RAM (ideas/model_pool.py)
+MINDLINK_MODEL_POOL = {
+    "ENABLED": False,
+    "RAM_BUDGET_MB": 2048,  # pesi + indici dei modelli del pool (il modello principale è escluso)
+    "ALLOWED": ["all-MiniLM-L6-v2"],  # modelli base selezionabili, oltre alle versioni models/mindlink-v*
+}
+
+# Model server locale su socket Unix (ideas/model_server.py): `manage.py run_model_server`
+# Con MODE = "client" i worker Django non caricano torch né il modello
+MINDLINK_MODEL_SERVER = {
+    "MODE": "local",  # "local" | "client"
+    "SOCKET": os.path.join(BASE_DIR, "models", "mindlink-model.sock"),
+    "TORCH_THREADS": None,  # thread intra-op di torch (demone o modello locale)
+    "TIMEOUT": 30,
+    "VERSION_CHECK_INTERVAL": 5,  # s: il client riconferma la versione del demone (promozioni da altri worker)
+}
+
+# Micro-batching degli encode concorrenti (ideas/encode_batcher.py)
+MINDLINK_BATCHING = {
+    "ENABLED": True,
+    "MAX_BATCH": 64,  # testi per chiamata a model.encode
+    "MAX_WAIT_MS": 5,  # attesa massima per riempire un batch
+}
+
+# Indice vettoriale residente (ideas/vector_index.py)
+MINDLINK_INDEX = {
+    "MAX_AGE": 300,  # secondi prima di un rebuild completo dal DB
+    "INITIAL_CAPACITY": 1024,
+    "COMPACT_RATIO": 0.25,
+    # Ricerca approssimata IVF (ideas/ann.py): parametri da scegliere con `manage.py ann_report`
+    "ANN_MIN_SIZE": 20000,
+    "IVF_LISTS": None,  # None = ~sqrt(N)
+    "IVF_NPROBE": 12,
+    # Primo stadio quantizzato (ideas/quantization.py): None | "int8" | "pq" | "pca" | "truncate"
+    # Confronto memoria/latenza/recall: `manage.py quantization_report`
+    "QUANTIZATION": None,
+    "PQ_SUBSPACES": 48,
+    "PROJECTION_DIM": 128,  # dimensioni del tier di ricerca per "pca" / "truncate" (Matryoshka)
+    "PROJECTION_DIR": os.path.join(BASE_DIR, "models", "projection"),  # PCA salvate per versione del modello
+    "RERANK": True,  # re-score a dimensione piena dei migliori candidati
+    "RERANK_FACTOR": 4,
+}
+
+# Backend di ricerca vettoriale (ideas/pgvector_backend.py)
+MINDLINK_SEARCH = {
+    "BACKEND": "auto",  # "auto" | "pgvector" | "numpy"
+    "HNSW_EF_SEARCH": 64,
+    "RELATED_CANDIDATES": 200,  # candidati per similarità coseno valutati da /ideas/<id>/related/
+}
+
+# Ricalcolo all-vs-all delle connessioni semantiche (ideas/all_pairs.py)
+MINDLINK_ALL_PAIRS = {
+    "MEMORY_BUDGET_MB": 256,  # memoria temporanea per blocco di righe (sims + indici)
+    # Job multi-processo a shard: `manage.py all_pairs_job` (ideas/all_pairs_job.py)
+    "JOB_DIR": os.path.join(BASE_DIR, "models", "all_pairs_job"),
+    "SHARD_ROWS": 50000,
+    "WORKERS": None,  # None = os.cpu_count()
+}
+
+# Connessioni semantiche incrementali su create/update/delete (ideas/incremental_connections.py)
+# Il ricalcolo completo (`auto_weight` / fine-tuning) resta per i cambi di modello
+MINDLINK_CONNECTIONS = {
+    "INCREMENTAL": True,
+    "TOP_K": 20,
+    "MIN_THRESHOLD": 0.6,
+    "STRONG_THRESHOLD": 0.85,
+    "ASYNC": True,  # aggiornamenti incrementali dopo il commit, su un thread dedicato
+    "MAX_RESCANS": 16,  # riscansioni O(N) massime per aggiornamento incrementale
+}
+
+# Snapshot embedding memory-mapped condiviso dai worker (ideas/embedding_snapshot.py)
+# Scrittura: `manage.py write_embedding_snapshot` (cron / dopo un re-embedding) oppure
+# automatica da un worker quando lo snapshot supera MAX_AGE
+MINDLINK_SNAPSHOT = {
+    "ENABLED": False,
+    "DIR": os.path.join(BASE_DIR, "models", "snapshots"),
+    "CHECK_INTERVAL": 5,  # secondi tra due controlli di CURRENT.json e del delta dal DB
+    "MAX_AGE": 600,  # secondi: oltre, un worker scrive in background uno snapshot nuovo (0 = mai)
+    "KEEP": 2,  # versioni conservate su disco
+}
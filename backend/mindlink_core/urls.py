@@ -3,6 +3,7 @@ from django.contrib import admin
 from django.http import JsonResponse
 from django.urls import path, include
 
+from ideas.views.views_health import health_ready
 from mindlink_core import settings
 
 
@@ -16,6 +17,7 @@ def home(request):
 urlpatterns = [
     path('', home),  # 👈 home di test
     path('admin/', admin.site.urls),
+    path('health/ready', health_ready),  # readiness per il load balancer (ideas/warmup.py)
     path('api/', include('ideas.urls')),
     path("api/notifications/", include("notifications.urls")),
 ]